@@ -10,7 +10,7 @@ You are expected to use this module via the Bio.AlignIO functions (or the
 Bio.SeqIO functions if you want to work directly with the gapped sequences).
 """
 
-
+from array import array
 from Bio.Align.Generic import Alignment
 from Interfaces import AlignmentIterator, SequentialAlignmentWriter
 
@@ -112,9 +112,13 @@ class ClustalIterator(AlignmentIterator) :
         #If the alignment contains entries with the same sequence
         #identifier (not a good idea - but seems possible), then this
         #dictionary based parser will merge their sequences.  Fix this?
+        #Each sequence (and the consensus) is held in a character buffer
+        #which the fragments from each block are appended to, avoiding
+        #repeated string concatenation for long interlaced alignments.
         ids = []
         seqs = []
-        consensus = ""
+        letters_so_far = [] #: Non-gap letter counts, for old style files
+        consensus = array("c")
         seq_cols = None #: Used to extract the consensus
 
         #Use the first block to get the sequence identifiers
@@ -129,7 +133,8 @@ class ClustalIterator(AlignmentIterator) :
                     raise ValueError("Could not parse line:\n%s" % line)
 
                 ids.append(fields[0])
-                seqs.append(fields[1])
+                seqs.append(array("c", fields[1]))
+                letters_so_far.append(len(fields[1]) - fields[1].count("-"))
 
                 #Record the sequence position to get the consensus
                 if seq_cols is None :
@@ -152,7 +157,7 @@ class ClustalIterator(AlignmentIterator) :
                 assert len(ids) == len(seqs)
                 assert len(ids) > 0
                 assert seq_cols is not None
-                consensus = line[seq_cols]
+                consensus.fromstring(line[seq_cols])
                 assert not line[:seq_cols.start].strip()
                 assert not line[seq_cols.stop:].strip()
                 #Check for blank line (or end of file)
@@ -212,7 +217,8 @@ class ClustalIterator(AlignmentIterator) :
                     del start, end
 
                 #Append the sequence
-                seqs[i] += fields[1]
+                seqs[i].fromstring(fields[1])
+                letters_so_far[i] += len(fields[1]) - fields[1].count("-")
                 assert len(seqs[i]) == len(seqs[0])
 
                 if len(fields) == 3 :
@@ -221,7 +227,7 @@ class ClustalIterator(AlignmentIterator) :
                         letters = int(fields[2])
                     except ValueError :
                         raise ValueError("Could not parse line, bad sequence number:\n%s" % line)
-                    if len(seqs[i].replace("-","")) != letters :
+                    if letters_so_far[i] != letters :
                         raise ValueError("Could not parse line, invalid sequence number:\n%s" % line)
 
                 #Read in the next line
@@ -230,7 +236,7 @@ class ClustalIterator(AlignmentIterator) :
             if consensus :
                 assert line[0] == " "
                 assert seq_cols is not None
-                consensus += line[seq_cols]
+                consensus.fromstring(line[seq_cols])
                 assert len(consensus) == len(seqs[0])
                 assert not line[:seq_cols.start].strip()
                 assert not line[seq_cols.stop:].strip()
@@ -252,12 +258,14 @@ class ClustalIterator(AlignmentIterator) :
         for i in range(len(ids)) :
             if len(seqs[i]) != alignment_length:
                 raise ValueError("Error parsing alignment - sequences of different length?")
-            alignment.add_sequence(ids[i], seqs[i])
+            alignment.add_sequence(ids[i], seqs[i].tostring())
+            seqs[i] = None #Release the buffer
         #TODO - Handle alignment annotation better, for now
         #mimic the old parser in Bio.Clustalw
         if version :
             alignment._version = version
         if consensus :
+            consensus = consensus.tostring()
             assert len(consensus) == alignment_length, \
                    "Alignment length is %i, consensus length is %i, '%s'" \
                    % (alignment_length, len(consensus), consensus)
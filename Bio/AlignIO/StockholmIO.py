@@ -8,6 +8,9 @@ Bio.AlignIO support for the "stockholm" format (used in the PFAM database).
 You are expected to use this module via the Bio.AlignIO functions (or the
 Bio.SeqIO functions if you want to work directly with the gapped sequences).
 """
+import os
+from array import array
+from Bio.Alphabet import single_letter_alphabet
 from Bio.Align.Generic import Alignment
 from Interfaces import AlignmentIterator, SequentialAlignmentWriter
 
@@ -162,6 +165,13 @@ class StockholmIterator(AlignmentIterator) :
 
     For consistency with BioPerl and EMBOSS we call this the "stockholm"
     format.
+
+    Sequence fragments from interlaced blocks are appended to one character
+    buffer per sequence, so memory use is bounded by the largest single
+    alignment in the file.  For very large files (e.g. Pfam-A.full) you can
+    also skip the per-residue #=GR annotation entirely:
+
+    iterator = StockholmIterator(handle, per_residue_annotation=False)
     """
 
     #These dictionaries should be kept in sync with those
@@ -178,6 +188,21 @@ class StockholmIterator(AlignmentIterator) :
                        "OC" : "organism_classification",
                        "LO" : "look"}
 
+    def __init__(self, handle, seq_count=None,
+                 alphabet = single_letter_alphabet,
+                 per_residue_annotation=True) :
+        """Create a StockholmIterator object.
+
+        handle   - input file
+        count    - optional, expected number of records per alignment
+        alphabet - optional, e.g. Bio.Alphabet.generic_protein
+        per_residue_annotation - optional boolean, set this to False to
+                   ignore any #=GR lines (e.g. secondary structure) which
+                   can take as much memory as the sequences themselves.
+        """
+        AlignmentIterator.__init__(self, handle, seq_count, alphabet)
+        self.per_residue_annotation = per_residue_annotation
+
     def next(self) :
         try :
             line = self._header
@@ -227,10 +252,15 @@ class StockholmIterator(AlignmentIterator) :
                     raise ValueError("Could not split line into identifier " \
                                       + "and sequence:\n" + line)
                 id, seq = parts
-                if id not in ids :
+                try :
+                    buffer = seqs[id]
+                except KeyError :
+                    #Using a dictionary lookup rather than a list
+                    #membership test keeps this linear in the number
+                    #of sequences (important for PFAM "full" files).
                     ids.append(id)
-                seqs.setdefault(id, '')
-                seqs[id] += seq.replace(".","-")
+                    buffer = seqs[id] = array("c")
+                buffer.fromstring(seq.replace(".","-"))
             elif len(line) >= 5 :
                 #Comment line or meta-data
                 if line[:5] == "#=GF " :
@@ -262,14 +292,16 @@ class StockholmIterator(AlignmentIterator) :
                 elif line[:5] == "#=GR " :
                     #Generic per-Sequence AND per-Column markup
                     #Format: "#=GR <seqname> <feature> <exactly 1 char per column>"
+                    if not self.per_residue_annotation :
+                        continue
                     id, feature, text = line[5:].strip().split(None,2)
                     #if id not in ids :
                     #    ids.append(id)
                     if id not in gr :
                         gr[id] = {}
                     if feature not in gr[id]:
-                        gr[id][feature] = ""
-                    gr[id][feature] += text.strip() # append to any previous entry
+                        gr[id][feature] = array("c")
+                    gr[id][feature].fromstring(text.strip()) # append to any previous entry
                     #TODO - Should we check the length matches the alignment length?
                     #       For iterlaced sequences the GR data can be split over
                     #       multiple lines
@@ -280,12 +312,24 @@ class StockholmIterator(AlignmentIterator) :
         #assert len(gs)   <= len(ids)
         #assert len(gr)   <= len(ids)
 
+        #Convert the per-residue annotation buffers back into strings
+        for id in gr :
+            for feature in gr[id] :
+                gr[id][feature] = gr[id][feature].tostring()
+
+        #Convert the sequence buffers into strings, releasing each buffer
+        #as soon as its string is built, so we never hold two full copies
+        #of the alignment at once.
+        sequences = {}
+        for id in ids :
+            sequences[id] = seqs.pop(id).tostring()
+
         self.ids = ids
-        self.sequences = seqs
+        self.sequences = sequences
         self.seq_annotation = gs
         self.seq_col_annotation = gr
 
-        if ids and seqs :
+        if ids and sequences :
 
             if self.records_per_alignment is not None \
             and self.records_per_alignment != len(ids) :
@@ -298,9 +342,9 @@ class StockholmIterator(AlignmentIterator) :
             #For now, store the annotation a new private property:
             alignment._annotations = gr
 
-            alignment_length = len(seqs.values()[0])
+            alignment_length = len(sequences[ids[0]])
             for id in ids :
-                seq = seqs[id]
+                seq = sequences[id]
                 if alignment_length != len(seq) :
                     raise ValueError("Sequences have different lengths, or repeated identifier")
                 name, start, end = self._identifier_split(id)
@@ -398,6 +442,189 @@ class StockholmIterator(AlignmentIterator) :
                 #Ignore it?
                 record.annotations["GR:" + feature] = seq_col_data[feature]
     
+class StockholmIndex :
+    """Random access to the alignments in a multi-alignment Stockholm file.
+
+    PFAM releases ship every family in a single (very large) Stockholm
+    file.  Rather than walking the file with StockholmIterator, this
+    class records the byte offset of each alignment, keyed by its #=GF AC
+    (accession) and #=GF ID (identifier) values.  Only the requested
+    alignment is parsed when you look it up:
+
+    index = StockholmIndex("Pfam-A.full")
+    alignment = index["PF00571"]
+
+    Accessions with a version suffix (e.g. "PF00571.12") can be looked up
+    with or without the version.  As an alignment can have up to three
+    keys, len(index), keys() and iterating over the index go over the
+    alignments instead, giving one key for each (its accession, or its
+    identifier if it has none) in the order of the file.  Use all_keys()
+    for all the keys.  Each alignment must have a #=GF AC or ID line.
+
+    If an index filename is given, the offsets are saved there and
+    reloaded on later use - provided the Stockholm file's size and
+    modification time have not changed, otherwise it is rebuilt.
+
+    You are expected to use this via the Bio.AlignIO.index() function.
+    """
+
+    _index_header = "# Bio.AlignIO stockholm index version 2"
+
+    def __init__(self, filename, index_filename=None,
+                 alphabet=single_letter_alphabet,
+                 per_residue_annotation=True) :
+        """Create a StockholmIndex object.
+
+        filename       - the Stockholm file (a filename, not a handle)
+        index_filename - optional file to load/save the offsets to
+        alphabet       - optional, e.g. Bio.Alphabet.generic_protein
+        per_residue_annotation - optional, see StockholmIterator
+        """
+        self._filename = filename
+        self._alphabet = alphabet
+        self._per_residue_annotation = per_residue_annotation
+        self._handle = open(filename, "rb")
+        #The keys of each alignment, main key first, in the file order
+        alignments = None
+        stamp = self._file_stamp()
+        if index_filename and os.path.isfile(index_filename) :
+            alignments = self._load(index_filename, stamp)
+        if alignments is None :
+            alignments = self._build()
+            if index_filename :
+                self._save(index_filename, stamp, alignments)
+        self._offsets = {}
+        self._main_keys = []
+        for start, keys in alignments :
+            self._add_keys(keys, start)
+
+    def _file_stamp(self) :
+        """Returns a string identifying this version of the file (PRIVATE)."""
+        info = os.stat(self._filename)
+        return "%i %i" % (info.st_size, int(info.st_mtime))
+
+    def _build(self) :
+        """Scan the file, returns the offset and keys of each alignment (PRIVATE).
+
+        The accession (with any version) comes first in the keys, or the
+        identifier if there is no accession.
+        """
+        alignments = []
+        handle = self._handle
+        handle.seek(0)
+        offset = 0
+        start = None
+        keys = []
+        while True :
+            line = handle.readline()
+            if not line : break
+            if line[:5] == "#=GF " :
+                parts = line[5:].split(None,1)
+                if len(parts) == 2 and parts[0] == "ID" :
+                    keys.append(parts[1].strip())
+                elif len(parts) == 2 and parts[0] == "AC" :
+                    accession = parts[1].strip()
+                    keys.insert(0, accession)
+                    if "." in accession :
+                        #Also allow lookup without the version suffix
+                        keys.append(accession.split(".",1)[0])
+            elif line.strip() == "# STOCKHOLM 1.0" :
+                if start is not None :
+                    self._add_alignment(alignments, start, keys)
+                start = offset
+                keys = []
+            offset += len(line)
+        if start is not None :
+            self._add_alignment(alignments, start, keys)
+        return alignments
+
+    def _add_alignment(self, alignments, start, keys) :
+        """Record the offset and keys of an alignment (PRIVATE)."""
+        if not keys :
+            raise ValueError("The alignment at offset %i has no #=GF AC " \
+                             "or ID line to index it by" % start)
+        alignments.append((start, keys))
+
+    def _add_keys(self, keys, start) :
+        """Record the keys for the alignment starting at this offset (PRIVATE)."""
+        for key in keys :
+            if key in self._offsets and self._offsets[key] != start :
+                raise ValueError("Duplicate key '%s'" % key)
+            self._offsets[key] = start
+        self._main_keys.append(keys[0])
+
+    def _load(self, index_filename, stamp) :
+        """Load the alignments, or None if the index is out of date (PRIVATE)."""
+        handle = open(index_filename, "rb")
+        try :
+            header = handle.readline().rstrip()
+            if header != self._index_header :
+                if header.startswith(self._index_header[:-1]) :
+                    #Another version, rebuild it
+                    return None
+                raise ValueError("%s is not a Stockholm index file" \
+                                 % index_filename)
+            if handle.readline().rstrip() != "# " + stamp :
+                return None
+            alignments = []
+            for line in handle :
+                fields = line.rstrip("\n").split("\t")
+                alignments.append((int(fields[0]), fields[1:]))
+            return alignments
+        finally :
+            handle.close()
+
+    def _save(self, index_filename, stamp, alignments) :
+        """Write the offset and keys of each alignment to disk (PRIVATE)."""
+        handle = open(index_filename, "wb")
+        try :
+            handle.write(self._index_header + "\n")
+            handle.write("# %s\n" % stamp)
+            for start, keys in alignments :
+                handle.write("%i\t%s\n" % (start, "\t".join(keys)))
+        finally :
+            handle.close()
+
+    def __len__(self) :
+        """Return the number of alignments (not keys) indexed."""
+        return len(self._main_keys)
+
+    def __contains__(self, key) :
+        return key in self._offsets
+
+    def __iter__(self) :
+        """Iterate over the main key of each alignment, in file order."""
+        return iter(self._main_keys)
+
+    def keys(self) :
+        """Return a list of the main key of each alignment, in file order."""
+        return self._main_keys[:]
+
+    def all_keys(self) :
+        """Return a list of all the accessions and identifiers indexed."""
+        return self._offsets.keys()
+
+    def get_offset(self, key) :
+        """Return the byte offset of the alignment in the file."""
+        return self._offsets[key]
+
+    def __getitem__(self, key) :
+        """Parse and return the alignment with this accession or identifier."""
+        self._handle.seek(self._offsets[key])
+        iterator = StockholmIterator(self._handle, alphabet=self._alphabet,
+                        per_residue_annotation=self._per_residue_annotation)
+        return iterator.next()
+
+    def get(self, key, default=None) :
+        """Return the alignment with this key, or the default if missing."""
+        if key in self._offsets :
+            return self[key]
+        return default
+
+    def close(self) :
+        """Close the underlying Stockholm file handle."""
+        self._handle.close()
+
 if __name__ == "__main__" :
     print "Testing..."
     from cStringIO import StringIO
@@ -102,6 +102,13 @@ stockholm - A richly annotated alignment file format used by PFAM.
 Note that while Bio.AlignIO can read all the above file formats, it cannot
 write to all of them.
 
+Random Access
+=============
+For large files holding many alignments (such as a PFAM release in the
+Stockholm format), Bio.AlignIO.index(...) records where each alignment
+starts so that individual alignments can be parsed on demand by key.
+Currently this is only supported for the "stockholm" format.
+
 You can also use any file format supported by Bio.SeqIO, such as "fasta" or
 "ig" (which are listed above), PROVIDED the sequences in your file are all the
 same length.
@@ -156,6 +163,9 @@ _FormatToIterator ={#"fasta" is done via Bio.SeqIO
                     "stockholm" : StockholmIO.StockholmIterator,
                     }
 
+_FormatToIndex = {"stockholm" : StockholmIO.StockholmIndex,
+                  }
+
 _FormatToWriter ={#"fasta" is done via Bio.SeqIO
                   #"emboss" : EmbossIO.EmbossWriter, (unfinished)
                   "nexus" : NexusIO.NexusWriter,
@@ -387,6 +397,54 @@ def read(handle, format, seq_count=None, alphabet=None) :
         assert len(first.get_all_seqs())==seq_count
     return first
 
+def index(filename, format, index_filename=None, alphabet=None) :
+    """Indexes a multiple alignment file for random access by key.
+
+    filename       - name of the file (not a handle, as we need to
+                     seek within it).
+    format         - lower case string describing the file format,
+                     currently only "stockholm" is supported.
+    index_filename - optional file in which to save the index, which is
+                     reused on later calls provided the alignment file
+                     is unchanged.
+    alphabet       - optional Alphabet object.
+
+    Returns a dictionary like object, where the keys are the alignment
+    accessions or identifiers (for Stockholm files, the #=GF AC and #=GF ID
+    values) and the values are Alignment objects parsed on demand.  As an
+    alignment may have several keys, len(), keys() and iteration go over
+    the alignments, giving one key for each (all_keys() gives them all).
+    For example, using a large PFAM release:
+
+    from Bio import AlignIO
+    families = AlignIO.index("Pfam-A.full", "stockholm", "Pfam-A.full.idx")
+    alignment = families["PF00571"]
+
+    Use the Bio.AlignIO.parse() function if you want to loop over all the
+    alignments in the file.
+    """
+    if not isinstance(filename, basestring) :
+        raise TypeError("Need a filename, not a handle")
+    if not isinstance(format, basestring) :
+        raise TypeError("Need a string for the file format (lower case)")
+    if not format :
+        raise ValueError("Format required (lower case string)")
+    if format != format.lower() :
+        raise ValueError("Format string '%s' should be lower case" % format)
+    if alphabet is not None and not (isinstance(alphabet, Alphabet) or \
+                                     isinstance(alphabet, AlphabetEncoder)) :
+        raise ValueError("Invalid alphabet, %s" % repr(alphabet))
+
+    try :
+        index_class = _FormatToIndex[format]
+    except KeyError :
+        if format in _FormatToIterator :
+            raise ValueError("Indexing format '%s' is not supported" % format)
+        raise ValueError("Unknown format '%s'" % format)
+    if alphabet is None :
+        return index_class(filename, index_filename)
+    return index_class(filename, index_filename, alphabet=alphabet)
+
 def _test():
     """Run the Bio.AlignIO module's doctests.
 
@@ -1616,6 +1616,13 @@ def blastall(blastcmd, program, database, infile, align_view='7', **keywds):
     seqalign_file       seqalign file to output.
 
     """
+    blastcmd, params = _blastall_command(blastcmd, program, database, infile,
+                                         align_view, **keywds)
+    return _invoke_blast(blastcmd, params)
+
+def _blastall_command(blastcmd, program, database, infile, align_view='7',
+                      **keywds):
+    """Return the executable and parameters to run blastall (PRIVATE)."""
 
     _security_check_parameters(keywds)
 
@@ -1665,7 +1672,7 @@ def blastall(blastcmd, program, database, infile, align_view='7', **keywds):
     for attr in keywds.keys():
         params.extend([att2param[attr], str(keywds[attr])])
 
-    return _invoke_blast(blastcmd, params)
+    return blastcmd, params
 
 def blastpgp(blastcmd, database, infile, align_view='7', **keywds):
     """Execute and retrieve data from standalone BLASTPGP as handles.
@@ -1732,6 +1739,12 @@ def blastpgp(blastcmd, database, infile, align_view='7', **keywds):
     align_infile        Input alignment file for PSI-BLAST restart.
     
     """
+    blastcmd, params = _blastpgp_command(blastcmd, database, infile,
+                                         align_view, **keywds)
+    return _invoke_blast(blastcmd, params)
+
+def _blastpgp_command(blastcmd, database, infile, align_view='7', **keywds):
+    """Return the executable and parameters to run blastpgp (PRIVATE)."""
 
     _security_check_parameters(keywds)
 
@@ -1789,7 +1802,7 @@ def blastpgp(blastcmd, database, infile, align_view='7', **keywds):
     for attr in keywds.keys():
         params.extend([att2param[attr], str(keywds[attr])])
 
-    return _invoke_blast(blastcmd, params)
+    return blastcmd, params
 
 def rpsblast(blastcmd, database, infile, align_view="7", **keywds):
     """Execute and retrieve data from standalone RPS-BLAST as handles.
@@ -1847,6 +1860,12 @@ def rpsblast(blastcmd, database, infile, align_view="7", **keywds):
     align_outfile       Output file for alignment.
     
     """
+    blastcmd, params = _rpsblast_command(blastcmd, database, infile,
+                                         align_view, **keywds)
+    return _invoke_blast(blastcmd, params)
+
+def _rpsblast_command(blastcmd, database, infile, align_view="7", **keywds):
+    """Return the executable and parameters to run rpsblast (PRIVATE)."""
 
     _security_check_parameters(keywds)
     
@@ -1889,7 +1908,13 @@ def rpsblast(blastcmd, database, infile, align_view="7", **keywds):
     for attr in keywds.keys():
         params.extend([att2param[attr], str(keywds[attr])])
 
-    return _invoke_blast(blastcmd, params)
+    return blastcmd, params
+
+#The function giving the executable and parameters of each of the above,
+#for callers which run the process themselves (e.g. Bio.Blast.Parallel)
+_command_functions = {blastall : _blastall_command,
+                      blastpgp : _blastpgp_command,
+                      rpsblast : _rpsblast_command}
 
 def _re_search(regex, line, error_msg):
     m = re.search(regex, line)
@@ -1974,15 +1999,22 @@ def _escape_filename(filename) :
     else :
         return '"%s"' % filename
 
-def _invoke_blast(blast_cmd, params) :
-    """Start BLAST and returns handles for stdout and stderr (PRIVATE).
+def _command_string(blast_cmd, params) :
+    """Return the command line to run BLAST (PRIVATE).
 
     Tries to deal with spaces in the BLAST executable path.
     """
     if not os.path.exists(blast_cmd):
         raise ValueError("BLAST executable does not exist at %s" % blast_cmd)
 
-    cmd_string = " ".join([_escape_filename(blast_cmd)] + params)
+    return " ".join([_escape_filename(blast_cmd)] + params)
+
+def _invoke_blast(blast_cmd, params) :
+    """Start BLAST and returns handles for stdout and stderr (PRIVATE).
+
+    Tries to deal with spaces in the BLAST executable path.
+    """
+    cmd_string = _command_string(blast_cmd, params)
 
     #Try and use subprocess (available in python 2.4+)
     try :
@@ -18,6 +18,8 @@ _XMLParser          Generic SAX parser.
 Functions:
 parse               Incremental parser, this is an iterator that returns
                     Blast records.
+iterparse           Low memory incremental parser using ElementTree, also
+                    an iterator returning Blast records.
 """
 from Bio.Blast import Record
 import xml.sax
@@ -644,6 +646,78 @@ def parse(handle, debug=0):
     assert pending==""
     assert len(blast_parser._records) == 0
 
+# The HSP alignment strings, which iterparse can optionally skip.
+_alignment_tags = ["Hsp_qseq", "Hsp_hseq", "Hsp_midline"]
+
+def _get_iterparse():
+    """Returns the fastest available ElementTree iterparse function (PRIVATE)."""
+    try:
+        from xml.etree import cElementTree as ElementTree
+    except ImportError:
+        try:
+            import cElementTree as ElementTree
+        except ImportError:
+            try:
+                from xml.etree import ElementTree
+            except ImportError:
+                from elementtree import ElementTree
+    return ElementTree.iterparse
+
+def iterparse(handle, alignments=True, debug=0):
+    """Returns an iterator giving a Blast record for each query, low memory.
+
+    handle     - file handle to an XML file to parse
+    alignments - boolean, set this to False to skip the HSP alignment
+                 strings (the query, match and sbjct attributes of each
+                 HSP will be left empty), which saves a lot of memory
+    debug      - integer, amount of debug information to print
+
+    This gives the same Blast records as the parse function, but uses an
+    ElementTree iterparse (cElementTree if available) rather than SAX.
+    Each record is returned as soon as its <Iteration> element has been
+    read, and the XML for each finished iteration is discarded, so memory
+    use stays flat even for files with hundreds of thousands of queries.
+
+    Unlike the parse function, this requires a single XML document (as
+    produced by BLAST 2.2.14 onwards), and does not cope with multiple XML
+    files concatenated together as from older versions of BLAST.
+    """
+    blast_parser = BlastParser(debug)
+    #Cache the bound handler methods for each tag, rather than looking
+    #them up for every element as the SAX based parser does.
+    handlers = {}
+    if not alignments:
+        for tag in _alignment_tags:
+            handlers[tag] = (None, None)
+    iterations = None
+    for event, elem in _get_iterparse()(handle, events=("start", "end")):
+        tag = elem.tag
+        try:
+            start, end = handlers[tag]
+        except KeyError:
+            name = blast_parser._secure_name(tag)
+            start = getattr(blast_parser, "_start_" + name, None)
+            end = getattr(blast_parser, "_end_" + name, None)
+            handlers[tag] = (start, end)
+        if event == "start":
+            if tag == "BlastOutput_iterations":
+                iterations = elem
+            if start is not None:
+                start()
+            continue
+        if end is not None:
+            blast_parser._value = (elem.text or "").strip()
+            end()
+            blast_parser._value = ""
+        #Everything below this element has now been dealt with
+        elem.clear()
+        if tag == "Iteration":
+            if iterations is not None:
+                #Drop the (now empty) finished iteration elements
+                iterations.clear()
+            while blast_parser._records:
+                yield blast_parser._records.pop(0)
+
 if __name__ == '__main__':
     import sys
     import os
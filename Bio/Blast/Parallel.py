@@ -0,0 +1,339 @@
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+"""Run standalone BLAST on a large query file in parallel shards.
+
+The functions in Bio.Blast.NCBIStandalone (blastall, blastpgp, rpsblast)
+run a single BLAST process.  For a large multi-query FASTA file, this
+module splits the queries into a number of shard files, and runs the BLAST
+executable on each shard using a bounded pool of workers.  The XML output
+of each shard is parsed as soon as it is needed, and the Blast records
+are returned as a single iterator in the original query order:
+
+from Bio.Blast import NCBIStandalone, Parallel
+records = Parallel.run_sharded(NCBIStandalone.blastall, "queries.fasta",
+                               "work_dir", shards=16, workers=4,
+                               blastcmd="/usr/local/bin/blastall",
+                               program="blastp", database="nr",
+                               expectation=1e-5)
+for record in records :
+    print record.query, len(record.alignments)
+
+The shard files, their BLAST output, and a manifest recording which shards
+have finished are kept in the working directory.  If a run is interrupted
+(or one shard fails), calling run_sharded again with the same arguments
+will only run the shards which have not yet finished.
+
+Functions:
+run_sharded     Run BLAST on shards of a FASTA file, iterate over results.
+split_fasta     Split a FASTA file into consecutive shards.
+"""
+
+import os
+import sys
+import threading
+
+try :
+    import subprocess
+except ImportError :
+    #Python 2.3
+    subprocess = None
+
+from Bio.Blast import NCBIStandalone, NCBIXML
+
+_manifest_header = "# Bio.Blast.Parallel manifest version 1"
+
+def split_fasta(infile, filenames) :
+    """Split a FASTA file into consecutive shards, returns record counts.
+
+    infile    - name of the FASTA file to split
+    filenames - list of output file names, one per shard
+
+    The records are divided as evenly as possible, with the first shard
+    getting the first records and so on, so that concatenating the shards
+    gives back the original file.  Returns a list of the number of records
+    in each shard.  Shards may be empty if there are fewer records than
+    shards.
+    """
+    handle = open(infile, "rU")
+    total = 0
+    for line in handle :
+        if line[:1] == ">" :
+            total += 1
+    handle.close()
+
+    shards = len(filenames)
+    counts = []
+    for i in range(shards) :
+        counts.append(total // shards + (i < total % shards))
+
+    handle = open(infile, "rU")
+    index = 0
+    end = counts[0]
+    out_handle = open(filenames[0], "w")
+    record = -1
+    for line in handle :
+        if line[:1] == ">" :
+            record += 1
+            while record >= end :
+                #Move on to the next shard
+                out_handle.close()
+                index += 1
+                out_handle = open(filenames[index], "w")
+                end += counts[index]
+        elif record < 0 :
+            #Ignore anything before the first record
+            continue
+        out_handle.write(line)
+    handle.close()
+    out_handle.close()
+    for i in range(index+1, shards) :
+        open(filenames[i], "w").close()
+    return counts
+
+def _copy(handle, out_handle) :
+    """Copy a handle to the end into another, closing both (PRIVATE)."""
+    while True :
+        data = handle.read(65536)
+        if not data : break
+        out_handle.write(data)
+    handle.close()
+    out_handle.close()
+
+def _complete_xml(filename) :
+    """Does the BLAST XML file end with </BlastOutput>? (PRIVATE)"""
+    handle = open(filename, "rb")
+    handle.seek(0, 2)
+    handle.seek(max(0, handle.tell() - 1024))
+    tail = handle.read().rstrip()
+    handle.close()
+    return tail.endswith("</BlastOutput>")
+
+class _ShardedRun :
+    """Runs BLAST on each shard using a pool of worker threads (PRIVATE).
+
+    Each worker thread just waits on its BLAST process, so threads are
+    enough to keep several BLAST processes running at once.
+    """
+    def __init__(self, blast_function, infile, workdir, shards, workers,
+                 keywds) :
+        if shards < 1 :
+            raise ValueError("Need at least one shard")
+        if workers < 1 :
+            raise ValueError("Need at least one worker")
+        if keywds.get("align_view", "7") not in ["7", 7] :
+            raise ValueError("Only XML output (align_view 7) is supported")
+        for key in ["infile", "align_view"] :
+            if key in keywds :
+                del keywds[key]
+        self.blast_function = blast_function
+        self.keywds = keywds
+        self.workdir = workdir
+        self.shards = shards
+        self.workers = workers
+        self.fasta_files = []
+        self.output_files = []
+        for i in range(shards) :
+            self.fasta_files.append(os.path.join(workdir, "shard%04i.fasta" % i))
+            self.output_files.append(os.path.join(workdir, "shard%04i.xml" % i))
+        self.manifest = os.path.join(workdir, "manifest.txt")
+        self.condition = threading.Condition()
+        self.finished = {}
+        self.errors = {}
+        self.pending = []
+        self._prepare(infile)
+
+    def _manifest_lines(self, infile) :
+        """The manifest header lines describing this run (PRIVATE)."""
+        info = os.stat(infile)
+        keys = self.keywds.keys()
+        keys.sort()
+        settings = ", ".join(["%s=%s" % (key, self.keywds[key]) \
+                              for key in keys])
+        return [_manifest_header,
+                "infile %s %i %i" % (os.path.abspath(infile),
+                                     info.st_size, int(info.st_mtime)),
+                "shards %i" % self.shards,
+                "settings %s" % settings]
+
+    def _prepare(self, infile) :
+        """Split the input file, or resume a previous run (PRIVATE)."""
+        if not os.path.isdir(self.workdir) :
+            os.makedirs(self.workdir)
+        header = self._manifest_lines(infile)
+        if os.path.isfile(self.manifest) :
+            lines = [line.rstrip("\n") for line in open(self.manifest)]
+            if lines[:len(header)] == header :
+                for line in lines[len(header):] :
+                    if line.startswith("done ") :
+                        i = int(line[5:])
+                        if os.path.isfile(self.output_files[i]) :
+                            self.finished[i] = True
+                for i in range(self.shards) :
+                    if i not in self.finished :
+                        self.pending.append(i)
+                for i in self.pending :
+                    if not os.path.isfile(self.fasta_files[i]) :
+                        #The input file is unchanged, so splitting it
+                        #again gives the same shards
+                        split_fasta(infile, self.fasta_files)
+                        break
+                return
+        #Start from scratch
+        split_fasta(infile, self.fasta_files)
+        for filename in self.output_files :
+            if os.path.isfile(filename) :
+                os.remove(filename)
+        handle = open(self.manifest, "w")
+        handle.write("\n".join(header) + "\n")
+        handle.close()
+        self.pending = range(self.shards)
+
+    def _run_shard(self, i) :
+        """Run BLAST on one shard, saving the XML output (PRIVATE)."""
+        temp_file = self.output_files[i] + ".tmp"
+        if os.path.getsize(self.fasta_files[i]) == 0 :
+            #BLAST would complain about an empty query file
+            open(temp_file, "w").close()
+        else :
+            error_file = temp_file + ".err"
+            returncode = self._run_blast(self.fasta_files[i], temp_file,
+                                         error_file)
+            error_text = open(error_file).read()
+            os.remove(error_file)
+            if returncode :
+                os.remove(temp_file)
+                raise ValueError("BLAST failed for %s with return code %i:"
+                                 "\n%s" % (self.fasta_files[i], returncode,
+                                           error_text))
+            if not _complete_xml(temp_file) :
+                os.remove(temp_file)
+                raise ValueError("Incomplete output from BLAST for %s:\n%s" \
+                                 % (self.fasta_files[i], error_text))
+        os.rename(temp_file, self.output_files[i])
+
+    def _run_blast(self, fasta_file, out_file, error_file) :
+        """Run BLAST, saving its output and errors to files (PRIVATE).
+
+        Returns the exit status of BLAST, or None if it is not known.  For
+        the NCBIStandalone functions (e.g. blastall) the process is started
+        here, with its output and errors going straight to the files.  For
+        any other blast_function, its handles are copied to the files (the
+        errors in another thread, so that BLAST can't block writing lots
+        of warnings to a full pipe).
+        """
+        command = NCBIStandalone._command_functions.get(self.blast_function)
+        if command is not None and subprocess is not None :
+            blastcmd, params = command(infile=fasta_file, align_view="7",
+                                       **self.keywds)
+            out_handle = open(out_file, "wb")
+            error_handle = open(error_file, "wb")
+            try :
+                #The standard input pipe is a work around for a python bug
+                #if this is called from a Windows GUI program, see
+                #NCBIStandalone._invoke_blast
+                process = subprocess.Popen( \
+                    NCBIStandalone._command_string(blastcmd, params),
+                    stdin=subprocess.PIPE, stdout=out_handle,
+                    stderr=error_handle, shell=(sys.platform!="win32"))
+                process.stdin.close()
+                return process.wait()
+            finally :
+                out_handle.close()
+                error_handle.close()
+        result_handle, error_handle = self.blast_function( \
+            infile=fasta_file, align_view="7", **self.keywds)
+        thread = threading.Thread(target=_copy,
+                                  args=(error_handle, open(error_file, "wb")))
+        thread.start()
+        _copy(result_handle, open(out_file, "wb"))
+        thread.join()
+        return None
+
+    def _worker(self) :
+        """Take shards from the pending list until it is empty (PRIVATE)."""
+        while True :
+            self.condition.acquire()
+            try :
+                if not self.pending :
+                    return
+                i = self.pending.pop(0)
+            finally :
+                self.condition.release()
+            try :
+                self._run_shard(i)
+                error = None
+            except Exception, error :
+                pass
+            self.condition.acquire()
+            try :
+                if error is None :
+                    handle = open(self.manifest, "a")
+                    handle.write("done %i\n" % i)
+                    handle.close()
+                    self.finished[i] = True
+                else :
+                    self.errors[i] = error
+                    #Don't start any more shards
+                    self.pending = []
+                self.condition.notifyAll()
+            finally :
+                self.condition.release()
+
+    def __iter__(self) :
+        threads = []
+        for n in range(min(self.workers, len(self.pending))) :
+            thread = threading.Thread(target=self._worker)
+            thread.setDaemon(True)
+            thread.start()
+            threads.append(thread)
+        for i in range(self.shards) :
+            self.condition.acquire()
+            try :
+                while i not in self.finished and not self.errors :
+                    self.condition.wait()
+                if i not in self.finished :
+                    error = self.errors.values()[0]
+                    raise error
+            finally :
+                self.condition.release()
+            if os.path.getsize(self.output_files[i]) == 0 :
+                #Empty shard
+                continue
+            handle = open(self.output_files[i])
+            for record in NCBIXML.parse(handle) :
+                yield record
+            handle.close()
+        for thread in threads :
+            thread.join()
+
+def run_sharded(blast_function, infile, workdir, shards=4, workers=2,
+                **keywds) :
+    """Run BLAST on shards of a FASTA file, returns an iterator of records.
+
+    blast_function - function to run BLAST which returns handles for the
+                     output and errors, e.g. NCBIStandalone.blastall
+    infile         - the FASTA file of query sequences
+    workdir        - directory for the shards, output and manifest
+    shards         - number of pieces to split the queries into
+    workers        - maximum number of BLAST processes to run at once
+
+    Any other keyword arguments (e.g. blastcmd, program, database and
+    expectation) are passed on to the blast_function.  The output must be
+    XML (align_view 7, the default) as it is parsed with NCBIXML.parse.
+
+    Returns an iterator giving a Blast record for each query, in the same
+    order as the queries in the input file.  The records for the first
+    shard are available as soon as it has finished, while the other shards
+    are still running.  If a shard fails (BLAST gives a non-zero exit
+    status, or XML output without the closing </BlastOutput> tag), its
+    exception is raised once all the earlier records have been returned,
+    and no new shards are started.  A failed shard is not recorded as
+    finished, so it will be run again when the run is resumed.
+
+    A manifest in the working directory records the input file, settings
+    and finished shards.  Calling this again with the same input file,
+    number of shards and settings will reuse any shards already finished.
+    """
+    return iter(_ShardedRun(blast_function, infile, workdir, shards,
+                            workers, keywds))
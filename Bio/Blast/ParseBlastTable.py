@@ -101,3 +101,105 @@ class BlastTableReader:
       
 
 
+
+# Names of the twelve columns in BLAST's tabular (-m 8 and -m 9) output,
+# following the attribute names used by BlastTableEntry above, and the
+# function used to convert each column from a string.
+column_names = ('qid', 'sid', 'pid', 'ali_len', 'mis', 'gaps',
+                'q_start', 'q_end', 's_start', 's_end',
+                'e_value', 'bit_score')
+_column_types = (str, str, float, int, int, int,
+                 int, int, int, int,
+                 float, float)
+_numpy_formats = ('O', 'O', 'f8', 'i4', 'i4', 'i4',
+                  'i4', 'i4', 'i4', 'i4',
+                  'f8', 'f8')
+
+def parse_columns(handle, max_e_value=None, min_bit_score=None,
+                  as_array=0, chunk_size=1048576):
+   """Iterate over tabular BLAST output, one query at a time.
+
+   handle        - BLAST tabular output (-m 8, or -m 9 with comments)
+   max_e_value   - optional, hits with a larger e-value are skipped
+   min_bit_score - optional, hits with a smaller bit score are skipped
+   as_array      - optional, if true each query's hits are returned as
+                   a NumPy record array (requires NumPy) rather than as
+                   a dictionary of column lists
+   chunk_size    - number of bytes to read from the handle at a time
+
+   This is intended for very large files (e.g. all-versus-all searches)
+   where creating a BlastTableEntry for every line would be too slow.
+   The file is read in large chunks, and the hits for each query are
+   converted column by column once the query is finished.  Each iteration returns a tuple of the
+   query identifier and the columns, e.g.
+
+   for query, columns in parse_columns(handle, max_e_value=1e-5):
+      print query, len(columns['sid']), max(columns['bit_score'])
+
+   The column names are given in column_names.  Unlike BlastTableEntry,
+   the query and subject identifiers are NOT split on the '|' character.
+   The e-value and bit score filters are applied before the remaining
+   columns are converted, and queries left without any hits are skipped.
+   The hits for each query are expected to be consecutive, as in the
+   output from BLAST itself.  With -m 9 output, the hits after each block
+   of comment lines form a new group, so the PSI-BLAST iterations of a
+   query (blastpgp -j with -m 9) are returned one after the other, each
+   with its own hits.
+   """
+   current = None
+   rows = None
+   remainder = ''
+   while 1:
+      data = handle.read(chunk_size)
+      if not data:
+         lines = [remainder]
+      else:
+         lines = (remainder + data).split('\n')
+         # The last line may be incomplete, keep it for the next chunk
+         remainder = lines.pop()
+      for line in lines:
+         if not line:
+            continue
+         if line[0] == '#':
+            # A header, e.g. of the next query or PSI-BLAST iteration
+            if rows:
+               yield current, _rows_to_columns(rows, as_array)
+            current = None
+            rows = None
+            continue
+         fields = line.rstrip('\r').split('\t')
+         if len(fields) != 12:
+            fields = line.split()
+            if not fields:
+               continue
+            if len(fields) != 12:
+               raise ValueError("Expected 12 columns, got %i:\n%s" \
+                                % (len(fields), line))
+         if max_e_value is not None and float(fields[10]) > max_e_value:
+            continue
+         if min_bit_score is not None and float(fields[11]) < min_bit_score:
+            continue
+         if fields[0] != current:
+            if rows:
+               yield current, _rows_to_columns(rows, as_array)
+            current = fields[0]
+            rows = []
+         rows.append(fields)
+      if not data:
+         break
+   if rows:
+      yield current, _rows_to_columns(rows, as_array)
+
+def _rows_to_columns(rows, as_array):
+   """Turn a list of split lines into columns of the requested type (PRIVATE)."""
+   columns = []
+   for convert, column in zip(_column_types, zip(*rows)):
+      columns.append(map(convert, column))
+   if as_array:
+      import numpy
+      return numpy.rec.fromarrays(columns, names=list(column_names),
+                                  formats=list(_numpy_formats))
+   answer = {}
+   for name, column in zip(column_names, columns):
+      answer[name] = column
+   return answer
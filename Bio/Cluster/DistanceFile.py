@@ -0,0 +1,464 @@
+"""Distance matrices kept in a file, for data too large for memory.
+
+The distancematrix function in Bio.Cluster returns the whole lower triangle
+of the distance matrix as Python arrays of doubles, which for n items takes
+4*n*(n-1) bytes: for 100000 genes that is 40 GB. This module instead writes
+the lower triangle in a file, row by row, as n*(n-1)/2 single precision
+floats (the "condensed" form), computing it in blocks of rows, optionally
+in several processes:
+
+>>> from Bio.Cluster import DistanceFile
+>>> distances = DistanceFile.distancematrix("genes.dist", data, processes=4)
+
+The distance between items i and j (i > j) is distances[i*(i-1)/2+j]. The
+file can be opened again (e.g. by another program) with open_distancematrix,
+and used for hierarchical clustering (single, maximum, or average linkage)
+and k-medoids clustering without reading it into memory:
+
+>>> tree = DistanceFile.treecluster(distances, method='s')
+>>> clusterid, error, nfound = DistanceFile.kmedoids(distances, nclusters=10)
+
+treecluster and kmedoids accept either the array returned by distancematrix
+or open_distancematrix (a numpy.memmap), the name of the file, or any one
+dimensional array of the distances in the same order.
+"""
+
+import os
+import tempfile
+
+import numpy
+
+from Bio.Cluster import Node, Tree, _randomassign
+import cluster
+
+try:
+  import multiprocessing
+except ImportError:
+  #Python 2.5 or older
+  multiprocessing = None
+
+# The number of distances read from the file at a time
+chunk_size = 1 << 22
+
+def _offsets(n):
+  """Positions of the rows 0 to n of the condensed matrix (PRIVATE)."""
+  index = numpy.arange(n+1, dtype=numpy.int64)
+  return index * (index-1) // 2
+
+def _nitems(distances):
+  """Number of items of a condensed distance matrix (PRIVATE)."""
+  size = len(distances)
+  n = int((1 + numpy.sqrt(1 + 8.0*size)) / 2 + 0.5)
+  if n < 2 or n*(n-1)//2 != size:
+    raise ValueError("%i distances do not make a condensed distance matrix"
+                     % size)
+  return n
+
+def _condensed(distances):
+  """Return the condensed distance matrix and its number of items (PRIVATE)."""
+  if isinstance(distances, basestring):
+    distances = open_distancematrix(distances)
+  return distances, _nitems(distances)
+
+def _chunks(offsets, n):
+  """Split the rows into ranges of about chunk_size distances (PRIVATE)."""
+  start = 1
+  while start < n:
+    end = numpy.searchsorted(offsets, offsets[start] + chunk_size, 'right') - 1
+    end = min(max(end, start+1), n)
+    yield start, end
+    start = end
+
+def _block(distances, offsets, start, end, fill):
+  """Rows start to end of the distance matrix as a 2D array (PRIVATE).
+
+  The array has end columns, the distances of row i are in its first i
+  columns, and the others are set to fill.
+  """
+  block = numpy.empty((end-start, end), numpy.float32)
+  block.fill(fill)
+  for i in range(start, end):
+    block[i-start, :i] = distances[offsets[i]:offsets[i+1]]
+  return block
+
+def _row(distances, offsets, n, i):
+  """The distances of item i to all items, as an array of doubles (PRIVATE).
+
+  The distances to the items before i are stored together, those to the
+  items after i are spread over the rest of the file.
+  """
+  row = numpy.empty(n)
+  row[:i] = distances[offsets[i]:offsets[i+1]]
+  row[i] = 0.0
+  row[i+1:] = distances[offsets[i+1:n] + i]
+  return row
+
+def _set_row(distances, offsets, n, i, row):
+  distances[offsets[i]:offsets[i+1]] = row[:i]
+  distances[offsets[i+1:n] + i] = row[i+1:]
+
+# The arguments of distancematrix, set in each worker process
+_worker = {}
+
+def _init_worker(filename, data, mask, weight, transpose, dist, block_size):
+  _worker.update({"data": data, "mask": mask, "weight": weight,
+                  "transpose": transpose, "dist": dist,
+                  "block_size": block_size})
+  _worker["output"] = numpy.memmap(filename, dtype=numpy.float32, mode='r+')
+  _worker["n"] = _nitems(_worker["output"])
+  _worker["offsets"] = _offsets(_worker["n"])
+
+def _block_distances(items):
+  """Distance matrix of the given items, computed by Bio.Cluster (PRIVATE)."""
+  data = _worker["data"]
+  mask = _worker["mask"]
+  if _worker["transpose"]:
+    data = data[:, items]
+    if mask is not None: mask = mask[:, items]
+  else:
+    data = data[items]
+    if mask is not None: mask = mask[items]
+  return cluster.distancematrix(data, mask, _worker["weight"],
+                                _worker["transpose"], _worker["dist"])
+
+def _compute_block(block):
+  """Compute and write the distances of a block of rows (PRIVATE).
+
+  The distances between the rows of the block and each earlier block of
+  columns are calculated by Bio.Cluster.distancematrix on the items of
+  both blocks together.
+  """
+  n = _worker["n"]
+  size = _worker["block_size"]
+  offsets = _worker["offsets"]
+  output = _worker["output"]
+  start = block * size
+  end = min(start + size, n)
+  for first in range(0, start+1, size):
+    if first==start:
+      if end - start < 2: continue
+      distances = _block_distances(numpy.arange(start, end))
+      for i in range(start+1, end):
+        output[offsets[i]+start:offsets[i]+i] = distances[i-start]
+    else:
+      last = first + size
+      items = numpy.concatenate((numpy.arange(first, last),
+                                 numpy.arange(start, end)))
+      distances = _block_distances(items)
+      for i in range(start, end):
+        output[offsets[i]+first:offsets[i]+last] = distances[i-start+size][:size]
+  output.flush()
+  return block
+
+def distancematrix(filename, data, mask=None, weight=None, transpose=0,
+                   dist='e', block_size=1000, processes=1):
+  """Calculate the distance matrix and write it to a file.
+
+  The arguments data, mask, weight, transpose and dist are as for the
+  distancematrix function in Bio.Cluster. The lower triangle of the
+  distance matrix is written to the file as single precision floats, and
+  returned as a read only numpy.memmap of the file.
+
+  block_size - The number of rows (or columns, if transpose is true)
+               whose distances are computed together. The memory used is
+               about 16*block_size**2 bytes per process.
+  processes  - The number of processes computing the blocks (this needs
+               the multiprocessing module, in Python 2.6 or later).
+  """
+  data = numpy.asarray(data)
+  if mask is not None:
+    mask = numpy.asarray(mask)
+  if len(data.shape) != 2:
+    raise ValueError("data should be a two dimensional array")
+  if transpose:
+    n = data.shape[1]
+  else:
+    n = data.shape[0]
+  if n < 2:
+    raise ValueError("at least two items are needed for a distance matrix")
+  if block_size < 1:
+    raise ValueError("block_size should be a positive integer")
+  if processes < 1:
+    raise ValueError("processes should be a positive integer")
+  if processes > 1 and multiprocessing is None:
+    raise ImportError("Using several processes needs the multiprocessing "
+                      "module (Python 2.6 or later)")
+  output = numpy.memmap(filename, dtype=numpy.float32, mode='w+',
+                        shape=(n*(n-1)//2,))
+  output.flush()
+  del output
+  # The last blocks take longest, so start with those
+  blocks = range((n + block_size - 1) // block_size)
+  blocks.reverse()
+  args = (filename, data, mask, weight, transpose, dist, block_size)
+  if processes==1:
+    _init_worker(*args)
+    try:
+      for block in blocks:
+        _compute_block(block)
+    finally:
+      _worker.clear()
+  else:
+    pool = multiprocessing.Pool(processes, _init_worker, args)
+    try:
+      for block in pool.imap_unordered(_compute_block, blocks):
+        pass
+    finally:
+      pool.terminate()
+      pool.join()
+  return open_distancematrix(filename)
+
+def open_distancematrix(filename, mode='r'):
+  """Open a distance matrix written by distancematrix, as a numpy.memmap."""
+  distances = numpy.memmap(filename, dtype=numpy.float32, mode=mode)
+  _nitems(distances)
+  return distances
+
+def _tree(merges, n):
+  """Make a Tree from a list of (distance, step, item, item) (PRIVATE).
+
+  The items are any member of the clusters joined at each step. The
+  merges are sorted by distance, and numbered as by Bio.Cluster.
+  """
+  merges.sort()
+  parent = range(n)
+  label = range(n)
+  def find(i):
+    while parent[i] != i:
+      parent[i] = parent[parent[i]]
+      i = parent[i]
+    return i
+  nodes = []
+  for distance, step, i, j in merges:
+    i = find(i)
+    j = find(j)
+    nodes.append(Node(label[i], label[j], distance))
+    parent[i] = j
+    label[j] = -len(nodes)
+  return Tree(nodes)
+
+def _single(distances, n):
+  """Single linkage clustering by Boruvka's algorithm (PRIVATE).
+
+  Each pass reads the file once, finding the shortest distance from each
+  cluster to the others, and joins the clusters along those, so that
+  there are at most log2(n) passes.
+  """
+  offsets = _offsets(n)
+  parent = numpy.arange(n)
+  def find(i):
+    while parent[i] != i:
+      parent[i] = parent[parent[i]]
+      i = parent[i]
+    return i
+  merges = []
+  while len(merges) < n-1:
+    # The cluster of each item
+    clusters = parent.copy()
+    while True:
+      roots = clusters[clusters]
+      if (roots==clusters).all(): break
+      clusters = roots
+    shortest = numpy.empty(n)
+    shortest.fill(numpy.inf)
+    ends = numpy.zeros((n, 2), int)
+    for start, end in _chunks(offsets, n):
+      block = _block(distances, offsets, start, end, numpy.inf)
+      rows = numpy.arange(start, end)
+      columns = numpy.arange(end)
+      block[clusters[rows][:, numpy.newaxis]==clusters[:end]] = numpy.inf
+      # The shortest distance in each row and in each column
+      best = block.argmin(1)
+      candidates = [(rows, best, block[rows-start, best], clusters[rows])]
+      best = block.argmin(0)
+      candidates.append((best+start, columns, block[best, columns],
+                         clusters[:end]))
+      for rows, columns, values, labels in candidates:
+        order = numpy.argsort(values, kind='mergesort')
+        labels, first = numpy.unique(labels[order], return_index=True)
+        index = order[first]
+        better = numpy.nonzero(values[index] < shortest[labels])[0]
+        labels = labels[better]
+        index = index[better]
+        shortest[labels] = values[index]
+        ends[labels, 0] = rows[index]
+        ends[labels, 1] = columns[index]
+    for label in numpy.nonzero(shortest < numpy.inf)[0]:
+      i, j = ends[label]
+      root1 = find(i)
+      root2 = find(j)
+      if root1 != root2:
+        parent[root1] = root2
+        merges.append((float(shortest[label]), len(merges), i, j))
+  return merges
+
+def _scratch_copy(distances):
+  """A writable copy of the distances, in a temporary file (PRIVATE).
+
+  Returns the copy and the name of the file (None if the distances are
+  not a file, and the copy is in memory).
+  """
+  filename = getattr(distances, "filename", None)
+  if not filename:
+    return numpy.array(distances, numpy.float32), None
+  handle, scratch = tempfile.mkstemp(".dist",
+                                     dir=os.path.dirname(filename))
+  os.close(handle)
+  copy = numpy.memmap(scratch, dtype=numpy.float32, mode='w+',
+                      shape=(len(distances),))
+  for start in range(0, len(distances), chunk_size):
+    copy[start:start+chunk_size] = distances[start:start+chunk_size]
+  return copy, scratch
+
+def _nnchain(distances, n, method):
+  """Maximum or average linkage clustering with nearest neighbor chains (PRIVATE).
+
+  The distances between clusters are updated in a temporary copy of the
+  distance matrix. Only a few rows are kept in memory at a time.
+  """
+  offsets = _offsets(n)
+  work, scratch = _scratch_copy(distances)
+  try:
+    active = numpy.ones(n, bool)
+    counts = numpy.ones(n)
+    merges = []
+    chain = []
+    while len(merges) < n-1:
+      if not chain:
+        chain.append(numpy.nonzero(active)[0][0])
+      while True:
+        i = chain[-1]
+        row = _row(work, offsets, n, i)
+        row[~active] = numpy.inf
+        row[i] = numpy.inf
+        j = row.argmin()
+        # Prefer the previous cluster in the chain, in case of ties
+        if len(chain) > 1 and row[chain[-2]] <= row[j]:
+          j = chain[-2]
+          break
+        chain.append(j)
+      chain.pop()
+      chain.pop()
+      merges.append((float(row[j]), len(merges), i, j))
+      other = _row(work, offsets, n, j)
+      if method=='a':
+        row = (counts[i]*row + counts[j]*other) / (counts[i] + counts[j])
+      else:
+        row = numpy.maximum(row, other)
+      active[i] = False
+      counts[j] += counts[i]
+      _set_row(work, offsets, n, j, row)
+  finally:
+    del work
+    if scratch:
+      os.remove(scratch)
+  return merges
+
+def treecluster(distances, method='s'):
+  """Hierarchical clustering using a condensed distance matrix.
+
+  distances - The distance matrix from distancematrix or
+              open_distancematrix, or the name of its file.
+  method    - 's' for single linkage, 'm' for maximum (complete) linkage,
+              and 'a' for average linkage clustering.
+
+  Returns a Tree, as treecluster in Bio.Cluster. Single linkage reads the
+  file a few times, while maximum and average linkage use a temporary copy
+  of it (in the same directory), updating it as clusters are joined.
+  Centroid linkage needs the data itself, use treecluster in Bio.Cluster.
+  """
+  if method not in ('s', 'm', 'a'):
+    raise ValueError("method should be 's', 'm', or 'a' when using a "
+                     "distance matrix")
+  distances, n = _condensed(distances)
+  if method=='s':
+    merges = _single(distances, n)
+  else:
+    merges = _nnchain(distances, n, method)
+  return _tree(merges, n)
+
+def _medoids(distances, offsets, n, nclusters, clusterid):
+  """The item of each cluster with the least total distance to the others (PRIVATE).
+
+  The within cluster distances are summed in one pass over the file.
+  """
+  totals = numpy.zeros(n)
+  for start, end in _chunks(offsets, n):
+    block = _block(distances, offsets, start, end, 0.0)
+    block[clusterid[start:end][:, numpy.newaxis]!=clusterid[:end]] = 0.0
+    totals[start:end] += block.sum(1)
+    totals[:end] += block.sum(0)
+  order = numpy.lexsort((totals, clusterid))
+  first = numpy.searchsorted(clusterid[order], numpy.arange(nclusters))
+  return order[first]
+
+def _kmedoids_pass(distances, offsets, n, nclusters, clusterid):
+  """Improve the clusters until the solution doesn't change (PRIVATE).
+
+  This follows kmedoids in the C Clustering Library.
+  """
+  total = numpy.inf
+  counter = 0
+  period = 10
+  while True:
+    previous = total
+    if counter % period == 0:
+      saved = clusterid.copy()
+      period *= 2
+    counter += 1
+    medoids = _medoids(distances, offsets, n, nclusters, clusterid)
+    rows = numpy.array([_row(distances, offsets, n, medoid)
+                        for medoid in medoids])
+    # Each medoid stays in its own cluster
+    rows[:, medoids] = numpy.inf
+    rows[numpy.arange(nclusters), medoids] = 0.0
+    clusterid = rows.argmin(0)
+    total = rows.min(0).sum()
+    if total >= previous: break
+    if (saved==clusterid).all(): break
+  return total, medoids[clusterid]
+
+def kmedoids(distances, nclusters=2, npass=1, initialid=None):
+  """k-medoids clustering using a condensed distance matrix.
+
+  distances - The distance matrix from distancematrix or
+              open_distancematrix, or the name of its file.
+
+  The other arguments and the return value (clusterid, error, nfound) are
+  as for kmedoids in Bio.Cluster: clusterid gives the medoid of the
+  cluster of each item. Each step of the algorithm reads the file once.
+  The random initial clusters use numpy.random.
+  """
+  distances, n = _condensed(distances)
+  offsets = _offsets(n)
+  if initialid is not None:
+    initialid = numpy.array(initialid, int)
+    if initialid.shape != (n,):
+      raise ValueError("initialid should have one cluster number per item")
+    if initialid.min() < 0:
+      raise ValueError("initialid contains a negative cluster number")
+    nclusters = initialid.max() + 1
+    if numpy.bincount(initialid).min()==0:
+      raise ValueError("initialid has an empty cluster")
+    npass = 0
+  elif npass < 0:
+    raise ValueError("npass should be a positive integer")
+  if nclusters <= 0:
+    raise ValueError("nclusters should be a positive integer")
+  if n < nclusters:
+    raise ValueError("More clusters than items to be clustered")
+  best = None
+  for ipass in range(max(npass, 1)):
+    if npass==0:
+      clusterid = initialid
+    else:
+      clusterid = _randomassign(nclusters, n)
+    total, clusterid = _kmedoids_pass(distances, offsets, n, nclusters,
+                                      clusterid)
+    if best is None or total < error:
+      best = clusterid
+      error = total
+      nfound = 1
+    elif (clusterid==best).all():
+      nfound += 1
+  return best, error, nfound
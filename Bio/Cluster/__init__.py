@@ -1,6 +1,14 @@
+import time
+
 import numpy
 from cluster import *
 
+try:
+  import multiprocessing
+except ImportError:
+  #Python 2.5 or older
+  multiprocessing = None
+
 
 def _treesort(order, nodeorder, nodecounts, tree):
   nNodes = len(tree)
@@ -94,6 +102,274 @@ def _savetree(jobname, tree, order, transpose):
   index = _treesort(order, nodeorder, nodecounts, tree)
   return index
 
+def _randomassign(nclusters, nitems, random=numpy.random):
+  """Random initial clusters, each with at least one item (PRIVATE)."""
+  clusterid = numpy.concatenate((numpy.arange(nclusters),
+                                 random.randint(0, nclusters,
+                                                nitems - nclusters)))
+  random.shuffle(clusterid)
+  return clusterid
+
+def _canonical(clusterid):
+  """Number the clusters in the order of their first item (PRIVATE)."""
+  labels, first = numpy.unique(clusterid, return_index=True)
+  numbers = numpy.zeros(labels.max()+1, int)
+  numbers[labels[numpy.argsort(first)]] = numpy.arange(len(labels))
+  return numbers[clusterid]
+
+# The function and arguments of the passes, set in each worker process
+_passes = {}
+
+def _init_passes(function, nitems, nclusters, args, kwargs):
+  _passes.update({"function": function, "nitems": nitems,
+                  "nclusters": nclusters, "args": args, "kwargs": kwargs})
+
+def _run_pass(seed):
+  """Run one pass, starting from random clusters drawn with seed (PRIVATE)."""
+  start = time.time()
+  initialid = _randomassign(_passes["nclusters"], _passes["nitems"],
+                            numpy.random.RandomState(seed))
+  clusterid, error, nfound = _passes["function"](initialid=initialid,
+                                                 *_passes["args"],
+                                                 **_passes["kwargs"])
+  return clusterid, error, time.time() - start
+
+def _parallel_passes(function, nitems, nclusters, args, kwargs, npass,
+                     processes, seed):
+  """Run npass passes of function in a pool of processes (PRIVATE).
+
+  Each pass calls function(*args, initialid=..., **kwargs) with random
+  initial clusters drawn with its own seed. The seeds are drawn from
+  numpy.random.RandomState(seed), so the result only depends on seed, not
+  on the number of processes. Returns (clusterid, error, nfound, passes)
+  as described in parallel_kcluster, with clusterid as returned by
+  function.
+  """
+  if npass < 1:
+    raise ValueError("npass should be a positive integer")
+  if nclusters < 1:
+    raise ValueError("nclusters should be a positive integer")
+  if nitems < nclusters:
+    raise ValueError("More clusters than items to be clustered")
+  if processes is None:
+    if multiprocessing is None: processes = 1
+    else: processes = min(multiprocessing.cpu_count(), npass)
+  elif processes < 1:
+    raise ValueError("processes should be a positive integer")
+  elif processes > 1 and multiprocessing is None:
+    raise ImportError("Using several processes needs the multiprocessing "
+                      "module (Python 2.6 or later)")
+  seeds = numpy.random.RandomState(seed).randint(0, 2**31-1, npass)
+  initargs = (function, nitems, nclusters, args, kwargs)
+  if processes==1:
+    _init_passes(*initargs)
+    try:
+      results = map(_run_pass, seeds)
+    finally:
+      _passes.clear()
+  else:
+    pool = multiprocessing.Pool(processes, _init_passes, initargs)
+    try:
+      results = pool.map(_run_pass, seeds)
+    finally:
+      pool.terminate()
+      pool.join()
+  passes = []
+  best = None
+  for seed, (clusterid, error, seconds) in zip(seeds, results):
+    passes.append((int(seed), error, seconds))
+    # The same solution may have its clusters numbered differently
+    canonical = _canonical(clusterid)
+    if best is None or error < best_error:
+      best = clusterid
+      best_canonical = canonical
+      best_error = error
+      nfound = 1
+    elif (canonical==best_canonical).all():
+      nfound += 1
+  return best, best_error, nfound, passes
+
+def parallel_kcluster(data, nclusters=2, mask=None, weight=None, transpose=0,
+                      npass=1, method='a', dist='e', processes=None,
+                      seed=None):
+  """Run the passes of k-means clustering in several processes.
+
+  The arguments data to dist are as for kcluster, which does the npass
+  passes one after the other. Here each pass is a call of kcluster from
+  random initial clusters drawn with its own seed, in a pool of processes
+  (by default one per CPU, this needs the multiprocessing module of Python
+  2.6 or later). The seeds are drawn from numpy.random.RandomState(seed),
+  so the same seed gives the same result for any number of processes.
+
+  Return values:
+  clusterid: the best clustering solution found, with the clusters
+             numbered in the order of their first item;
+  error:     the within-cluster sum of distances of that solution;
+  nfound:    the number of passes which found this solution;
+  passes:    a list of (seed, error, seconds) for each pass.
+  """
+  data = numpy.asarray(data)
+  if transpose: nitems = data.shape[1]
+  else: nitems = data.shape[0]
+  args = (data, nclusters, mask, weight, transpose, 1, method, dist)
+  clusterid, error, nfound, passes = _parallel_passes(kcluster, nitems,
+                                                      nclusters, args, {},
+                                                      npass, processes, seed)
+  return _canonical(clusterid), error, nfound, passes
+
+def parallel_kmedoids(distance, nclusters=2, npass=1, processes=None,
+                      seed=None):
+  """Run the passes of k-medoids clustering in several processes.
+
+  distance is a distance matrix as for kmedoids, or a distance matrix in
+  a file from Bio.Cluster.DistanceFile (its name or the numpy.memmap),
+  which is clustered with DistanceFile.kmedoids. The other arguments and
+  the return values are as for parallel_kcluster; clusterid gives the
+  medoid of the cluster of each item.
+  """
+  if isinstance(distance, basestring) or isinstance(distance, numpy.memmap):
+    import DistanceFile
+    distance, nitems = DistanceFile._condensed(distance)
+    function = DistanceFile.kmedoids
+  else:
+    nitems = len(distance)
+    function = kmedoids
+  return _parallel_passes(function, nitems, nclusters, (distance, nclusters),
+                          {}, npass, processes, seed)
+
+def _distances_to_centroids(data, mask, weight, centroids, counts):
+  """Euclidean distances of the rows of data to the centroids (PRIVATE).
+
+  As for dist='e' in Bio.Cluster, these are weighted means of the squared
+  differences, over the columns present in both the row and the centroid
+  (those where counts is not zero).
+  """
+  if mask is None: present = numpy.ones(data.shape)
+  else: present = numpy.asarray(mask, float)
+  weighted = present * weight
+  data = numpy.where(present, data, 0.0)
+  known = numpy.asarray(counts > 0, float)
+  centroids = centroids * known
+  total = numpy.dot(weighted * data * data, known.T) \
+          - 2 * numpy.dot(weighted * data, centroids.T) \
+          + numpy.dot(weighted, (centroids * centroids).T)
+  denominator = numpy.dot(weighted, known.T)
+  distances = numpy.empty(total.shape)
+  distances.fill(numpy.inf)
+  nonzero = denominator > 0
+  distances[nonzero] = total[nonzero] / denominator[nonzero]
+  return distances
+
+def _kmeansplusplus(random, data, mask, weight, nclusters):
+  """Choose initial centroids among the rows of data by k-means++ (PRIVATE).
+
+  Each next centroid is chosen with a probability proportional to its
+  distance to the closest centroid chosen so far (Arthur and
+  Vassilvitskii, 2007). Returns the centroids and the number of items
+  present for each of their values.
+  """
+  chosen = [random.randint(len(data))]
+  closest = None
+  while len(chosen) < nclusters:
+    distances = _distances_to_centroids(data, mask, weight,
+                                        data[chosen[-1:]],
+                                        mask[chosen[-1:]])[:, 0]
+    distances[numpy.isinf(distances)] = 0.0
+    if closest is None: closest = distances
+    else: closest = numpy.minimum(closest, distances)
+    closest[chosen] = 0.0
+    total = closest.sum()
+    if total > 0:
+      chosen.append(numpy.searchsorted(numpy.cumsum(closest),
+                                       random.uniform(0, total)))
+    else:
+      # All the remaining items are at distance zero
+      chosen.append(numpy.setdiff1d(numpy.arange(len(data)), chosen)[0])
+  return data[chosen], mask[chosen]
+
+def minibatch_kcluster(data, nclusters=2, mask=None, weight=None,
+                       transpose=0, npass=1, batch_size=1000, niter=100,
+                       seed=None):
+  """Mini-batch k-means clustering, for data with very many items.
+
+  Instead of assigning all the items to clusters at each step, as
+  kcluster does, each of the niter steps takes a random sample of
+  batch_size items, assigns them to the closest centroid, and moves the
+  centroids towards them (Sculley, "Web-scale k-means clustering", 2010).
+  The data are only read all at once to assign each item to a cluster at
+  the end, batch_size items at a time, so data can be a numpy.memmap.
+
+  The arguments data, nclusters, mask, weight and transpose are as for
+  kcluster. The Euclidean distance (dist='e') and the arithmetic mean
+  (method='a') are used. In each of the npass passes, the initial
+  centroids are chosen by k-means++ from a random sample of 3*batch_size
+  items; the pass with the least within-cluster sum of distances over
+  that sample is used. The random samples are drawn with
+  numpy.random.RandomState(seed).
+
+  Return values:
+  clusterid: the number of the cluster of each item;
+  error:     the within-cluster sum of distances.
+  """
+  data = numpy.asarray(data)
+  if mask is not None: mask = numpy.asarray(mask)
+  if transpose:
+    data = data.T
+    if mask is not None: mask = mask.T
+  nitems, ndata = data.shape
+  if nclusters < 1:
+    raise ValueError("nclusters should be a positive integer")
+  if nitems < nclusters:
+    raise ValueError("More clusters than items to be clustered")
+  if npass < 1:
+    raise ValueError("npass should be a positive integer")
+  if batch_size < 1:
+    raise ValueError("batch_size should be a positive integer")
+  if weight is None: weight = numpy.ones(ndata)
+  else: weight = numpy.asarray(weight, float)
+  random = numpy.random.RandomState(seed)
+  def rows(items):
+    items = numpy.sort(items)
+    values = numpy.asarray(data[items], float)
+    if mask is None: return values, numpy.ones(values.shape)
+    present = numpy.asarray(mask[items], float)
+    return numpy.where(present, values, 0.0), present
+  best = None
+  for ipass in range(npass):
+    sample, sample_mask = rows(random.permutation(nitems)[:3*batch_size])
+    centroids, counts = _kmeansplusplus(random, sample, sample_mask, weight,
+                                        nclusters)
+    for i in range(niter):
+      batch, present = rows(random.randint(0, nitems, batch_size))
+      clusterid = _distances_to_centroids(batch, present, weight, centroids,
+                                          counts).argmin(1)
+      # Move each centroid towards the mean of its items in the batch, by
+      # their number relative to all items assigned to it so far
+      for k in numpy.unique(clusterid):
+        members = clusterid==k
+        number = present[members].sum(0)
+        total = (batch[members] * present[members]).sum(0)
+        counts[k] += number
+        known = counts[k] > 0
+        centroids[k, known] += (total[known]
+                                - number[known] * centroids[k, known]) \
+                               / counts[k, known]
+    error = _distances_to_centroids(sample, sample_mask, weight, centroids,
+                                    counts).min(1).sum()
+    if best is None or error < best_error:
+      best = centroids, counts
+      best_error = error
+  centroids, counts = best
+  clusterid = numpy.zeros(nitems, int)
+  error = 0.0
+  for start in range(0, nitems, batch_size):
+    batch, present = rows(numpy.arange(start, min(start+batch_size, nitems)))
+    distances = _distances_to_centroids(batch, present, weight, centroids,
+                                        counts)
+    clusterid[start:start+batch_size] = distances.argmin(1)
+    error += distances.min(1).sum()
+  return clusterid, error
+
 class Record:
   """A Record stores the gene expression data and related information
      contained in a data file following the file format defined for
@@ -201,6 +477,20 @@ Cluster/TreeView program, and stores the data in a Record object"""
     clusterid, error, nfound = kcluster(self.data, nclusters, self.mask, weight, transpose, npass, method, dist, initialid)
     return clusterid, error, nfound
 
+  def parallel_kcluster(self, nclusters=2, transpose=0, npass=1, method='a',
+                        dist='e', processes=None, seed=None):
+    if transpose==0: weight = self.eweight
+    else: weight = self.gweight
+    return parallel_kcluster(self.data, nclusters, self.mask, weight,
+                             transpose, npass, method, dist, processes, seed)
+
+  def minibatch_kcluster(self, nclusters=2, transpose=0, npass=1,
+                         batch_size=1000, niter=100, seed=None):
+    if transpose==0: weight = self.eweight
+    else: weight = self.gweight
+    return minibatch_kcluster(self.data, nclusters, self.mask, weight,
+                              transpose, npass, batch_size, niter, seed)
+
   def somcluster(self, transpose=0, nxgrid=2, nygrid=1, inittau=0.02, niter=1, dist='e'):
     if transpose==0: weight = self.eweight
     else: weight = self.gweight
@@ -0,0 +1,176 @@
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+
+"""On disk cache of the responses of the Entrez Utilities.
+
+To avoid downloading the same results again (e.g. when re-running a
+pipeline), set Bio.Entrez.cache to a ResponseCache:
+
+>>> from Bio import Entrez
+>>> from Bio.Entrez.Cache import ResponseCache
+>>> Entrez.cache = ResponseCache("entrez_cache", ttl=7*24*3600)
+
+Responses are then kept in the given directory, one file per request,
+and requests made again with the same parameters (in any order, and
+ignoring the tool and email) are answered from the cache, without the
+three second wait between requests to NCBI.
+
+Requests using the history (usehistory or WebEnv) and POST requests
+(epost) are not cached, as their results depend on the session.
+"""
+
+import os
+import time
+import urllib
+
+try:
+    from hashlib import sha1
+except ImportError:
+    #Python 2.4 or older
+    from sha import new as sha1
+
+class ResponseCache:
+    """Keep the responses of requests in files in a directory.
+
+    ttl      - Time to live of the responses, in seconds. Older responses
+               are downloaded again. The default None keeps them forever.
+    max_size - Approximate maximum total size of the responses, in bytes
+               (default 100 MB). When it is reached, the least recently
+               used responses are removed.
+    """
+    def __init__(self, directory, ttl=None, max_size=100*1024*1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+
+    def key(self, cgi, params):
+        """Return the key of a request from its URL and parameters.
+
+        Parameters with a value of None, and the tool and email, are
+        ignored. The order of the parameters doesn't matter, and a list
+        of values (e.g. of ids) is the same as the values joined by commas.
+        """
+        normalized = []
+        for name, value in params.items():
+            if value is None or name in ["tool", "email"]:
+                continue
+            if isinstance(value, list) or isinstance(value, tuple):
+                value = ",".join([str(v) for v in value])
+            normalized.append((name, str(value)))
+        normalized.sort()
+        return sha1(cgi + "?" + urllib.urlencode(normalized)).hexdigest()
+
+    def _filename(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """Return the cached response for a key, or None.
+
+        Expired responses are removed.
+        """
+        filename = self._filename(key)
+        try:
+            modified = os.path.getmtime(filename)
+        except OSError:
+            self.misses += 1
+            return None
+        if self.ttl is not None and time.time() - modified > self.ttl:
+            self._remove(filename)
+            self.misses += 1
+            return None
+        try:
+            handle = open(filename, "rb")
+            try:
+                data = handle.read()
+            finally:
+                handle.close()
+        except IOError:
+            #e.g. removed by another process meanwhile
+            self.misses += 1
+            return None
+        #Update the access time (keeping the modification time) for the
+        #least recently used eviction.
+        try:
+            os.utime(filename, (time.time(), modified))
+        except OSError:
+            pass
+        self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """Store the response for a key."""
+        filename = self._filename(key)
+        #Write to a temporary file and rename it, so other processes
+        #using the cache never see a partial response.
+        temp = "%s.%i.tmp" % (filename, os.getpid())
+        handle = open(temp, "wb")
+        try:
+            handle.write(data)
+        finally:
+            handle.close()
+        try:
+            old_size = os.path.getsize(filename)
+        except OSError:
+            old_size = None
+        if old_size is not None:
+            #Needed on Windows
+            self._remove(filename)
+        os.rename(temp, filename)
+        if self._size is None:
+            self._scan()
+        else:
+            self._size += len(data) - (old_size or 0)
+        if self._size > self.max_size:
+            self._evict()
+
+    def _remove(self, filename):
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+
+    def _entries(self):
+        """List of (access time, size, filename) of the responses (PRIVATE)."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                continue
+            filename = os.path.join(self.directory, name)
+            try:
+                entries.append((os.path.getatime(filename),
+                                os.path.getsize(filename), filename))
+            except OSError:
+                pass
+        return entries
+
+    def _scan(self):
+        self._size = sum([size for atime, size, filename in self._entries()])
+
+    def _evict(self):
+        """Remove the least recently used responses to fit max_size (PRIVATE).
+
+        This goes down to 90% of max_size, so that eviction (which lists
+        the directory) is not needed again for a while.
+        """
+        entries = self._entries()
+        entries.sort()
+        size = sum([size for atime, size, filename in entries])
+        limit = 0.9 * self.max_size
+        for atime, file_size, filename in entries:
+            if size <= limit:
+                break
+            self._remove(filename)
+            size -= file_size
+        self._size = size
+
+    def clear(self):
+        """Remove all the cached responses."""
+        for atime, size, filename in self._entries():
+            self._remove(filename)
+        self._size = 0
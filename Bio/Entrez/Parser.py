@@ -4,8 +4,8 @@
 # as part of this package.
 
 """Parser for XML results returned by NCBI's Entrez Utilities. This
-parser is used by the read() function in Bio.Entrez, and is not intended
-be used directly.
+parser is used by the read() and parse() functions in Bio.Entrez, and is
+not intended be used directly.
 """
 
 # The question is how to represent an XML file as Python objects. Some
@@ -37,11 +37,113 @@ be used directly.
 # One type of query (EFetch on the Journals database) returns an XML without
 # an associated DTD. These files are handled using the hand-written
 # SerialSet.py
+#
+# Parsing the DTDs takes a while, so the classification of the elements of
+# each DTD is kept in the _dtd_cache dictionary, and reused by later parsers.
+# It is also saved (with marshal) in a file in the compiled_dir directory,
+# so that other Python processes can load it instead of parsing the DTD
+# again. Each DTD is loaded only when an XML file refers to it.
 
 
-import os.path
+import marshal
+import os
 from xml.parsers import expat
 
+try:
+    from hashlib import sha1
+except ImportError:
+    #Python 2.4 or older
+    from sha import new as sha1
+
+# The element classification (errors, integers, strings, lists,
+# dictionaries, structures, items) found in each DTD file, by path
+_dtd_cache = {}
+
+def _default_compiled_dir():
+    home = os.path.expanduser("~")
+    if home=="~":
+        # No home directory
+        return None
+    return os.path.join(home, ".biopython", "Entrez", "DTDs")
+
+# The directory where the classification of the elements of each DTD is
+# saved for other processes. Set it to None to parse the DTDs every time.
+compiled_dir = _default_compiled_dir()
+
+# Increase this if the classification or the way it is saved changes
+_COMPILED_VERSION = 1
+
+def _compiled_filename(path):
+    """Name of the file the classification of a DTD is saved in (PRIVATE).
+
+    The name includes a hash of the path of the DTD, as several Biopython
+    installations may share the directory.
+    """
+    path = os.path.abspath(path)
+    name = "%s.%s" % (os.path.basename(path), sha1(path).hexdigest()[:16])
+    return os.path.join(compiled_dir, name)
+
+def _stat(filename):
+    info = os.stat(filename)
+    return info.st_mtime, info.st_size
+
+def _load_compiled(path):
+    """Return the saved classification of the elements of a DTD (PRIVATE).
+
+    None is returned if there is none, or if any of the DTD files it came
+    from has changed since it was saved.
+    """
+    if compiled_dir is None:
+        return None
+    try:
+        handle = open(_compiled_filename(path), "rb")
+        try:
+            version, dependencies, definitions = marshal.load(handle)
+        finally:
+            handle.close()
+    except (IOError, EOFError, ValueError, TypeError):
+        return None
+    if version!=_COMPILED_VERSION:
+        return None
+    try:
+        for filename, mtime, size in dependencies:
+            if _stat(filename)!=(mtime, size):
+                return None
+    except OSError:
+        return None
+    return definitions
+
+def _save_compiled(path, definitions, dependencies):
+    """Save the classification of the elements of a DTD (PRIVATE).
+
+    The dependencies are the DTD files it came from (the DTD and those
+    it includes). Errors, e.g. from a read only home directory, are
+    ignored; the DTD is then parsed again by the next process.
+    """
+    if compiled_dir is None:
+        return
+    try:
+        dependencies = [(filename,) + _stat(filename)
+                        for filename in dependencies]
+        if not os.path.isdir(compiled_dir):
+            os.makedirs(compiled_dir)
+        filename = _compiled_filename(path)
+        #Write to a temporary file and rename it, so other processes
+        #never see a partial file.
+        temp = "%s.%i.tmp" % (filename, os.getpid())
+        handle = open(temp, "wb")
+        try:
+            marshal.dump((_COMPILED_VERSION, dependencies, definitions),
+                         handle)
+        finally:
+            handle.close()
+        if os.path.exists(filename):
+            #Needed on Windows
+            os.remove(filename)
+        os.rename(temp, filename)
+    except (IOError, OSError):
+        pass
+
 # The following four classes are used to add a member .attributes to integers,
 # strings, lists, and dictionaries, respectively.
 
@@ -83,19 +185,61 @@ class DataHandler:
         self.items = []
         self.dtd_dir = dtd_dir
         self.initialized = False
+        self.loading = False
+        self.dependencies = []
 
-    def run(self, handle):
-        """Set up the parser and let it parse the XML results"""
+    def _create_parser(self):
         self.parser = expat.ParserCreate()
         self.parser.SetParamEntityParsing(expat.XML_PARAM_ENTITY_PARSING_ALWAYS)
         self.parser.StartElementHandler = self.startElement
         self.parser.EndElementHandler = self.endElement
         self.parser.CharacterDataHandler = self.characters
         self.parser.ExternalEntityRefHandler = self.external_entity_ref_handler
+
+    def run(self, handle):
+        """Set up the parser and let it parse the XML results"""
+        self._create_parser()
         self.parser.ParseFile(handle)
         self.parser = None
         return self.object
 
+    def parse(self, handle, block_size=65536):
+        """Parse the XML results, returning an iterator over the records.
+
+        The top level element of the XML must be a list (e.g. the
+        PubmedArticleSet of an EFetch from PubMed), and each of its items
+        is returned as soon as it has been parsed. The items are removed
+        from the top level list, so only the records being parsed (and
+        those not yet returned) are kept in memory. The XML is read
+        block_size bytes at a time.
+        """
+        self._create_parser()
+        self.parser.EndElementHandler = self._end_record_element
+        self.records = []
+        while True:
+            text = handle.read(block_size)
+            self.parser.Parse(text, not text)
+            records = self.records
+            self.records = []
+            for record in records:
+                yield record
+            del records
+            if not text:
+                break
+        self.parser = None
+
+    def _end_record_element(self, name):
+        """Move the completed items of the top level list to records (PRIVATE)."""
+        self.endElement(name)
+        if len(self.stack)==1:
+            top = self.stack[0]
+            if not isinstance(top, list):
+                raise ValueError("The XML file does not represent a list. " \
+                                 "Please use Entrez.read instead of " \
+                                 "Entrez.parse")
+            self.records.extend(top)
+            del top[:]
+
     def startElement(self, name, attrs):
         if not self.initialized:
             # This XML file does not have a DTD; load its definitions here
@@ -272,8 +416,58 @@ class DataHandler:
         self.initialized = True
         location, filename = os.path.split(systemId)
         path = os.path.join(self.dtd_dir, filename)
+        if self.loading:
+            # A DTD included by the one being loaded, its definitions
+            # are cached together with those of that DTD
+            self.parse_dtd(context, systemId, path)
+            return 1
+        try:
+            definitions = _dtd_cache[path]
+        except KeyError:
+            definitions = _load_compiled(path)
+            if definitions is None:
+                definitions = self.compile_dtd(context, systemId, path)
+            _dtd_cache[path] = definitions
+        self.add_definitions(*definitions)
+        return 1
+
+    def compile_dtd(self, context, systemId, path):
+        """Return the classification of the elements of a DTD.
+
+        The definitions of the DTD (and those included by it) are collected
+        on their own, and saved in compiled_dir if they were all read from
+        local files.
+        """
+        saved = (self.errors, self.integers, self.strings, self.lists,
+                 self.dictionaries, self.structures, self.items)
+        self.errors, self.integers, self.strings, self.lists, \
+            self.dictionaries, self.structures, self.items = \
+            [], [], [], [], [], {}, []
+        self.loading = True
+        self.dependencies = []
+        try:
+            self.parse_dtd(context, systemId, path)
+            definitions = (self.errors, self.integers, self.strings,
+                           self.lists, self.dictionaries,
+                           self.structures, self.items)
+        finally:
+            self.loading = False
+            self.errors, self.integers, self.strings, self.lists, \
+                self.dictionaries, self.structures, self.items = saved
+        if None not in self.dependencies:
+            _save_compiled(path, definitions, self.dependencies)
+        return definitions
+
+    def parse_dtd(self, context, systemId, path):
+        """Parse a DTD with the element declaration handler elementDecl.
+
+        The DTD is read from path, if it doesn't exist it is downloaded
+        from NCBI using its systemId.
+        """
+        location, filename = os.path.split(systemId)
         try:
             handle = open(path)
+            self.dependencies.append(path)
         except IOError:
             import warnings, urllib
             if systemId.startswith("http") :
@@ -289,10 +483,11 @@ class DataHandler:
             warnings.warn("Missing %s, trying access it from %s" \
                           % (filename, url))
             handle = urllib.urlopen(url)
+            self.dependencies.append(None)
         parser = self.parser.ExternalEntityParserCreate(context)
         parser.ElementDeclHandler = self.elementDecl
         parser.ParseFile(handle)
-        return 1
+        handle.close()
 
     def load_definitions(self, filename):
         """This function is only needed if the XML does not specify a DTD.
@@ -306,10 +501,17 @@ class DataHandler:
             import warnings
             warnings.warn("No parser available for %s; skipping its elements" % filename)
             return
-        self.errors.extend(module.errors)
-        self.integers.extend(module.integers)
-        self.strings.extend(module.strings)
-        self.lists.extend(module.lists)
-        self.dictionaries.extend(module.dictionaries)
-        self.structures.update(module.structures)
-        self.items.extend(module.items)
+        self.add_definitions(module.errors, module.integers, module.strings,
+                             module.lists, module.dictionaries,
+                             module.structures, module.items)
+
+    def add_definitions(self, errors, integers, strings, lists, dictionaries,
+                        structures, items):
+        """Add the classification of elements, from a DTD or SerialSet."""
+        self.errors.extend(errors)
+        self.integers.extend(integers)
+        self.strings.extend(strings)
+        self.lists.extend(lists)
+        self.dictionaries.extend(dictionaries)
+        self.structures.update(structures)
+        self.items.extend(items)
@@ -41,15 +41,33 @@ read         Parses the XML results returned by any of the above functions.
              >>> record = Entrez.read(handle)
              where record is now a Python dictionary or list.
 
+parse        Parses the XML results returned by those of the above functions
+             which can return multiple records, such as efetch, esummary
+             and elink. Typical usage is:
+             >>> handle = Entrez.efetch(db="pubmed", id=ids, retmode="xml")
+             >>> for record in Entrez.parse(handle):
+             ...     print record["MedlineCitation"]["PMID"]
+             where each record is a Python dictionary or list.
+
+efetch_batched  Fetches the records of a long list of ids in batches, using
+             EPost and the history.
+
 _open        Internally used function.
 
+Variables:
+email        Your email address, sent to NCBI with each request.
+cache        Optional Bio.Entrez.Cache.ResponseCache to keep the results
+             of requests, so they are not downloaded again.
+
 """
 import urllib, time, warnings
 import os.path
+from StringIO import StringIO
 from Bio import File
 
 
 email = None
+cache = None
 
 def query(cmd, db, cgi='http://www.ncbi.nlm.nih.gov/sites/entrez',
           **keywds):
@@ -85,7 +103,7 @@ def epost(db, cgi=None, **keywds):
     cgi='http://eutils.ncbi.nlm.nih.gov/entrez/eutils/epost.fcgi'
     variables = {'db' : db}
     variables.update(keywds)
-    return _open(cgi, variables)
+    return _open(cgi, variables, post=True)
 
 def efetch(db, cgi=None, **keywds):
     """Fetches Entrez results which are returned as a handle.
@@ -114,6 +132,64 @@ def efetch(db, cgi=None, **keywds):
     variables.update(keywds)
     return _open(cgi, variables)
 
+def efetch_batched(db, id, batch_size=500, post_size=10000, **keywds):
+    """Fetches the records of a list of ids in batches, returning handles.
+
+    Rather than passing a long list of ids to EFetch, the ids are posted
+    to the history with EPost (post_size ids at a time), and the records
+    are fetched from the history batch_size at a time. This returns an
+    iterator over the handles of the batches, e.g.
+
+    from Bio import Entrez
+    for handle in Entrez.efetch_batched(db="nucleotide", id=ids,
+                                        rettype="fasta") :
+        print handle.read()
+
+    Any other keyword arguments are passed to EFetch. The requests are
+    made one at a time, respecting the three second rule. Repeated ids
+    are only fetched once.
+
+    If a cache is set (see Bio.Entrez.Cache), the history is not used:
+    each batch is fetched by its ids (in a POST request) and cached as
+    such, so that fetching the same ids again makes no requests at all.
+    The post_size argument is then ignored.  Batches from the history can't be cached by their ids, as EPost may
+    drop or reorder ids.
+    """
+    if batch_size < 1 or post_size < 1:
+        raise ValueError("batch_size and post_size must be at least one")
+    if isinstance(id, basestring):
+        id = id.split(",")
+    unique = []
+    seen = {}
+    for i in id:
+        i = str(i).strip()
+        if i not in seen:
+            seen[i] = True
+            unique.append(i)
+    return _efetch_batches(db, unique, batch_size, post_size, keywds)
+
+def _efetch_batches(db, id, batch_size, post_size, keywds):
+    """Generator of the handles for efetch_batched (PRIVATE)."""
+    cgi='http://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi'
+    if cache is not None:
+        for start in range(0, len(id), batch_size):
+            variables = {'db' : db, 'id' : ",".join(id[start:start+batch_size])}
+            variables.update(keywds)
+            yield _open(cgi, variables, post=True,
+                        key_params=variables.copy())
+        return
+    for post_start in range(0, len(id), post_size):
+        posted = id[post_start:post_start+post_size]
+        history = read(epost(db, id=",".join(posted)))
+        for start in range(0, len(posted), batch_size):
+            variables = {'db' : db,
+                         'WebEnv' : history["WebEnv"],
+                         'query_key' : history["QueryKey"],
+                         'retstart' : start,
+                         'retmax' : batch_size}
+            variables.update(keywds)
+            yield _open(cgi, variables)
+
 def esearch(db, term, cgi=None, **keywds):
     """ESearch runs an Entrez search and returns a handle to the results.
 
@@ -286,25 +362,39 @@ def read(handle):
     record = handler.run(handle)
     return record
 
-def _open(cgi, params={}):
+def parse(handle):
+    """Parses an XML file from the NCBI Entrez Utilities, one record at a time.
+
+    This function is like read, but for XML files whose top level element
+    is a list of records (e.g. the PubmedArticleSet returned by EFetch for
+    PubMed, or the GBSet returned by EFetch for GenBank in XML). Instead of
+    returning the whole list, it returns an iterator over the records,
+    each of which is returned as soon as it has been read, so that large
+    files can be handled without holding all the records in memory.
+
+    A ValueError is raised if the top level element is not a list.
+    """
+    from Parser import DataHandler
+    DTDs = os.path.join(__path__[0], "DTDs")
+    handler = DataHandler(DTDs)
+    return handler.parse(handle)
+
+def _open(cgi, params={}, post=False, key_params=None):
     """Helper function to build the URL and open a handle to it (PRIVATE).
 
     Open a handle to Entrez.  cgi is the URL for the cgi script to access.
     params is a dictionary with the options to pass to it.  Does some
     simple error checking, and will raise an IOError if it encounters one.
+    If post is True, the options are sent as an HTTP POST request.
 
     This function also enforces the "three second rule" to avoid abusing
     the NCBI servers.
+
+    If a cache is set, the response is looked up in (or added to) the
+    cache, using key_params (by default the params themselves) for the key.
+    POST requests, and requests using the history, are only cached when
+    key_params are given.
     """
-    # NCBI requirement: At least three seconds between queries
-    delay = 3.0
-    current = time.time()
-    wait = _open.previous + delay - current
-    if wait > 0:
-        time.sleep(wait)
-        _open.previous = current + wait
-    else:
-        _open.previous = current
     # Remove None values from the parameters
     for key, value in params.items():
         if value is None:
@@ -316,10 +406,39 @@ def _open(cgi, params={}):
     if not "email" in params:
         if email!=None:
             params["email"] = email
+    cache_key = None
+    if cache is not None:
+        if key_params is None and not post and not "WebEnv" in params \
+        and not params.get("usehistory"):
+            key_params = params
+        if key_params is not None:
+            cache_key = cache.key(cgi, key_params)
+            data = cache.get(cache_key)
+            if data is not None:
+                return File.UndoHandle(StringIO(data))
+    # NCBI requirement: At least three seconds between queries
+    delay = 3.0
+    current = time.time()
+    wait = _open.previous + delay - current
+    if wait > 0:
+        time.sleep(wait)
+        _open.previous = current + wait
+    else:
+        _open.previous = current
     # Open a handle to Entrez.
     options = urllib.urlencode(params, doseq=True)
-    cgi += "?" + options
-    handle = urllib.urlopen(cgi)
+    if post:
+        handle = urllib.urlopen(cgi, options)
+    else:
+        handle = urllib.urlopen(cgi + "?" + options)
+
+    if cache_key is not None:
+        data = handle.read()
+        handle.close()
+        lines = StringIO(data).readlines()[:7]
+        _check_errors(''.join(lines))
+        cache.put(cache_key, data)
+        return File.UndoHandle(StringIO(data))
 
     # Wrap the handle inside an UndoHandle.
     uhandle = File.UndoHandle(handle)
@@ -331,8 +450,13 @@ def _open(cgi, params={}):
         lines.append(uhandle.readline())
     for i in range(6, -1, -1):
         uhandle.saveline(lines[i])
-    data = ''.join(lines)
-                   
+    _check_errors(''.join(lines))
+    return uhandle
+
+_open.previous = 0
+
+def _check_errors(data):
+    """Raise an IOError if the start of a response is an error (PRIVATE)."""
     if "500 Proxy Error" in data:
         # Sometimes Entrez returns a Proxy Error instead of results
         raise IOError("500 Proxy Error (NCBI busy?)")
@@ -364,6 +488,3 @@ def _open(cgi, params={}):
         # occurs on the first line.  I need to check this!
         raise IOError("ERROR, possibly because id not available?")
     # Should I check for 404?  timeout?  etc?
-    return uhandle
-
-_open.previous = 0
@@ -3,6 +3,13 @@
 This module contains classes which implement Dynamic Programming
 algorithms that can be used generally.
 """
+from Bio.Seq import Seq
+
+try:
+    import numpy
+except ImportError:
+    # LogDPAlgorithms needs NumPy, the other classes don't
+    numpy = None
 
 class AbstractDPAlgorithms:
     """An abstract class to calculate forward and backward probabiliies.
@@ -314,15 +321,235 @@ class ScaledDPAlgorithms(AbstractDPAlgorithms):
             return None
             
 class LogDPAlgorithms(AbstractDPAlgorithms):
-    """Implement forward and backward algorithms using a log approach.
-
-    This uses the approach of calculating the sum of log probabilities
-    using a lookup table for common values.
-
-    XXX This is not implemented yet!
+    """Implement forward, backward and Viterbi algorithms using NumPy arrays.
+
+    The model is compiled into dense arrays of transition and emission
+    probabilities, so each step of the recursions is a single matrix
+    operation over all of the states instead of a loop in Python. The
+    forward and backward variables are scaled at each position (as in
+    Durbin et al. p 78), and the logarithm of the scaling values is added
+    back, so the results are natural logarithms and long sequences do
+    not underflow.
+
+    Unlike the other classes, this also provides expected_counts, which
+    the BaumWelchTrainer uses directly, and viterbi. This requires NumPy.
     """
     def __init__(self, markov_model, sequence):
-        raise NotImplementedError("Haven't coded this yet...")
+        """Compile the model for calculating log probabilities.
 
-        
-    
+        Arguments:
+
+        o markov_model -- The current Markov model we are working with.
+
+        o sequence -- A TrainingSequence object that must have a
+        set of emissions to work with.
+        """
+        if numpy is None:
+            raise ImportError("LogDPAlgorithms requires NumPy")
+        AbstractDPAlgorithms.__init__(self, markov_model, sequence)
+
+        self._states = sequence.states.alphabet.letters
+        self._letters = sequence.emissions.alphabet.letters
+        state_index = {}
+        for i, state in enumerate(self._states):
+            state_index[state] = i
+        letter_index = {}
+        for i, letter in enumerate(self._letters):
+            letter_index[letter] = i
+
+        self._trans = numpy.zeros((len(self._states), len(self._states)))
+        for (from_state, to_state), prob in \
+                markov_model.transition_prob.items():
+            self._trans[state_index[from_state], state_index[to_state]] = prob
+        self._emission = numpy.zeros((len(self._states), len(self._letters)))
+        for (state, letter), prob in markov_model.emission_prob.items():
+            self._emission[state_index[state], letter_index[letter]] = prob
+        self._x = numpy.array([letter_index[letter] for letter
+                               in sequence.emissions], int)
+
+        self._scaled = None
+
+    def _scaled_variables(self):
+        """Calculate the scaled forward and backward variables (PRIVATE).
+
+        Returns the forward and backward variables (as L by N arrays), the
+        scaling values s_{i} and the scaled probability of the end of the
+        sequence. The sequence probability is the product of all of these
+        scaling values.
+        """
+        if self._scaled is not None:
+            return self._scaled
+        trans = self._trans
+        # a_{kl} e_{l}(b) as an N by N array for each emission letter b
+        steps = [trans * self._emission[:, b]
+                 for b in xrange(len(self._letters))]
+        x = self._x.tolist()
+        length = len(x)
+        num_states = len(self._states)
+        total = numpy.add.reduce
+
+        forward = numpy.zeros((length, num_states))
+        s_values = numpy.zeros(length)
+        # f_{0}(0) = 1, f_{k}(0) = 0 for k > 0
+        f = numpy.zeros(num_states)
+        f[0] = 1.0
+        for i in xrange(length):
+            f = numpy.dot(f, steps[x[i]])
+            s = total(f)
+            if s > 0:
+                f /= s
+            s_values[i] = s
+            forward[i] = f
+        # a_{k0}
+        end_prob = numpy.dot(f, trans[:, 0])
+
+        backward = numpy.zeros((length, num_states))
+        if length:
+            b = trans[:, 0].copy()
+            backward[-1] = b
+            for i in xrange(length - 2, -1, -1):
+                b = numpy.dot(steps[x[i + 1]], b)
+                s = s_values[i + 1]
+                if s > 0:
+                    b /= s
+                backward[i] = b
+
+        self._scaled = forward, backward, s_values, end_prob
+        return self._scaled
+
+    def _log(self, values):
+        """Natural logarithm, giving -inf for zero probabilities (PRIVATE).
+        """
+        old_settings = numpy.seterr(divide = "ignore")
+        try:
+            return numpy.log(values)
+        finally:
+            numpy.seterr(**old_settings)
+
+    def _log_probability(self):
+        """Calculate the log probability of the sequence (PRIVATE).
+        """
+        forward, backward, s_values, end_prob = self._scaled_variables()
+        return float(self._log(s_values).sum() + self._log(end_prob))
+
+    def forward_algorithm(self):
+        """Calculate sequence probability using the forward algorithm.
+
+        Returns:
+
+        o A dictionary containing the natural logarithm of the foward
+        variables, with keys of the form (state letter, position in the
+        training sequence).
+
+        o The natural logarithm of the probability of the sequence.
+        """
+        forward, backward, s_values, end_prob = self._scaled_variables()
+        log_forward = self._log(forward) + \
+                      numpy.cumsum(self._log(s_values))[:, numpy.newaxis]
+        forward_var = {}
+        for k, state in enumerate(self._states):
+            forward_var[(state, -1)] = self._log(float(k == 0))
+            for i in xrange(len(self._x)):
+                forward_var[(state, i)] = log_forward[i, k]
+        return forward_var, self._log_probability()
+
+    def backward_algorithm(self):
+        """Calculate the backward variables.
+
+        Returns a dictionary containing the natural logarithm of the
+        backward variables, with keys of the form (state letter, position
+        in the training sequence).
+        """
+        forward, backward, s_values, end_prob = self._scaled_variables()
+        # sum of log s_{j} for j > i
+        later = self._log(s_values)[::-1].cumsum()[::-1] - \
+                self._log(s_values)
+        log_backward = self._log(backward) + later[:, numpy.newaxis]
+        backward_var = {}
+        for k, state in enumerate(self._states):
+            for i in xrange(len(self._x)):
+                backward_var[(state, i)] = log_backward[i, k]
+        return backward_var
+
+    def expected_counts(self):
+        """Calculate the expected transition and emission counts.
+
+        These are A_{kl} and E_{k}(b), formulas 3.20 and 3.21 in Durbin
+        et al., for this sequence.
+
+        Returns:
+
+        o A dictionary of the expected number of transitions, for all of
+        the transitions in the model.
+
+        o A dictionary of the expected number of emissions for each
+        (state letter, emission letter).
+
+        o The natural logarithm of the probability of the sequence.
+        """
+        forward, backward, s_values, end_prob = self._scaled_variables()
+        x = self._x
+        if end_prob > 0:
+            # f_{k}(i) a_{kl} e_{l}(x_{i+1}) b_{l}(i+1) / P(x)
+            next_part = (self._emission.T[x[1:]] * backward[1:]) / \
+                        s_values[1:, numpy.newaxis]
+            trans_counts = self._trans * \
+                           numpy.dot(forward[:-1].T, next_part) / end_prob
+            # f_{k}(i) b_{k}(i) / P(x)
+            posterior = forward * backward / end_prob
+            emission_counts = numpy.zeros(self._emission.shape)
+            for b in xrange(len(self._letters)):
+                emission_counts[:, b] = posterior[x == b].sum(axis = 0)
+        else:
+            trans_counts = numpy.zeros(self._trans.shape)
+            emission_counts = numpy.zeros(self._emission.shape)
+
+        state_index = {}
+        for i, state in enumerate(self._states):
+            state_index[state] = i
+        transitions = {}
+        for from_state, to_state in self._mm.transition_prob.keys():
+            transitions[(from_state, to_state)] = \
+                float(trans_counts[state_index[from_state],
+                                   state_index[to_state]])
+        emissions = {}
+        for k, state in enumerate(self._states):
+            for b, letter in enumerate(self._letters):
+                emissions[(state, letter)] = float(emission_counts[k, b])
+        return transitions, emissions, self._log_probability()
+
+    def viterbi(self):
+        """Calculate the most probable state path using the Viterbi algorithm.
+
+        Returns:
+
+        o A Seq object with the most probable state path.
+
+        o The natural logarithm of the probability of this path.
+        """
+        log_trans = self._log(self._trans)
+        log_emissions = self._log(self._emission.T)
+        x = self._x
+        length = len(x)
+        num_states = len(self._states)
+
+        pointers = numpy.zeros((length, num_states), int)
+        # v_{0}(0) = 1, v_{k}(0) = 0 for k > 0
+        v = self._log(numpy.arange(num_states) == 0)
+        for i in xrange(length):
+            # scores of the paths from each state k (rows) to l (columns)
+            paths = v[:, numpy.newaxis] + log_trans
+            pointers[i] = paths.argmax(axis = 0)
+            v = paths.max(axis = 0) + log_emissions[x[i]]
+
+        ends = v + log_trans[:, 0]
+        state = int(ends.argmax())
+        path_prob = float(ends[state])
+
+        # --- traceback
+        path = []
+        for i in xrange(length - 1, -1, -1):
+            path.append(self._states[state])
+            state = pointers[i, state]
+        path.reverse()
+        return Seq("".join(path), self._seq.states.alphabet), path_prob
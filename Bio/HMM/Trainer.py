@@ -166,7 +166,8 @@ class BaumWelchTrainer(AbstractTrainer):
         AbstractTrainer.__init__(self, markov_model)
 
     def train(self, training_seqs, stopping_criteria,
-              dp_method = ScaledDPAlgorithms):
+              dp_method = ScaledDPAlgorithms, processes = 1,
+              update_fn = None):
         """Estimate the parameters using training sequences.
 
         The algorithm for this is taken from Durbin et al. p64, so this
@@ -184,6 +185,36 @@ class BaumWelchTrainer(AbstractTrainer):
         o dp_method -- A class instance specifying the dynamic programming
         implementation we should use to calculate the forward and
         backward variables. By default, we use the scaling method.
+        LogDPAlgorithms (which requires NumPy) is much faster for long
+        training sequences.
+
+        o processes -- The number of worker processes used to calculate
+        the expected counts for the training sequences in each iteration
+        (using the multiprocessing module, Python 2.6 or later). None
+        means one per CPU. By default everything is calculated in this
+        process. The counts are added up in the same order whatever the
+        number of processes, so the trained model is the same.
+
+        o update_fn -- An optional function which is passed the number of
+        the iteration and the log likelihood of the training sequences
+        at the start of the iteration, to follow the convergence.
+        """
+        pool, processes = _start_pool(processes)
+        try:
+            self._train(training_seqs, stopping_criteria, dp_method,
+                        pool, processes, update_fn)
+            if pool is not None:
+                pool.close()
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+        return self._markov_model
+
+    def _train(self, training_seqs, stopping_criteria, dp_method,
+               pool, processes, update_fn):
+        """Do the iterations of the training (PRIVATE).
         """
         prev_log_likelihood = None
         num_iterations = 1
@@ -192,28 +223,28 @@ class BaumWelchTrainer(AbstractTrainer):
             transition_count = self._markov_model.get_blank_transitions()
             emission_count = self._markov_model.get_blank_emissions()
 
-            # remember all of the sequence probabilities
-            all_probabilities = []
-            
-            for training_seq in training_seqs:
-                # calculate the forward and backward variables
-                DP = dp_method(self._markov_model, training_seq)
-                forward_var, seq_prob = DP.forward_algorithm()
-                backward_var =  DP.backward_algorithm()
-                
-                all_probabilities.append(seq_prob)
-
-                # update the counts for transitions and emissions
-                transition_count = self.update_transitions(transition_count,
-                                                           training_seq,
-                                                           forward_var,
-                                                           backward_var,
-                                                           seq_prob)
-                emission_count = self.update_emissions(emission_count,
-                                                       training_seq,
-                                                       forward_var,
-                                                       backward_var,
-                                                       seq_prob)
+            # calculate the expected counts for each training sequence
+            if pool is None:
+                all_counts = _expected_counts_job((self, dp_method,
+                                                   training_seqs))
+            else:
+                # give each worker a few jobs, in case the lengths of
+                # the sequences vary
+                size = -(-len(training_seqs) // (4 * processes))
+                jobs = [(self, dp_method, training_seqs[start:start + size])
+                        for start in range(0, len(training_seqs), size)]
+                all_counts = []
+                for job_counts in pool.map(_expected_counts_job, jobs):
+                    all_counts.extend(job_counts)
+
+            # add up the counts in the order of the training sequences
+            all_log_probabilities = []
+            for seq_transitions, seq_emissions, seq_log_prob in all_counts:
+                for key, count in seq_transitions.items():
+                    transition_count[key] += count
+                for key, count in seq_emissions.items():
+                    emission_count[key] += count
+                all_log_probabilities.append(seq_log_prob)
 
             # update the markov model with the new probabilities
             ml_transitions, ml_emissions = \
@@ -221,7 +252,9 @@ class BaumWelchTrainer(AbstractTrainer):
             self._markov_model.transition_prob = ml_transitions
             self._markov_model.emission_prob = ml_emissions
 
-            cur_log_likelihood =  self.log_likelihood(all_probabilities)
+            cur_log_likelihood = sum(all_log_probabilities)
+            if update_fn is not None:
+                update_fn(num_iterations, cur_log_likelihood)
 
             # if we have previously calculated the log likelihood (ie.
             # not the first round), see if we can finish
@@ -241,7 +274,42 @@ class BaumWelchTrainer(AbstractTrainer):
             prev_log_likelihood = cur_log_likelihood
             num_iterations += 1
 
-        return self._markov_model
+    def _expected_counts(self, training_seq, dp_method):
+        """Calculate the expected counts for one training sequence (PRIVATE).
+
+        Returns dictionaries of the expected number of transitions and
+        emissions, and the log probability of the sequence.
+        """
+        DP = dp_method(self._markov_model, training_seq)
+
+        # use the expected counts directly if the method can
+        # calculate them (ie. LogDPAlgorithms)
+        if hasattr(DP, "expected_counts"):
+            return DP.expected_counts()
+
+        # calculate the forward and backward variables
+        forward_var, seq_prob = DP.forward_algorithm()
+        backward_var =  DP.backward_algorithm()
+
+        transition_count = {}
+        for key in self._markov_model.get_blank_transitions().keys():
+            transition_count[key] = 0
+        emission_count = {}
+        for key in self._markov_model.get_blank_emissions().keys():
+            emission_count[key] = 0
+
+        # update the counts for transitions and emissions
+        transition_count = self.update_transitions(transition_count,
+                                                   training_seq,
+                                                   forward_var,
+                                                   backward_var,
+                                                   seq_prob)
+        emission_count = self.update_emissions(emission_count,
+                                               training_seq,
+                                               forward_var,
+                                               backward_var,
+                                               seq_prob)
+        return transition_count, emission_count, math.log(seq_prob)
 
     def update_transitions(self, transition_counts, training_seq,
                            forward_vars, backward_vars, training_seq_prob):
@@ -338,6 +406,36 @@ class BaumWelchTrainer(AbstractTrainer):
 
         return emission_counts
 
+def _start_pool(processes):
+    """Start a pool of worker processes, returns the pool and its size.
+
+    The pool is None if the calculations should be done in this process.
+    """
+    try:
+        import multiprocessing
+    except ImportError:
+        multiprocessing = None
+    if processes is None:
+        if multiprocessing:
+            processes = multiprocessing.cpu_count()
+        else:
+            processes = 1
+    elif processes < 1:
+        raise ValueError("Need at least one process")
+    if processes == 1 or multiprocessing is None:
+        return None, 1
+    return multiprocessing.Pool(processes), processes
+
+def _expected_counts_job(job):
+    """Calculate the expected counts for a list of training sequences.
+
+    This is called in the worker processes, with a tuple of the trainer,
+    the dynamic programming method and the training sequences.
+    """
+    trainer, dp_method, training_seqs = job
+    return [trainer._expected_counts(training_seq, dp_method)
+            for training_seq in training_seqs]
+
 class KnownStateTrainer(AbstractTrainer):
     """Estimate probabilities with known state sequences.
 
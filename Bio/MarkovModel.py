@@ -109,10 +109,11 @@ def save(mm, handle):
 # XXX allow them to specify starting points
 def train_bw(states, alphabet, training_data, 
              pseudo_initial=None, pseudo_transition=None, pseudo_emission=None,
-             update_fn=None,             
+             update_fn=None, processes=1,
              ):
     """train_bw(states, alphabet, training_data[, pseudo_initial]
-    [, pseudo_transition][, pseudo_emission][, update_fn]) -> MarkovModel
+    [, pseudo_transition][, pseudo_emission][, update_fn][, processes])
+    -> MarkovModel
 
     Train a MarkovModel using the Baum-Welch algorithm.  states is a list
     of strings that describe the names of each state.  alphabet is a
@@ -127,23 +128,30 @@ def train_bw(states, alphabet, training_data,
     normalization.
 
     update_fn is an optional callback that takes parameters
-    (iteration, log_likelihood).  It is called once per iteration.
+    (iteration, log_likelihood).  It is called once per iteration, so
+    it can be used to follow the convergence of the training.
+
+    processes is the number of worker processes used to calculate the
+    expected counts for the training data in each iteration (using the
+    multiprocessing module, Python 2.6 or later).  None means one per
+    CPU.  The default of 1 does all the calculations in this process.
+    The results are the same whatever the number of processes.
 
     """
     N, M = len(states), len(alphabet)
     if not training_data:
         raise ValueError("No training data given.")
-    if pseudo_initial!=None:
-        pseudo_initial = asarray(pseudo_initial)
+    if pseudo_initial is not None:
+        pseudo_initial = numpy.asarray(pseudo_initial)
         if pseudo_initial.shape != (N,):
             raise ValueError("pseudo_initial not shape len(states)")
-    if pseudo_transition!=None:
-        pseudo_transition = asarray(pseudo_transition)
+    if pseudo_transition is not None:
+        pseudo_transition = numpy.asarray(pseudo_transition)
         if pseudo_transition.shape != (N,N):
             raise ValueError("pseudo_transition not shape " + \
                              "len(states) X len(states)")
-    if pseudo_emission!=None:
-        pseudo_emission = asarray(pseudo_emission)
+    if pseudo_emission is not None:
+        pseudo_emission = numpy.asarray(pseudo_emission)
         if pseudo_emission.shape != (N,M):
             raise ValueError("pseudo_emission not shape " + \
                              "len(states) X len(alphabet)")
@@ -166,7 +174,8 @@ def train_bw(states, alphabet, training_data,
                     pseudo_initial=pseudo_initial,
                     pseudo_transition=pseudo_transition,
                     pseudo_emission=pseudo_emission,
-                    update_fn=update_fn)
+                    update_fn=update_fn,
+                    processes=processes)
     p_initial, p_transition, p_emission = x
     return MarkovModel(states, alphabet, p_initial, p_transition, p_emission)
 
@@ -174,18 +183,18 @@ MAX_ITERATIONS = 1000
 def _baum_welch(N, M, training_outputs,
                 p_initial=None, p_transition=None, p_emission=None,
                 pseudo_initial=None, pseudo_transition=None,
-                pseudo_emission=None, update_fn=None):
+                pseudo_emission=None, update_fn=None, processes=1):
     # Returns (p_initial, p_transition, p_emission)
-    if p_initial==None:
+    if p_initial is None:
         p_initial = _random_norm(N)
     else:
         p_initial = _copy_and_check(p_initial, (N,))
 
-    if p_transition==None:
+    if p_transition is None:
         p_transition = _random_norm((N,N))
     else:
         p_transition = _copy_and_check(p_transition, (N,N))
-    if p_emission==None:
+    if p_emission is None:
         p_emission = _random_norm((N,M))
     else:
         p_emission = _copy_and_check(p_emission, (N,M))
@@ -193,124 +202,155 @@ def _baum_welch(N, M, training_outputs,
     # Do all the calculations in log space to avoid underflows.
     lp_initial, lp_transition, lp_emission = map(
         numpy.log, (p_initial, p_transition, p_emission))
-    if pseudo_initial!=None:
+    if pseudo_initial is not None:
         lpseudo_initial = numpy.log(pseudo_initial)
     else:
         lpseudo_initial = None
-    if pseudo_transition!=None:
+    if pseudo_transition is not None:
         lpseudo_transition = numpy.log(pseudo_transition)
     else:
         lpseudo_transition = None
-    if pseudo_emission!=None:
+    if pseudo_emission is not None:
         lpseudo_emission = numpy.log(pseudo_emission)
     else:
         lpseudo_emission = None
 
-    # Iterate through each sequence of output, updating the parameters
-    # to the HMM.  Stop when the log likelihoods of the sequences
-    # stops varying.
-    prev_llik = None
-    for i in range(MAX_ITERATIONS):
-        llik = LOG0
-        for outputs in training_outputs:
-            x = _baum_welch_one(
-                N, M, outputs,
-                lp_initial, lp_transition, lp_emission,
-                lpseudo_initial, lpseudo_transition, lpseudo_emission,)
-            llik += x
-        if update_fn is not None:
-            update_fn(i, llik)
-        if prev_llik is not None and numpy.fabs(prev_llik-llik) < 0.1:
-            break
-        prev_llik = llik
-    else:
-        raise RuntimeError("HMM did not converge in %d iterations" \
-                           % MAX_ITERATIONS)
+    # Calculate the expected counts for all the sequences of output,
+    # then update the parameters to the HMM from their total.  Stop
+    # when the log likelihoods of the sequences stops varying.
+    pool = _start_pool(processes)
+    try:
+        prev_llik = None
+        for i in range(MAX_ITERATIONS):
+            args = (N, M, lp_initial, lp_transition, lp_emission)
+            if pool is None:
+                results = _baum_welch_job((args, training_outputs))
+            else:
+                # Give each worker a few jobs, in case the lengths of
+                # the sequences vary.  The results come back in order,
+                # so they are added up as in the serial case.
+                size = -(-len(training_outputs) // (4*processes))
+                jobs = [(args, training_outputs[start:start+size])
+                        for start in range(0, len(training_outputs), size)]
+                results = []
+                for job_results in pool.map(_baum_welch_job, jobs):
+                    results.extend(job_results)
+
+            llik = LOG0
+            for x in results:
+                llik += x[3]
+            lc_initial, lc_transition, lc_emission = [
+                _logsum_axes(numpy.array([x[j] for x in results]), (0,))
+                for j in range(3)]
+            lp_initial, lp_transition, lp_emission = _baum_welch_update(
+                lc_initial, lc_transition, lc_emission,
+                lpseudo_initial, lpseudo_transition, lpseudo_emission)
+
+            if update_fn is not None:
+                update_fn(i, llik)
+            if prev_llik is not None and numpy.fabs(prev_llik-llik) < 0.1:
+                break
+            prev_llik = llik
+        else:
+            raise RuntimeError("HMM did not converge in %d iterations" \
+                               % MAX_ITERATIONS)
+        if pool is not None:
+            pool.close()
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
 
     # Return everything back in normal space.
     return map(numpy.exp, (lp_initial, lp_transition, lp_emission))
-    
-def _baum_welch_one(N, M, outputs,
-                    lp_initial, lp_transition, lp_emission,
-                    lpseudo_initial, lpseudo_transition, lpseudo_emission):
-    # Do one iteration of Baum-Welch based on a sequence of output.
-    # NOTE: This will change the values of lp_initial, lp_transition,
-    # and lp_emission in place.
+
+def _start_pool(processes):
+    # Return a multiprocessing pool with the given number of worker
+    # processes, or None to do the calculations in this process.
+    try:
+        import multiprocessing
+    except ImportError:
+        multiprocessing = None
+    if processes is None:
+        if multiprocessing:
+            processes = multiprocessing.cpu_count()
+        else:
+            processes = 1
+    elif processes < 1:
+        raise ValueError("Need at least one process")
+    if processes == 1 or multiprocessing is None:
+        return None
+    return multiprocessing.Pool(processes)
+
+def _baum_welch_job(job):
+    # Calculate the expected counts for a list of sequences of output.
+    # This is called in the worker processes.
+    (N, M, lp_initial, lp_transition, lp_emission), training_outputs = job
+    return [_baum_welch_one(N, M, outputs,
+                            lp_initial, lp_transition, lp_emission)
+            for outputs in training_outputs]
+
+def _baum_welch_one(N, M, outputs, lp_initial, lp_transition, lp_emission):
+    # Do the expectation step of Baum-Welch for a sequence of output.
+    # Returns the logs of the expected number of times each state is
+    # used first, each transition is used, and each letter is emitted
+    # by each state, along with the log likelihood of the output.
     T = len(outputs)
     fmat = _forward(N, T, lp_initial, lp_transition, lp_emission, outputs)
     bmat = _backward(N, T, lp_transition, lp_emission, outputs)
+    outputs = numpy.asarray(outputs)
 
     # Calculate the probability of traversing each arc for any given
-    # transition.
-    lp_arc = numpy.zeros((N, N, T))
-    for t in range(T):
-        k = outputs[t]
-        lp_traverse = numpy.zeros((N, N)) # P going over one arc.
-        for i in range(N):
-            for j in range(N):
-                # P(getting to this arc)
-                # P(making this transition)
-                # P(emitting this character)
-                # P(going to the end)
-                lp = fmat[i][t] + \
-                     lp_transition[i][j] + \
-                     lp_emission[i][k] + \
-                     bmat[j][t+1]
-                lp_traverse[i][j] = lp
-        # Normalize the probability for this time step.
-        lp_arc[:,:,t] = lp_traverse - _logsum(lp_traverse)
-
+    # transition.  lp_arc[t,i,j] is the sum of P(getting to this arc),
+    # P(making this transition), P(emitting this character) and
+    # P(going to the end).
+    lp_arc = fmat[:,:T].transpose()[:,:,numpy.newaxis] + \
+             lp_transition[numpy.newaxis,:,:] + \
+             lp_emission[:,outputs].transpose()[:,:,numpy.newaxis] + \
+             bmat[:,1:].transpose()[:,numpy.newaxis,:]
+    # Normalize the probability for each time step.
+    lp_arc = lp_arc - _logsum_axes(lp_arc, (1, 2))[:,numpy.newaxis,numpy.newaxis]
 
     # Sum of all the transitions out of state i at time t.
-    lp_arcout_t = numpy.zeros((N, T))
-    for t in range(T):
-        for i in range(N):
-            lp_arcout_t[i][t] = _logsum(lp_arc[i,:,t])
-            
-    # Sum of all the transitions out of state i.
-    lp_arcout = numpy.zeros(N)
-    for i in range(N):
-        lp_arcout[i] = _logsum(lp_arcout_t[i,:])
+    lp_arcout_t = _logsum_axes(lp_arc, (2,))
 
-    # UPDATE P_INITIAL.
-    lp_initial = lp_arcout_t[:,0]
-    if lpseudo_initial!=None:
+    lc_initial = lp_arcout_t[0]
+    lc_transition = _logsum_axes(lp_arc, (0,))
+    # The letters are emitted on the transitions out of each state.
+    lc_emission = numpy.zeros((N, M)) + LOG0
+    for k in range(M):
+        if (outputs == k).any():
+            lc_emission[:,k] = _logsum_axes(lp_arcout_t[outputs == k], (0,))
+
+    # Calculate the log likelihood of the output based on the forward
+    # matrix.
+    return lc_initial, lc_transition, lc_emission, _logsum(fmat[:,T])
+
+def _baum_welch_update(lc_initial, lc_transition, lc_emission,
+                       lpseudo_initial, lpseudo_transition, lpseudo_emission):
+    # Do the maximization step of Baum-Welch, returning new values of
+    # lp_initial, lp_transition, and lp_emission from the logs of the
+    # expected counts.  Each probability is normalized by the sum of
+    # the counts out of the state.  Pseudo-counts are added to the
+    # normalized probabilities.
+    lp_initial = lc_initial - _logsum(lc_initial)
+    if lpseudo_initial is not None:
         lp_initial = _logvecadd(lp_initial, lpseudo_initial)
         lp_initial = lp_initial - _logsum(lp_initial)
-    
-    # UPDATE P_TRANSITION.  p_transition[i][j] is the sum of all the
-    # transitions from i to j, normalized by the sum of the
-    # transitions out of i.
-    for i in range(N):
-        for j in range(N):
-            lp_transition[i][j] = _logsum(lp_arc[i,j,:]) - lp_arcout[i]
-        if lpseudo_transition!=None:
-            lp_transition[i] = _logvecadd(lp_transition[i], lpseudo_transition)
-            lp_transition[i] = lp_transition[i] - _logsum(lp_transition[i])
-            
-    # UPDATE P_EMISSION.  lp_emission[i][k] is the sum of all the
-    # transitions out of i when k is observed, divided by the sum of
-    # the transitions out of i.
-    for i in range(N):
-        ksum = numpy.zeros(M)+LOG0    # ksum[k] is the sum of all i with k.
-        for t in range(T):
-            k = outputs[t]
-            for j in range(N):
-                ksum[k] = _logadd(ksum[k], lp_arc[i,j,t])
-        ksum = ksum - _logsum(ksum)      # Normalize
-        if lpseudo_emission!=None:
-            ksum = _logvecadd(ksum, lpseudo_emission[i])
-            ksum = ksum - _logsum(ksum)  # Renormalize
-        lp_emission[i,:] = ksum
 
-    # Calculate the log likelihood of the output based on the forward
-    # matrix.  Since the parameters of the HMM has changed, the log
-    # likelihoods are going to be a step behind, and we might be doing
-    # one extra iteration of training.  The alternative is to rerun
-    # the _forward algorithm and calculate from the clean one, but
-    # that may be more expensive than overshooting the training by one
-    # step.
-    return _logsum(fmat[:,T])
+    lp_transition = lc_transition - \
+                    _logsum_axes(lc_transition, (1,))[:,numpy.newaxis]
+    lp_emission = lc_emission - \
+                  _logsum_axes(lc_emission, (1,))[:,numpy.newaxis]
+    for i in range(len(lp_transition)):
+        if lpseudo_transition is not None:
+            lp_transition[i] = _logvecadd(lp_transition[i],
+                                          lpseudo_transition[i])
+            lp_transition[i] = lp_transition[i] - _logsum(lp_transition[i])
+        if lpseudo_emission is not None:
+            lp_emission[i] = _logvecadd(lp_emission[i], lpseudo_emission[i])
+            lp_emission[i] = lp_emission[i] - _logsum(lp_emission[i])
+    return lp_initial, lp_transition, lp_emission
 
 def _forward(N, T, lp_initial, lp_transition, lp_emission, outputs):
     # Implement the forward algorithm.  This actually calculates a
@@ -373,16 +413,16 @@ def train_visible(states, alphabet, training_data,
     """
     N, M = len(states), len(alphabet)
     if pseudo_initial!=None:
-        pseudo_initial = asarray(pseudo_initial)
+        pseudo_initial = numpy.asarray(pseudo_initial)
         if pseudo_initial.shape != (N,):
             raise ValueError("pseudo_initial not shape len(states)")
     if pseudo_transition!=None:
-        pseudo_transition = asarray(pseudo_transition)
+        pseudo_transition = numpy.asarray(pseudo_transition)
         if pseudo_transition.shape != (N,N):
             raise ValueError("pseudo_transition not shape " + \
                              "len(states) X len(states)")
     if pseudo_emission!=None:
-        pseudo_emission = asarray(pseudo_emission)
+        pseudo_emission = numpy.asarray(pseudo_emission)
         if pseudo_emission.shape != (N,M):
             raise ValueError("pseudo_emission not shape " + \
                              "len(states) X len(alphabet)")
@@ -568,6 +608,15 @@ def _logsum(matrix):
         sum = _logadd(sum, num)
     return sum
 
+def _logsum_axes(matrix, axes):
+    # Like _logsum, but sums over the given axes of the matrix.
+    keep = [axis for axis in range(len(matrix.shape)) if axis not in axes]
+    matrix = numpy.transpose(matrix, keep + list(axes))
+    matrix = numpy.reshape(matrix, matrix.shape[:len(keep)] + (-1,))
+    top = numpy.maximum(numpy.maximum.reduce(matrix, -1), LOG0)
+    total = numpy.add.reduce(numpy.exp(matrix - top[...,numpy.newaxis]), -1)
+    return top + numpy.log(total + numpy.exp(LOG0 - top))
+
 def _logvecadd(logvec1, logvec2):
     assert len(logvec1) == len(logvec2), "vectors aren't the same length"
     sumvec = numpy.zeros(len(logvec1))
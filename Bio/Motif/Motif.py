@@ -169,17 +169,28 @@ class Motif(object):
         else:
             return exs
 
-    def search_instances(self,sequence):
+    def search_instances(self,sequence,chunk_size=100000):
         """
         a generator function, returning found positions of instances of the motif in a given sequence
+
+        the instances are looked up in a dictionary, so the sequence is only scanned once
+        whatever the number of instances (this is done in chunks of chunk_size positions).
         """
         if not self.has_instances:
             raise ValueError ("This motif has no instances")
-        for pos in xrange(0,len(sequence)-self.length+1):
-            for instance in self.instances:
-                if instance.tostring()==sequence[pos:pos+self.length].tostring():
-                    yield(pos,instance)
-                    break # no other instance will fit (we don't want to return multiple hits)
+        #the first instance with a given sequence is the one reported
+        instances={}
+        for instance in self.instances:
+            instances.setdefault(instance.tostring(),instance)
+        if not isinstance(sequence,str):
+            sequence=sequence.tostring()
+        length=self.length
+        last=len(sequence)-length+1
+        for start in xrange(0,last,chunk_size):
+            end=min(last,start+chunk_size)
+            hits=[pos for pos in xrange(start,end) if sequence[pos:pos+length] in instances]
+            for pos in hits:
+                yield (pos,instances[sequence[pos:pos+length]])
 
     def score_hit(self,sequence,position,normalized=0,masked=0):
         """
@@ -204,7 +215,20 @@ class Motif(object):
     def search_pwm(self,sequence,normalized=0,masked=0,threshold=0.0,both=True):
         """
         a generator function, returning found hits in a given sequence with the pwm score higher than the threshold
+
+        if NumPy is installed, all the windows are scored at once (see Bio.Motif.Scan)
         """
+        try:
+            from Bio.Motif.Scan import CompiledPWM
+        except ImportError:
+            pass
+        else:
+            pwm=CompiledPWM(self,normalized,masked,both)
+            positions,scores=pwm.search(sequence.tostring().upper(),threshold)
+            for hit in zip(positions.tolist(),scores.tolist()):
+                yield hit
+            return
+
         if both:
             rc = self.reverse_complement()
             
@@ -414,10 +438,11 @@ class Motif(object):
                 res.add_instance(i.reverse_complement())
         else: # has counts
             res.has_counts=True
-            res.counts["A"]=self.counts["T"]
-            res.counts["T"]=self.counts["A"]
-            res.counts["G"]=self.counts["C"]
-            res.counts["C"]=self.counts["G"]
+            #copy the counts, so that reversing them leaves self unchanged
+            res.counts["A"]=self.counts["T"][:]
+            res.counts["T"]=self.counts["A"][:]
+            res.counts["G"]=self.counts["C"][:]
+            res.counts["C"]=self.counts["G"][:]
             res.counts["A"].reverse()
             res.counts["C"].reverse()
             res.counts["G"].reverse()
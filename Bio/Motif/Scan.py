@@ -0,0 +1,379 @@
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+"""
+Fast position weight matrix scanning using NumPy.
+
+The Motif.score_hit method looks up the log-odds of one window at a time,
+which is slow for long sequences.  A CompiledPWM holds the log-odds matrix
+of a motif (and of its reverse complement) as a NumPy array, and scores
+all the windows of a sequence at once:
+
+from Bio.Motif.Scan import CompiledPWM
+pwm = CompiledPWM(motif)
+positions, scores = pwm.search(sequence, threshold=3.0)
+
+The scores are exactly those given by Motif.score_hit (and by
+Motif.search_pwm, which uses a CompiledPWM when NumPy is installed).
+
+To scan many sequences with a whole collection of motifs, use a
+MotifScanner.  It scores all the motifs in one pass over each sequence,
+can spread the sequences over worker processes, and returns the hits as
+a HitTable of NumPy arrays:
+
+from Bio.Motif.Scan import MotifScanner
+scanner = MotifScanner(motifs, pvalue=1e-4)
+hits = scanner.scan(SeqIO.parse(handle, "fasta"))
+print hits.position[hits.motif == 0]
+"""
+import numpy
+
+class CompiledPWM(object):
+    """
+    The log-odds matrix of a motif, for scoring whole sequences at once.
+    """
+    def __init__(self,motif,normalized=0,masked=0,both=True):
+        """
+        Compiles the log-odds matrix of the motif.
+
+        normalized - divide the scores by the length (number of unmasked
+                     positions if masked) of the motif, as in score_hit
+        masked     - only score the positions in the mask of the motif
+        both       - also score the reverse complement of the motif
+        """
+        self.length=motif.length
+        self.letters=motif.alphabet.letters
+        self.both=both
+        if masked:
+            self.divisor=len(filter(lambda x: x, motif.mask))
+        else:
+            self.divisor=self.length
+        self.normalized=normalized
+        #Letters which are not in the alphabet (e.g. N) score zero,
+        #like in score_hit; they all map to the last column of the matrix.
+        self._codes=numpy.zeros(256,numpy.intp)+len(self.letters)
+        for i,letter in enumerate(self.letters):
+            self._codes[ord(letter.upper())]=i
+            self._codes[ord(letter.lower())]=i
+        motifs=[motif]
+        if both:
+            motifs.append(motif.reverse_complement())
+        self.matrix=numpy.zeros((len(motifs),self.length,len(self.letters)+1))
+        for strand,m in enumerate(motifs):
+            lo=m.log_odds()
+            for pos in xrange(self.length):
+                if masked and not motif.mask[pos]:
+                    continue
+                for i,letter in enumerate(self.letters):
+                    self.matrix[strand,pos,i]=lo[pos][letter]
+
+    def _encode(self,sequence):
+        """Turns a sequence (string or Seq) into an array of matrix columns (PRIVATE)."""
+        if not isinstance(sequence,str):
+            sequence=sequence.tostring()
+        return self._codes[numpy.fromstring(sequence,numpy.uint8)]
+
+    def _score_codes(self,codes):
+        """Scores all windows of an encoded sequence (PRIVATE)."""
+        n=len(codes)-self.length+1
+        scores=numpy.zeros((len(self.matrix),max(0,n)))
+        if n<=0:
+            return scores
+        #Add up the columns in the same order as score_hit does, so that
+        #the scores are identical
+        for pos in xrange(self.length):
+            scores+=self.matrix[:,pos,codes[pos:pos+n]]
+        if self.normalized:
+            scores/=self.divisor
+        return scores
+
+    def scores(self,sequence):
+        """
+        returns the scores of all windows of the sequence
+
+        The result is an array with one row of len(sequence)-length+1
+        scores for the motif, and a second row for its reverse complement
+        if both=True.
+        """
+        return self._score_codes(self._encode(sequence))
+
+    def _hits(self,scores,threshold,offset=0):
+        """Positions and scores above the threshold, in search_pwm order (PRIVATE)."""
+        keys=[]
+        for strand in xrange(len(scores)):
+            found=numpy.nonzero(scores[strand]>threshold)[0]
+            keys.append(found*2+strand)
+        keys=numpy.concatenate(keys)
+        if len(scores)>1:
+            keys=keys[numpy.argsort(keys,kind="mergesort")]
+        pos=keys//2
+        strand=keys%2
+        hit_scores=scores[strand,pos]
+        positions=numpy.where(strand,-(pos+offset),pos+offset)
+        return positions,hit_scores
+
+    def search(self,sequence,threshold=0.0,chunk_size=1000000):
+        """
+        returns the positions and scores of the hits above the threshold
+
+        The hits are given as two arrays, in the same order as by the
+        search_pwm method of the motif: by position, with the hit on the
+        reverse strand (if any) given as minus the position, after the hit
+        on the forward strand.  Long sequences are scored chunk_size
+        windows at a time to limit the memory used.
+        """
+        codes=self._encode(sequence)
+        n=len(codes)-self.length+1
+        if n<=chunk_size:
+            return self._hits(self._score_codes(codes),threshold)
+        positions=[]
+        hit_scores=[]
+        for start in xrange(0,n,chunk_size):
+            end=min(n,start+chunk_size)
+            scores=self._score_codes(codes[start:end+self.length-1])
+            p,s=self._hits(scores,threshold,start)
+            positions.append(p)
+            hit_scores.append(s)
+        return numpy.concatenate(positions),numpy.concatenate(hit_scores)
+
+    def search_batch(self,sequences,threshold=0.0):
+        """
+        searches a list of sequences at once
+
+        The sequences are joined, and scored in a single pass.  Returns a
+        list of (positions, scores) arrays for each sequence, as given by
+        the search method.
+        """
+        encoded=[self._encode(s) for s in sequences]
+        if not encoded:
+            return []
+        starts=numpy.cumsum([0]+[len(c) for c in encoded])
+        scores=self._score_codes(numpy.concatenate(encoded))
+        answer=[]
+        for i in xrange(len(encoded)):
+            #Only keep the windows lying within this sequence
+            end=max(starts[i],starts[i+1]-self.length+1)
+            answer.append(self._hits(scores[:,starts[i]:end],threshold))
+        return answer
+
+class HitTable(object):
+    """
+    Columnar table of the hits of many motifs in many sequences.
+
+    ids   - list of the sequence identifiers
+    names - list of the motif names
+
+    and the columns, NumPy arrays with one entry per hit:
+
+    sequence - index of the sequence (in ids)
+    motif    - index of the motif (in names)
+    position - start of the hit in the sequence
+    strand   - 1 for a hit of the motif, -1 for its reverse complement
+    score    - log-odds score of the hit
+    """
+    def __init__(self,ids,names,sequence,motif,position,strand,score):
+        self.ids=ids
+        self.names=names
+        self.sequence=sequence
+        self.motif=motif
+        self.position=position
+        self.strand=strand
+        self.score=score
+
+    def __len__(self):
+        return len(self.score)
+
+    def __getitem__(self,index):
+        """
+        returns hit number index as a tuple (sequence id, motif name, position, strand, score)
+        """
+        return (self.ids[self.sequence[index]],self.names[self.motif[index]],
+                int(self.position[index]),int(self.strand[index]),
+                float(self.score[index]))
+
+class MotifScanner(object):
+    """
+    Scans sequences with many motifs at once.
+
+    All the motifs are scored in the same pass over a sequence, using one
+    log-odds array holding all the motifs (the shorter motifs are padded
+    with columns scoring zero).  The threshold of each motif is either
+    given, or computed from a p-value using its score distribution (see
+    Bio.Motif.Thresholds, the distributions are cached).
+    """
+    def __init__(self,motifs,pvalue=None,threshold=0.0,both=True,precision=10**3):
+        """
+        motifs    - list of motifs, with the same alphabet
+        pvalue    - false positive rate used to set the threshold of each motif
+        threshold - log-odds threshold used for all motifs if no pvalue is given
+        both      - also search for the reverse complement of the motifs
+        precision - precision of the score distributions used with pvalue
+        """
+        from Bio.Motif.Thresholds import cached_score_distribution
+        if not motifs:
+            raise ValueError("No motifs given")
+        self.names=[]
+        thresholds=[]
+        compiled=[]
+        for i,motif in enumerate(motifs):
+            if motif.alphabet.letters!=motifs[0].alphabet.letters:
+                raise ValueError("The motifs must have the same alphabet")
+            self.names.append(motif.name or "motif%i"%i)
+            if pvalue is None:
+                thresholds.append(threshold)
+            else:
+                distribution=cached_score_distribution(motif,precision)
+                thresholds.append(distribution.threshold_fpr(pvalue))
+            compiled.append(CompiledPWM(motif,both=both))
+        self.thresholds=numpy.array(thresholds)
+        self.strands=len(compiled[0].matrix)
+        self.max_length=max([c.length for c in compiled])
+        self._codes=compiled[0]._codes
+        #One row per motif and strand
+        rows=len(compiled)*self.strands
+        self.matrix=numpy.zeros((rows,self.max_length,len(compiled[0].letters)+1))
+        self._row_lengths=numpy.zeros(rows,numpy.intp)
+        self._row_thresholds=numpy.zeros(rows)
+        for i,c in enumerate(compiled):
+            for strand in xrange(self.strands):
+                row=i*self.strands+strand
+                self.matrix[row,:c.length,:]=c.matrix[strand]
+                self._row_lengths[row]=c.length
+                self._row_thresholds[row]=thresholds[i]
+        self.chunk_size=max(1000,4000000//rows)
+
+    def _search_codes(self,codes,offset):
+        """Finds the hits in an encoded sequence (PRIVATE).
+
+        Returns the rows, positions (plus offset) and scores of the hits,
+        sorted by position.  Only windows starting before len(codes)
+        minus the length of the motif are considered.
+        """
+        n=len(codes)
+        if n==0:
+            empty=numpy.zeros(0,numpy.intp)
+            return empty,empty,numpy.zeros(0)
+        #Pad with letters outside the alphabet, which score zero
+        pad=numpy.zeros(self.max_length-1,numpy.intp)+len(self.matrix[0,0])-1
+        padded=numpy.concatenate((codes,pad))
+        scores=numpy.zeros((len(self.matrix),n))
+        for pos in xrange(self.max_length):
+            scores+=self.matrix[:,pos,padded[pos:pos+n]]
+        hits=scores>self._row_thresholds[:,numpy.newaxis]
+        hits&=numpy.arange(n)[numpy.newaxis,:]<=(n-self._row_lengths)[:,numpy.newaxis]
+        rows,positions=numpy.nonzero(hits)
+        order=numpy.lexsort((rows,positions))
+        rows=rows[order]
+        positions=positions[order]
+        return rows,positions+offset,scores[rows,positions]
+
+    def search(self,sequence):
+        """
+        returns the hits of all motifs in one sequence
+
+        The hits are given as four arrays (motif, position, strand, score)
+        sorted by position, see HitTable.
+        """
+        if not isinstance(sequence,str):
+            sequence=sequence.tostring()
+        codes=self._codes[numpy.fromstring(sequence,numpy.uint8)]
+        rows=[]
+        positions=[]
+        scores=[]
+        #Windows starting in each chunk, so chunks overlap by max_length-1
+        for start in xrange(0,max(1,len(codes)),self.chunk_size):
+            r,p,s=self._search_codes(codes[start:start+self.chunk_size+self.max_length-1],start)
+            keep=p<start+self.chunk_size
+            rows.append(r[keep])
+            positions.append(p[keep])
+            scores.append(s[keep])
+        rows=numpy.concatenate(rows)
+        strand=numpy.where(rows%self.strands,-1,1)
+        return (rows//self.strands,numpy.concatenate(positions),strand,
+                numpy.concatenate(scores))
+
+    def scan(self,records,processes=None,records_per_job=100):
+        """
+        returns a HitTable with the hits of all motifs in all the records
+
+        records         - iterator of SeqRecord objects
+        processes       - number of worker processes, default is the number
+                          of CPUs.  Use 1 to search in this process.
+        records_per_job - number of records sent to a worker at a time
+
+        Each worker process gets a copy of the scanner once.  Without the
+        multiprocessing module (Python 2.6 or later) the records are
+        searched in this process.  The hits are in the order of the records.
+        """
+        if records_per_job<1:
+            raise ValueError("records_per_job must be at least one")
+        try:
+            import multiprocessing
+        except ImportError:
+            multiprocessing=None
+        if processes is None:
+            if multiprocessing:
+                processes=multiprocessing.cpu_count()
+            else:
+                processes=1
+        elif processes<1:
+            raise ValueError("Need at least one process")
+        ids=[]
+        columns=[[],[],[],[],[]]
+        def add(results):
+            for id,motif,position,strand,score in results:
+                columns[0].append(numpy.zeros(len(score),numpy.intp)+len(ids))
+                for column,values in zip(columns[1:],(motif,position,strand,score)):
+                    column.append(values)
+                ids.append(id)
+        if processes==1 or multiprocessing is None:
+            for job in _jobs(records,records_per_job):
+                add(_search_sequences(self,job))
+        else:
+            pool=multiprocessing.Pool(processes,_init_worker,(self,))
+            try:
+                #Keep a few jobs per worker queued, but don't read all the
+                #records into memory at once
+                pending=[]
+                for job in _jobs(records,records_per_job):
+                    pending.append(pool.apply_async(_search_job,(job,)))
+                    if len(pending)>2*processes:
+                        add(pending.pop(0).get())
+                for result in pending:
+                    add(result.get())
+                pool.close()
+            finally:
+                pool.terminate()
+                pool.join()
+        if ids:
+            columns=[numpy.concatenate(c) for c in columns]
+        else:
+            columns=[numpy.zeros(0,numpy.intp)]*4+[numpy.zeros(0)]
+        return HitTable(ids,self.names,*columns)
+
+def _jobs(records,records_per_job):
+    """Groups the records into lists of (id, sequence string) (PRIVATE)."""
+    job=[]
+    for record in records:
+        job.append((record.id,record.seq.tostring()))
+        if len(job)==records_per_job:
+            yield job
+            job=[]
+    if job:
+        yield job
+
+def _search_sequences(scanner,job):
+    """Searches a list of (id, sequence string) with a scanner (PRIVATE)."""
+    return [(id,)+scanner.search(sequence) for id,sequence in job]
+
+#Set in each worker process by _init_worker
+_scanner=None
+
+def _init_worker(scanner):
+    """Keeps the scanner sent to a worker process (PRIVATE)."""
+    global _scanner
+    _scanner=scanner
+
+def _search_job(job):
+    """Searches a list of (id, sequence string) in a worker process (PRIVATE)."""
+    return _search_sequences(_scanner,job)
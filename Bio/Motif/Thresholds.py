@@ -5,6 +5,12 @@
 # as part of this package.
 from __future__ import generators
 import math,random
+import bisect
+try:
+    import numpy
+except ImportError:
+    #The distributions are computed in pure Python
+    numpy = None
 
 class score_distribution:
     """ Class representing approximate score distribution for a given motif.
@@ -23,8 +29,15 @@ class score_distribution:
         self.bg_density=[0.0]*self.n_points
         self.bg_density[-self._index_diff(self.min_score)]=1.0
         self.ic=motif.ic()
+        if numpy is not None:
+            self.mo_density=numpy.array(self.mo_density)
+            self.bg_density=numpy.array(self.bg_density)
         for lo,mo in zip(motif.log_odds(),motif.pwm()):
             self.modify(lo,mo,motif.background)
+        if numpy is not None:
+            self.mo_density=self.mo_density.tolist()
+            self.bg_density=self.bg_density.tolist()
+        self._bg_tail=None
         
     def _index_diff(self,x,y=0.0):
         return int((x-y+0.5*self.step)//self.step)
@@ -33,6 +46,37 @@ class score_distribution:
         return max(0,min(self.n_points-1,i+j))
         
     def modify(self,scores,mo_probs,bg_probs):
+        if isinstance(self.mo_density,list):
+            self._modify_list(scores,mo_probs,bg_probs)
+        else:
+            self._modify_array(scores,mo_probs,bg_probs)
+
+    def _modify_array(self,scores,mo_probs,bg_probs):
+        """Adds a column to the distributions held as NumPy arrays (PRIVATE).
+
+        Shifts the whole distribution at once for each letter, instead of
+        looping over the points in Python.
+        """
+        n=self.n_points
+        mo_new=numpy.zeros(n)
+        bg_new=numpy.zeros(n)
+        for k in scores.keys():
+            d=max(-n+1,min(n-1,self._index_diff(scores[k])))
+            for new,density,p in ((mo_new,self.mo_density,mo_probs[k]),
+                                  (bg_new,self.bg_density,bg_probs[k])):
+                if d>=0:
+                    new[d:]+=density[:n-d]*p
+                    #points shifted past the end stay at the end
+                    new[-1]+=density[n-d:].sum()*p
+                else:
+                    new[:n+d]+=density[-d:]*p
+                    new[0]+=density[:-d].sum()*p
+        self.mo_density=mo_new
+        self.bg_density=bg_new
+        self._bg_tail=None
+
+    def _modify_list(self,scores,mo_probs,bg_probs):
+        """Adds a column to the distributions held as lists (PRIVATE)."""
         mo_new=[0.0]*self.n_points
         bg_new=[0.0]*self.n_points
         for k in scores.keys():
@@ -42,16 +86,34 @@ class score_distribution:
                 bg_new[self._add(i,d)]+=self.bg_density[i]*bg_probs[k]
         self.mo_density=mo_new
         self.bg_density=bg_new
+        self._bg_tail=None
         
+    def _tail(self):
+        """Cumulative background probability from the top score down (PRIVATE).
+
+        Entry j is the probability of the n_points-1-j highest points.
+        """
+        if self._bg_tail is None:
+            tail=[]
+            prob=0.0
+            for x in self.bg_density[::-1]:
+                prob+=x
+                tail.append(prob)
+            self._bg_tail=tail
+        return self._bg_tail
+
     def threshold_fpr(self,fpr):
         """
         Approximate the log-odds threshold which makes the type I error (false positive rate).
+
+        The cumulative probabilities are computed once, so finding the
+        threshold for many p-values is fast.
         """
-        i=self.n_points
-        prob=0.0
-        while prob<fpr:
-            i-=1
-            prob+=self.bg_density[i]
+        if fpr<=0:
+            i=self.n_points
+        else:
+            j=bisect.bisect_left(self._tail(),fpr)
+            i=max(0,self.n_points-1-j)
         return self.min_score+i*self.step
             
     def threshold_fnr(self,fnr):
@@ -89,3 +151,31 @@ class score_distribution:
         are not directly comparable.
         """
         return self.threshold_fpr(fpr=2**-self.ic)
+
+#Most recently used distributions, at most cache_size of them
+cache_size=32
+_distributions={}
+_recent=[]
+
+def cached_score_distribution(motif,precision=10**3):
+    """Returns the score_distribution of a motif, computing it only once.
+
+    The distributions are kept for motifs with the same log-odds, PWM and
+    background, so scanning with a collection of motifs again (or copies
+    of the same motifs) does not recompute them.  Only the cache_size most
+    recently used distributions are kept.
+    """
+    key=(precision,
+         tuple([tuple(sorted(lo.items())) for lo in motif.log_odds()]),
+         tuple([tuple(sorted(mo.items())) for mo in motif.pwm()]),
+         tuple(sorted(motif.background.items())))
+    try:
+        distribution=_distributions[key]
+        _recent.remove(key)
+    except KeyError:
+        distribution=score_distribution(motif,precision)
+        _distributions[key]=distribution
+    _recent.append(key)
+    while len(_recent)>cache_size:
+        del _distributions[_recent.pop(0)]
+    return distribution
@@ -0,0 +1,330 @@
+#
+# ArrayTree.py
+#
+# This code is part of the Biopython distribution and governed by its
+# license. Please see the LICENSE file that should have been included
+# as part of this package.
+#
+"""Compact array representation of a phylogenetic tree (requires NumPy).
+
+Trees.Tree stores a tree as a chain of node objects, and methods like
+common_ancestor, distance or is_monophyletic walk the tree each time they
+are called. For repeated queries on large trees (e.g. all the pairwise
+distances of a tree with thousands of taxa) convert it to an ArrayTree:
+
+>>> from Bio.Nexus.Trees import Tree
+>>> from Bio.Nexus.ArrayTree import ArrayTree
+>>> at=ArrayTree(Tree('((a:1,b:2):0.5,c:3);'))
+>>> taxa,matrix=at.distance_matrix()
+
+The nodes of an ArrayTree are numbered in preorder, so the root is node 0,
+every node comes after its parent and each subtree is a contiguous range
+of nodes. The tree is stored in arrays of parent indices and branchlengths
+(and lists of the taxon, support and comment of each node). Common
+ancestors are found in constant time from a range minimum query on an
+Euler tour of the tree, after a precomputation of O(n log n).
+
+An ArrayTree is a snapshot of a Tree: changes to one are not reflected in
+the other. Use to_tree to get a Tree back.
+"""
+
+import numpy
+
+import Nodes
+from Trees import Tree, NodeData, TreeError
+
+class ArrayTree:
+    """Phylogenetic tree stored in arrays, with nodes numbered in preorder.
+
+    Attributes:
+    parent        - array of the parent of each node (-1 for the root)
+    branchlength  - array of the branchlength of each node
+    taxon         - list of the taxon of each node (None for internal nodes)
+    support       - list of the support of each node
+    comment       - list of the comment of each node
+    node_ids      - list of the node ids in the Tree the ArrayTree was made of
+    size          - array of the number of nodes in the subtree of each node
+    postorder     - array of the nodes in postorder
+    terminals     - array of the terminal nodes, in preorder
+    root_distance - array of the sum of branchlengths from the root to each node
+    """
+
+    def __init__(self,tree):
+        """Make an ArrayTree of a Trees.Tree instance.
+
+        at = ArrayTree(tree)
+        """
+        self.name=tree.name
+        self.weight=tree.weight
+        self.rooted=tree.rooted
+        self.dataclass=tree.dataclass
+        parent=[]
+        node_ids=[]
+        # iterative preorder walk, the stack holds (node id, parent index)
+        stack=[(tree.root,-1)]
+        while stack:
+            node_id,parent_index=stack.pop()
+            parent.append(parent_index)
+            index=len(node_ids)
+            node_ids.append(node_id)
+            succ=tree.node(node_id).succ
+            for i in range(len(succ)-1,-1,-1):
+                stack.append((succ[i],index))
+        self.node_ids=node_ids
+        self.index=dict([(node_id,i) for i,node_id in enumerate(node_ids)])
+        data=[tree.node(node_id).data for node_id in node_ids]
+        self.taxon=[d.taxon for d in data]
+        self.support=[d.support for d in data]
+        self.comment=[d.comment for d in data]
+        self.parent=numpy.array(parent,int)
+        self.branchlength=numpy.array([d.branchlength or 0.0 for d in data],float)
+        self._index_arrays()
+
+    def _index_arrays(self):
+        """Calculate the arrays derived from parent and branchlength (PRIVATE)."""
+        n=len(self.parent)
+        parent=self.parent.tolist()
+        # subtree sizes, adding each node to its parent in reverse preorder
+        size=[1]*n
+        for i in range(n-1,0,-1):
+            size[parent[i]]+=size[i]
+        self.size=numpy.array(size,int)
+        root_distance=[0.0]*n
+        branchlength=self.branchlength.tolist()
+        for i in range(1,n):
+            root_distance[i]=root_distance[parent[i]]+branchlength[i]
+        self.root_distance=numpy.array(root_distance,float)
+        self.terminals=numpy.nonzero(self.size==1)[0]
+        # children of each node, in order, as a compressed list
+        order=numpy.argsort(self.parent[1:],kind='mergesort')+1
+        self._children=order
+        self._child_start=numpy.searchsorted(self.parent[order],numpy.arange(n+1))
+        self.postorder=numpy.array(self._postorder(),int)
+        self._euler_tour()
+
+    def _postorder(self):
+        """Return a list of the nodes in postorder (PRIVATE)."""
+        answer=[]
+        children=self._children.tolist()
+        start=self._child_start.tolist()
+        stack=[(0,False)]
+        while stack:
+            node,done=stack.pop()
+            if done:
+                answer.append(node)
+                continue
+            stack.append((node,True))
+            for i in range(start[node+1]-1,start[node]-1,-1):
+                stack.append((children[i],False))
+        return answer
+
+    def _euler_tour(self):
+        """Precompute the range minimum queries of the Euler tour (PRIVATE).
+
+        The Euler tour lists the nodes as they are visited by a depth first
+        walk, returning to the parent after each child. As the nodes are
+        numbered in preorder, the common ancestor of two nodes is the
+        smallest node on the tour between their first visits.
+        """
+        n=len(self.parent)
+        parent=self.parent.tolist()
+        # Before the first visit of node i, the tour has visited the i
+        # nodes before it in preorder, and returned from those which are
+        # not its ancestors, so the first visit is at 2*i-depth(i).
+        depth=[0]*n
+        for i in range(1,n):
+            depth[i]=depth[parent[i]]+1
+        self._first=2*numpy.arange(n)-numpy.array(depth,int)
+        tour=numpy.zeros(2*n-1,int)
+        tour[self._first]=numpy.arange(n)
+        # The subtree of node i takes 2*size(i)-1 places on the tour, which
+        # then returns to the parent of node i.
+        tour[self._first[1:]+2*self.size[1:]-1]=self.parent[1:]
+        self._tour=tour
+        # sparse table: _table[k][j] is the minimum of tour[j:j+2**k]
+        table=[tour]
+        k=1
+        while 2**k<=len(tour):
+            previous=table[-1]
+            half=2**(k-1)
+            table.append(numpy.minimum(previous[:-half],previous[half:]))
+            k+=1
+        self._table=table
+
+    def _lca(self,nodes1,nodes2):
+        """Common ancestors of arrays of nodes (PRIVATE)."""
+        first1=self._first[nodes1]
+        first2=self._first[nodes2]
+        start=numpy.minimum(first1,first2)
+        end=numpy.maximum(first1,first2)+1
+        # the largest power of two fitting in each range
+        k=numpy.log2(end-start).astype(int)
+        answer=numpy.zeros(numpy.shape(start),int)
+        for level in numpy.unique(k):
+            select=(k==level)
+            row=self._table[level]
+            answer[select]=numpy.minimum(row[start[select]],
+                                         row[end[select]-2**level])
+        return answer
+
+    def __len__(self):
+        """Number of nodes in the tree."""
+        return len(self.parent)
+
+    def node(self,node_id):
+        """Return the index in the ArrayTree of a node id of the original Tree.
+
+        index = node(self,node_id)
+        """
+        try:
+            return self.index[node_id]
+        except KeyError:
+            raise TreeError('Unknown node_id: %d' % node_id)
+
+    def search_taxon(self,taxon):
+        """Return the first node (in preorder) with the given taxon, None if not found.
+
+        index = search_taxon(self,taxon)
+        """
+        try:
+            return self.taxon.index(taxon)
+        except ValueError:
+            return None
+
+    def children(self,node):
+        """Return the children of a node, as an array.
+
+        children = children(self,node)
+        """
+        return self._children[self._child_start[node]:self._child_start[node+1]]
+
+    def get_taxa(self,node=0):
+        """Return a list of all the taxa downwards from a node (default the root).
+
+        taxa = get_taxa(self,node=0)
+        """
+        end=node+self.size[node]
+        first,last=numpy.searchsorted(self.terminals,[node,end])
+        return [self.taxon[i] for i in self.terminals[first:last]]
+
+    def common_ancestor(self,node1,node2):
+        """Return the common ancestor of two nodes, or two arrays of nodes.
+
+        node = common_ancestor(self,node1,node2)
+        """
+        answer=self._lca(numpy.asarray(node1),numpy.asarray(node2))
+        if answer.shape==():
+            return int(answer)
+        return answer
+
+    def sum_branchlength(self,root=0,node=None):
+        """Adds up the branchlengths from root (default the root) to node.
+
+        sum = sum_branchlength(self,root=0,node=None)
+        """
+        if node is None:
+            raise TreeError('Missing node id.')
+        return self.root_distance[node]-self.root_distance[root]
+
+    def distance(self,node1,node2):
+        """Return the sum of the branchlengths between two nodes (or arrays of nodes).
+
+        dist = distance(self,node1,node2)
+        """
+        node1=numpy.asarray(node1)
+        node2=numpy.asarray(node2)
+        ancestor=self._lca(node1,node2)
+        return self.root_distance[node1]+self.root_distance[node2]\
+               -2*self.root_distance[ancestor]
+
+    def is_monophyletic(self,taxon_list):
+        """Return the common ancestor if taxon_list is monophyletic, -1 otherwise.
+
+        result = is_monophyletic(self,taxon_list)
+        """
+        if isinstance(taxon_list,str):
+            taxon_list=[taxon_list]
+        wanted={}
+        for taxon in taxon_list:
+            wanted[taxon]=True
+        nodes=[i for i in self.terminals if self.taxon[i] in wanted]
+        if not nodes or len(nodes)!=len(wanted):
+            return -1
+        # the common ancestor of the nodes with the first and last visit
+        first=self._first[nodes]
+        ancestor=self.common_ancestor(nodes[first.argmin()],nodes[first.argmax()])
+        end=ancestor+self.size[ancestor]
+        first,last=numpy.searchsorted(self.terminals,[ancestor,end])
+        if last-first==len(nodes):
+            return ancestor
+        return -1
+
+    def distance_matrix(self,taxa=None):
+        """Return the taxa and the matrix of their patristic distances.
+
+        taxa,matrix = distance_matrix(self,taxa=None)
+
+        taxa is a list of taxon names, default all the terminal nodes in
+        preorder. The matrix is a square NumPy array in the same order.
+        The taxa may include those of internal nodes.
+        """
+        if taxa is None:
+            nodes=self.terminals
+            taxa=[self.taxon[i] for i in nodes]
+        else:
+            nodes=[]
+            for taxon in taxa:
+                node=self.search_taxon(taxon)
+                if node is None:
+                    raise TreeError('Unknown taxon: %s' % taxon)
+                nodes.append(node)
+            nodes=numpy.array(nodes,int)
+        # work on the nodes in preorder, where each subtree is a block
+        nodes,order=numpy.unique(nodes,return_inverse=True)
+        root_distance=self.root_distance[nodes]
+        matrix=root_distance[:,numpy.newaxis]+root_distance[numpy.newaxis,:]
+        # the pairs of nodes in different subtrees of a node have it as
+        # their common ancestor
+        for ancestor in numpy.nonzero(self.size>1)[0]:
+            start,end=numpy.searchsorted(nodes,[ancestor,ancestor+self.size[ancestor]])
+            if end-start<2:
+                continue
+            children=self.children(ancestor)
+            bounds=numpy.searchsorted(nodes,children).tolist()+[end]
+            twice=2*self.root_distance[ancestor]
+            if nodes[start]==ancestor:
+                # the ancestor itself and the nodes below it
+                matrix[start,start+1:end]-=twice
+                matrix[start+1:end,start]-=twice
+            for i in range(len(children)):
+                for j in range(i+1,len(children)):
+                    matrix[bounds[i]:bounds[i+1],bounds[j]:bounds[j+1]]-=twice
+                    matrix[bounds[j]:bounds[j+1],bounds[i]:bounds[i+1]]-=twice
+        matrix[numpy.arange(len(nodes)),numpy.arange(len(nodes))]=0.0
+        if len(order)!=len(nodes) or (order!=numpy.arange(len(order))).any():
+            matrix=matrix[order][:,order]
+        return taxa,matrix
+
+    def to_tree(self):
+        """Return a Trees.Tree of the ArrayTree.
+
+        tree = to_tree(self)
+        """
+        tree=Tree(weight=self.weight,rooted=self.rooted,name=self.name,data=self.dataclass)
+        node_ids=[tree.root]
+        self._set_data(tree.node(tree.root).data,0)
+        parent=self.parent.tolist()
+        for i in range(1,len(parent)):
+            data=self.dataclass()
+            self._set_data(data,i)
+            node=Nodes.Node(data)
+            tree.add(node,node_ids[parent[i]])
+            node_ids.append(node.id)
+        return tree
+
+    def _set_data(self,data,i):
+        """Copy the data of node i to a NodeData instance (PRIVATE)."""
+        data.taxon=self.taxon[i]
+        data.branchlength=float(self.branchlength[i])
+        data.support=self.support[i]
+        data.comment=self.comment[i]
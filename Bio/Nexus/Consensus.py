@@ -0,0 +1,425 @@
+#
+# Consensus.py
+#
+# This code is part of the Biopython distribution and governed by its
+# license. Please see the LICENSE file that should have been included
+# as part of this package.
+#
+"""Count clades in many trees, for consensus trees and clade support.
+
+A CladeCounter numbers the taxa once, and stores each clade as an integer
+with one bit set per taxon, so clades from different trees are compared
+by their hash rather than as lists of taxon names. The trees can be Tree
+objects or newick strings; the strings are read with a simple scanner
+instead of the Tree parser, and can be shared out to worker processes.
+Counting a large file of bootstrap trees is then a single pass over the
+file:
+
+>>> from Bio.Nexus.Consensus import CladeCounter, parse_newick
+>>> counter=CladeCounter(outgroup=['t1'])
+>>> counter.add_trees(parse_newick(open('bootstrap.tre')),processes=4)
+>>> constree=counter.consensus(threshold=0.5)
+>>> counter.map_support(mltree)
+
+Trees.consensus and Tree.merge_with_support use a CladeCounter.
+"""
+
+import re
+
+import Nodes
+from Trees import Tree, NodeData, TreeError, NODECOMMENT_START
+
+def parse_newick(handle):
+    """Iterate over the newick tree descriptions in a file, one at a time.
+
+    Each tree ends with a semicolon, and may span several lines.
+    """
+    lines=[]
+    for line in handle:
+        while ';' in line:
+            end=line.index(';')
+            lines.append(line[:end])
+            tree=''.join(lines).strip()
+            if tree:
+                yield tree
+            lines=[]
+            line=line[end+1:]
+        lines.append(line)
+    tree=''.join(lines).strip()
+    if tree:
+        yield tree
+
+_newick_tokens=re.compile(r'([(),])')
+
+class CladeCounter:
+    """Count the clades (with their tree weights) found in a set of trees.
+
+    Each tree is rooted with the outgroup (if given) as in
+    Tree.root_with_outgroup, without changing the trees themselves. All
+    the trees must have the same taxa.
+    """
+    def __init__(self,taxa=None,outgroup=None):
+        """Start counting, with a list of the taxa (default those of the first tree).
+
+        counter = CladeCounter(self,taxa=None,outgroup=None)
+        """
+        self.counts={}
+        self.trees=0
+        self.dataclass=NodeData
+        self.taxa=None
+        if isinstance(outgroup,str):
+            outgroup=[outgroup]
+        self.outgroup=outgroup
+        if taxa is not None:
+            self._set_taxa(taxa)
+
+    def _set_taxa(self,taxa):
+        """Number the taxa (PRIVATE)."""
+        self.taxa=list(taxa)
+        self.index={}
+        for i,taxon in enumerate(self.taxa):
+            self.index[taxon]=i
+        if len(self.index)!=len(self.taxa):
+            raise TreeError('Duplicate taxa in %s' % taxa)
+        self.all_taxa=(1L<<len(self.taxa))-1
+        self.outgroup_clade=None
+        if self.outgroup:
+            outgroup_clade=0
+            for taxon in self.outgroup:
+                if taxon not in self.index:
+                    # as for Tree.root_with_outgroup, the trees can't be rooted
+                    break
+                outgroup_clade|=1L<<self.index[taxon]
+            else:
+                self.outgroup_clade=outgroup_clade
+
+    def clade(self,taxa):
+        """Return the bits of a list of taxa.
+
+        bits = clade(self,taxa)
+        """
+        bits=0L
+        for taxon in taxa:
+            bits|=1L<<self.index[taxon]
+        return bits
+
+    def clade_taxa(self,bits):
+        """Return the list of the taxa of a clade, in the order of self.taxa.
+
+        taxa = clade_taxa(self,bits)
+        """
+        return [taxon for i,taxon in enumerate(self.taxa) if bits>>i&1]
+
+    def _node_clades(self,tree):
+        """Return a dictionary of the clade of each node of a Tree, by node id (PRIVATE)."""
+        clades={}
+        stack=[(tree.root,False)]
+        while stack:
+            node_id,done=stack.pop()
+            node=tree.node(node_id)
+            if not done and node.succ:
+                stack.append((node_id,True))
+                for succ in node.succ:
+                    stack.append((succ,False))
+            elif node.succ:
+                bits=0L
+                for succ in node.succ:
+                    bits|=clades[succ]
+                clades[node_id]=bits
+            else:
+                try:
+                    clades[node_id]=1L<<self.index[node.data.taxon]
+                except KeyError:
+                    raise TreeError('Trees for consensus must contain the same taxa')
+        return clades
+
+    def _tree_clades(self,tree):
+        """Return the clades of a Tree and the children of its root (PRIVATE)."""
+        if self.taxa is None:
+            self._set_taxa(tree.get_taxa())
+            self.dataclass=tree.dataclass
+        clades=self._node_clades(tree)
+        root=clades.pop(tree.root)
+        root_children=[clades[succ] for succ in tree.node(tree.root).succ]
+        return clades.values(),root_children,root,len(tree.get_terminals())
+
+    def _newick_clades(self,newick):
+        """Return the clades of a newick string and the children of its root (PRIVATE).
+
+        Taxon names are read as by Trees.Tree: up to a colon or a node
+        comment, ignoring white space at either end. Anything after a
+        closing parenthesis (support, branchlength) is skipped.
+        """
+        newick=newick.strip().replace('\n','').replace('\r','').rstrip(';')
+        if self.taxa is None:
+            raise TreeError('Give the taxa, or add a Tree first')
+        found=[]
+        # the bits and the children of each open clade
+        stack=[[0L,[]]]
+        root=None
+        previous=None
+        terminals=0
+        for token in _newick_tokens.split(newick):
+            if token=='(':
+                stack.append([0L,[]])
+            elif token==')':
+                if len(stack)<2:
+                    raise TreeError('Parentheses do not match in tree: '+newick)
+                bits,children=stack.pop()
+                if len(stack)==1:
+                    # the outer parentheses are the root
+                    root,root_children=bits,children
+                else:
+                    found.append(bits)
+                    stack[-1][0]|=bits
+                    stack[-1][1].append(bits)
+            elif token!=',' and previous!=')':
+                taxon=token
+                for end in (':',NODECOMMENT_START):
+                    if end in taxon:
+                        taxon=taxon[:taxon.index(end)]
+                taxon=taxon.strip()
+                if not taxon:
+                    continue
+                try:
+                    bits=1L<<self.index[taxon]
+                except KeyError:
+                    raise TreeError('Trees for consensus must contain the same taxa')
+                terminals+=1
+                found.append(bits)
+                stack[-1][0]|=bits
+                stack[-1][1].append(bits)
+            if token.strip():
+                previous=token
+        if len(stack)!=1 or root is None:
+            raise TreeError('Not a tree in newick format: '+newick)
+        return found,root_children,root,terminals
+
+    def _rooted(self,clades,root_children):
+        """Return the clades of a tree rooted with the outgroup (PRIVATE).
+
+        This gives the same clades as Tree.root_with_outgroup, which puts
+        the root on the branch separating the outgroup from the ingroup.
+        Every other branch splits the taxa in two, and gives the clade on
+        the side away from the root, i.e. the side within the outgroup or
+        within the ingroup.
+        """
+        outgroup=self.outgroup_clade
+        if outgroup is None or outgroup==self.all_taxa:
+            return clades
+        if len(root_children)==2 and outgroup in root_children:
+            return clades
+        if outgroup not in clades:
+            # as in Tree.root_with_outgroup, a paraphyletic outgroup is ignored
+            return clades
+        ingroup=self.all_taxa^outgroup
+        rooted=[outgroup,ingroup]
+        if len(root_children)==2:
+            # the two branches of a bifurcating root are one branch unrooted
+            skip=root_children[1]
+        else:
+            skip=None
+        for bits in clades:
+            other=self.all_taxa^bits
+            if bits==skip or bits==outgroup or other==outgroup:
+                continue
+            if not bits&outgroup or not bits&ingroup:
+                rooted.append(bits)
+            else:
+                rooted.append(other)
+        return rooted
+
+    def _count(self,clades,root,terminals,weight):
+        """Add the clades of one tree (PRIVATE)."""
+        if root!=self.all_taxa or terminals!=len(self.taxa):
+            raise TreeError('Trees for consensus must contain the same taxa')
+        counts=self.counts
+        for bits in clades:
+            counts[bits]=counts.get(bits,0.0)+weight
+        self.trees+=1
+
+    def add_tree(self,tree,weight=None):
+        """Add the clades of a Tree, or of a newick string.
+
+        add_tree(self,tree,weight=None)
+
+        The weight defaults to the weight of the Tree, or 1.0 for a string.
+        """
+        if isinstance(tree,str):
+            clades,root_children,root,terminals=self._newick_clades(tree)
+            if weight is None:
+                weight=1.0
+        else:
+            clades,root_children,root,terminals=self._tree_clades(tree)
+            if weight is None:
+                weight=tree.weight
+        self._count(self._rooted(clades,root_children),root,terminals,float(weight))
+
+    def add_trees(self,trees,processes=1,chunk_size=100):
+        """Add the clades of many trees (Tree objects or newick strings).
+
+        add_trees(self,trees,processes=1,chunk_size=100)
+
+        trees may be any iterator, e.g. from parse_newick, and is only
+        read once. With processes>1 (None meaning one per CPU), the newick
+        strings are sent chunk_size at a time to a pool of worker processes
+        using the multiprocessing module (Python 2.6 or later); Tree objects
+        are always counted in this process. The taxa must be known, from
+        the first Tree or the taxa argument, before strings are added.
+        """
+        try:
+            import multiprocessing
+        except ImportError:
+            multiprocessing=None
+        if processes is None:
+            if multiprocessing:
+                processes=multiprocessing.cpu_count()
+            else:
+                processes=1
+        elif processes<1:
+            raise ValueError('Need at least one process')
+        if chunk_size<1:
+            raise ValueError('chunk_size must be at least one')
+        if processes==1 or multiprocessing is None:
+            for tree in trees:
+                self.add_tree(tree)
+            return
+        pool=None
+        try:
+            pending=[]
+            chunk=[]
+            for tree in trees:
+                if not isinstance(tree,str):
+                    self.add_tree(tree)
+                    continue
+                if self.taxa is None:
+                    raise TreeError('Give the taxa, or add a Tree first')
+                chunk.append(tree)
+                if len(chunk)<chunk_size:
+                    continue
+                if pool is None:
+                    pool=multiprocessing.Pool(processes,_init_worker,
+                                              (self.taxa,self.outgroup))
+                pending.append(pool.apply_async(_count_chunk,(chunk,)))
+                chunk=[]
+                if len(pending)>2*processes:
+                    self._merge(*pending.pop(0).get())
+            for job in pending:
+                self._merge(*job.get())
+            for tree in chunk:
+                self.add_tree(tree)
+            if pool is not None:
+                pool.close()
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+    def _merge(self,counts,trees):
+        """Add the clade counts of another CladeCounter (PRIVATE)."""
+        for bits,weight in counts.iteritems():
+            self.counts[bits]=self.counts.get(bits,0.0)+weight
+        self.trees+=trees
+
+    def frequencies(self,threshold=0.0):
+        """Return a dictionary of the relative frequency of the clades, by their bits.
+
+        frequencies = frequencies(self,threshold=0.0)
+
+        Only clades with relative frequency>=threshold are included. As in
+        Trees.consensus, this is the sum of the weights of the trees with
+        the clade divided by the number of trees.
+        """
+        total=float(self.trees)
+        answer={}
+        for bits,weight in self.counts.iteritems():
+            frequency=weight/total
+            if frequency>=threshold:
+                answer[bits]=frequency
+        return answer
+
+    def consensus(self,threshold=0.5):
+        """Return the majority rule consensus tree of the clades with relative frequency>=threshold.
+
+        constree = consensus(self,threshold=0.5)
+        """
+        if not self.trees:
+            return None
+        clades=self.frequencies(threshold)
+        dataclass=self.dataclass
+        consensus=Tree(name='consensus_%2.1f' % float(threshold),data=dataclass)
+        consensus.node(consensus.root).data.support=None
+        consensus.node(consensus.root).data.taxon=None
+        # add the clades from the largest down, each to the smallest clade
+        # found so far that includes it (the last one including its taxa)
+        order=[(-_count_bits(bits),bits) for bits in clades if bits!=self.all_taxa]
+        order.sort()
+        owner=[consensus.root]*len(self.taxa)
+        node_bits={consensus.root:self.all_taxa}
+        for size,bits in order:
+            taxa=[i for i in range(len(self.taxa)) if bits>>i&1]
+            parent=owner[taxa[0]]
+            if node_bits[parent]&bits!=bits:
+                # conflicting clades (threshold<0.5), find the smallest
+                # superset as Trees.consensus does
+                parent=min([(_count_bits(b),node) for node,b in node_bits.items()
+                            if b&bits==bits])[1]
+            node=Nodes.Node(data=dataclass())
+            node.data.support=clades[bits]
+            if len(taxa)==1:
+                node.data.taxon=self.taxa[taxa[0]]
+            else:
+                node.data.taxon=None
+            consensus.add(node,parent)
+            node_bits[node.id]=bits
+            for i in taxa:
+                owner[i]=node.id
+        return consensus
+
+    def map_support(self,tree,threshold=0.5):
+        """Set the support of the clades of tree to their relative frequency.
+
+        map_support(self,tree,threshold=0.5)
+
+        As in Tree.merge_with_support, only the clades with relative
+        frequency>=threshold are given support.
+        """
+        if self.taxa is None:
+            return
+        clades=self.frequencies(threshold)
+        for node_id,bits in self._node_clades(tree).iteritems():
+            if node_id!=tree.root and bits in clades:
+                tree.node(node_id).data.support=clades[bits]
+
+def _count_bits(bits):
+    """Number of bits set (PRIVATE)."""
+    count=0
+    while bits:
+        bits&=bits-1
+        count+=1
+    return count
+
+#Set in each worker process by _init_worker
+_counter=None
+
+def _init_worker(taxa,outgroup):
+    """Set up the CladeCounter in each worker process (PRIVATE)."""
+    global _counter
+    _counter=CladeCounter(taxa,outgroup)
+
+def _count_chunk(chunk):
+    """Count the clades of a list of newick strings in a worker process (PRIVATE)."""
+    _counter.counts={}
+    _counter.trees=0
+    for tree in chunk:
+        _counter.add_tree(tree)
+    return _counter.counts,_counter.trees
+
+def consensus(trees,threshold=0.5,outgroup=None,processes=1):
+    """Compute a majority rule consensus tree of all clades with relative frequency>=threshold from a list of trees.
+
+    constree = consensus(trees,threshold=0.5,outgroup=None,processes=1)
+    """
+    counter=CladeCounter(outgroup=outgroup)
+    counter.add_trees(trees,processes=processes)
+    return counter.consensus(threshold)
@@ -759,12 +759,15 @@ class Tree(Nodes.Chain):
         else: # root with user specified outgroup
             self.root_with_outgroup(outgroup)
 
-        if bstrees: # calculate consensus 
-            constree=consensus(bstrees,threshold=threshold,outgroup=outgroup)
-        else:
-            if not constree.has_support():
-                constree.branchlength2support()
-            constree.root_with_outgroup(outgroup)
+        if bstrees: # count the clades of the bootstrap trees and map them on the phylogeny
+            from Consensus import CladeCounter
+            counter=CladeCounter(outgroup=outgroup)
+            counter.add_trees(bstrees)
+            counter.map_support(self,threshold=threshold)
+            return
+        if not constree.has_support():
+            constree.branchlength2support()
+        constree.root_with_outgroup(outgroup)
         # now we travel all nodes, and add support from consensus, if the clade is present in both
         for pnode in self._walk():
             cnode=constree.is_monophyletic(self.get_taxa(pnode))
@@ -773,77 +776,13 @@ class Tree(Nodes.Chain):
 
          
 def consensus(trees, threshold=0.5,outgroup=None):
-    """Compute a majority rule consensus tree of all clades with relative frequency>=threshold from a list of trees."""
+    """Compute a majority rule consensus tree of all clades with relative frequency>=threshold from a list of trees.
 
-    total=len(trees)
-    if total==0:
-        return None
-    # shouldn't we make sure that it's NodeData or subclass??
-    dataclass=trees[0].dataclass
-    max_support=trees[0].max_support
-    clades={}
-    #countclades={}
-    alltaxa=set(trees[0].get_taxa())
-    # calculate calde frequencies
-    c=0
-    for t in trees:
-        c+=1
-        #print c
-        #if c%1==0:
-        #    print c
-        if alltaxa!=set(t.get_taxa()):
-            raise TreeError('Trees for consensus must contain the same taxa')
-        t.root_with_outgroup(outgroup=outgroup)
-        for st_node in t._walk(t.root):
-            subclade_taxa=t.get_taxa(st_node)
-            subclade_taxa.sort()
-            subclade_taxa=str(subclade_taxa) # lists are not hashable
-            if subclade_taxa in clades:
-                clades[subclade_taxa]+=float(t.weight)/total
-            else:
-                clades[subclade_taxa]=float(t.weight)/total
-            #if subclade_taxa in countclades:
-            #    countclades[subclade_taxa]+=t.weight
-            #else:
-            #    countclades[subclade_taxa]=t.weight
-    # weed out clades below threshold
-    for (c,p) in clades.items():
-        if p<threshold:
-            del clades[c]
-    # create a tree with a root node
-    consensus=Tree(name='consensus_%2.1f' % float(threshold),data=dataclass)
-    # each clade needs a node in the new tree, add them as isolated nodes
-    for (c,s) in clades.items():
-        node=Nodes.Node(data=dataclass())
-        node.data.support=s
-        node.data.taxon=set(eval(c))
-        consensus.add(node)
-    # set root node data
-    consensus.node(consensus.root).data.support=None
-    consensus.node(consensus.root).data.taxon=alltaxa
-    # we sort the nodes by no. of taxa in the clade, so root will be the last
-    consensus_ids=consensus.all_ids()
-    consensus_ids.sort(lambda x,y:len(consensus.node(x).data.taxon)-len(consensus.node(y).data.taxon))
-    # now we just have to hook each node to the next smallest node that includes all taxa of the current 
-    for i,current in enumerate(consensus_ids[:-1]): # skip the last one which is the root
-        #print '----'
-        #print 'current: ',consensus.node(current).data.taxon
-        # search remaining nodes
-        for parent in consensus_ids[i+1:]:
-            #print 'parent: ',consensus.node(parent).data.taxon
-            if consensus.node(parent).data.taxon.issuperset(consensus.node(current).data.taxon):
-                break
-        else:
-            sys.exit('corrupt tree structure?')
-        # internal nodes don't have taxa
-        if len(consensus.node(current).data.taxon)==1:
-            consensus.node(current).data.taxon=consensus.node(current).data.taxon.pop()
-            # reset the support for terminal nodes to maximum
-            #consensus.node(current).data.support=max_support
-        else:
-            consensus.node(current).data.taxon=None
-        consensus.link(parent,current)
-    # eliminate root taxon name
-    consensus.node(consensus_ids[-1]).data.taxon=None 
-    return consensus
+    The clades are counted by a Consensus.CladeCounter, see there for large
+    sets of trees (e.g. newick strings from a file, or several processes).
+    """
 
+    from Consensus import CladeCounter
+    counter=CladeCounter(outgroup=outgroup)
+    counter.add_trees(trees)
+    return counter.consensus(threshold)
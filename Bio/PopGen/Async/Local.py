@@ -7,11 +7,48 @@
 Asynchronous local execution.
 
 Supports multicore architectures.
+
+The tasks are run in a pool of worker processes (multiprocessing.Pool),
+so hooks must be picklable, and the input and output streams are passed
+as strings to and from the workers. On Python 2.5 or older, the tasks are
+run in threads of this process instead.
 '''
 
 from Bio.PopGen.Async import Async, FileRetriever
 
 import thread
+import traceback
+from StringIO import StringIO
+
+try:
+    import multiprocessing
+except ImportError:
+    #Python 2.5 or older
+    multiprocessing = None
+
+def _read_files(files):
+    '''Reads (and closes) a dictionary of streams into strings.
+    '''
+    texts = {}
+    for name, stream in (files or {}).items():
+        texts[name] = stream.read()
+        stream.close()
+    return texts
+
+def _run_job(hook, parameters, input_texts):
+    '''Runs a task in a worker process.
+
+       returns:
+       (return_code, output texts, error), error is None or a traceback.
+    '''
+    try:
+        input_files = {}
+        for name, text in input_texts.items():
+            input_files[name] = StringIO(text)
+        ret_code, output_files = hook.run_job(parameters, input_files)
+        return ret_code, _read_files(output_files), None
+    except Exception:
+        return None, {}, traceback.format_exc()
 
 class Local(Async):
     '''Execution on Local machine.
@@ -27,6 +64,7 @@ class Local(Async):
         Async.__init__(self)
         self.num_cores = num_cores
         self.cores_used = 0
+        self.pool = None
 
     def _run_program(self, id, hook, parameters, input_files):
         '''Run program.
@@ -36,17 +74,33 @@ class Local(Async):
            Either runs a program if a core is available or
            schedules it.
         '''
+        if multiprocessing is None:
+            self.access_ds.acquire()
+            self.waiting.append((id, hook, parameters, input_files))
+            if self.cores_used < self.num_cores:
+                self.cores_used += 1
+                thread.start_new_thread(self.start_work, ())
+            self.access_ds.release()
+            return
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.num_cores)
+        input_texts = _read_files(input_files)
         self.access_ds.acquire()
-        self.waiting.append((id, hook, parameters, input_files))
-        if self.cores_used < self.num_cores:
-            self.cores_used += 1
-            thread.start_new_thread(self.start_work, ())
+        self.running[id] = True
         self.access_ds.release()
+        def callback(result, id = id):
+            ret_code, output_texts, error = result
+            output_files = {}
+            for name, text in output_texts.items():
+                output_files[name] = StringIO(text)
+            self._job_done(id, ret_code, output_files, error)
+        self.pool.apply_async(_run_job, (hook, parameters, input_texts),
+                              callback = callback)
 
     def start_work(self):
         '''Starts work.
 
-           Thread initial point.
+           Thread initial point (without multiprocessing).
            While there are tasks to be done, runs them.
            The thread dies as soon as there is nothing waiting to be
            executed.
@@ -57,10 +111,21 @@ class Local(Async):
             del self.waiting[0]
             self.running[id] = True
             self.access_ds.release()
-            ret_code, output_files = hook.run_job(parameters, input_files)
+            try:
+                ret_code, output_files = hook.run_job(parameters, input_files)
+                error = None
+            except Exception:
+                ret_code, output_files = None, {}
+                error = traceback.format_exc()
+            self._job_done(id, ret_code, output_files, error)
             self.access_ds.acquire()
-            del self.running[id]
-            self.done[id] = ret_code, output_files
         self.cores_used -= 1
         self.access_ds.release()
-  
+
+    def close(self):
+        '''Stops the worker processes, after the tasks are done.
+        '''
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
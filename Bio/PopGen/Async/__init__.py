@@ -10,7 +10,7 @@ Support for asynchronous execution.
 '''
 
 import os
-import thread
+import threading
 
 
 class Async:
@@ -25,14 +25,16 @@ class Async:
 
            Initializes the queues, among other things.
            Of notice, is the access_ds lock for controlling exclusive
-               access to this object.
+               access to this object. It is a condition, notified
+               whenever a task is done.
         '''
         self.running = {}
         self.waiting = []
         self.done = {}
+        self.errors = {}
         self.id = 0
         self.hooks = {}
-        self.access_ds = thread.allocate_lock()
+        self.access_ds = threading.Condition()
 
     def run_program(self, program, parameters, input_files):
         '''Runs a program.
@@ -74,13 +76,58 @@ class Async:
             output stream.
         '''
         self.access_ds.acquire()
-        if id in self.done:
-            returnCode, fileObject = done[id]
-            del done[id]
+        try:
+            if id in self.done:
+                result = self.done[id]
+                del self.done[id]
+                return result
+            return None
+        finally:
+            self.access_ds.release()
+
+    def wait_result(self, id = None):
+        ''' Waits for a task to be done, and returns its results, the info
+            for that task is forgotten.
+
+            parameters:
+            id Id of the task, if None any task that is done.
+
+            returns:
+            (id, (return_code, output_files)) as get_result.
+        '''
+        self.access_ds.acquire()
+        try:
+            while True:
+                if id is None and len(self.done) > 0:
+                    done_id = self.done.keys()[0]
+                    break
+                elif id in self.done:
+                    done_id = id
+                    break
+                self.access_ds.wait()
+            result = self.done[done_id]
+            del self.done[done_id]
+            return done_id, result
+        finally:
             self.access_ds.release()
-        else:
+
+    def _job_done(self, id, ret_code, output_files, error = None):
+        '''Records the results of a task, for concrete classes.
+
+           If the task failed, error is the description (traceback) of
+           the problem, which is kept in errors, and the return code is
+           None.
+        '''
+        self.access_ds.acquire()
+        try:
+            if id in self.running:
+                del self.running[id]
+            if error is not None:
+                self.errors[id] = error
+            self.done[id] = ret_code, output_files
+            self.access_ds.notifyAll()
+        finally:
             self.access_ds.release()
-            return None
 
 class FileRetriever:
     '''An Abstract Support class to retrieve files.
@@ -16,8 +16,7 @@ SplitFDist splits a single Fdist execution in several, taking advantage
 """
 
 import os
-import thread
-from time import sleep
+import threading
 from Bio.PopGen.Async import Local
 from Bio.PopGen.FDist.Controller import FDistController
 
@@ -74,8 +73,8 @@ class SplitFDist:
            Parameters:
            report_fun - Function that is called when a single packet is
                run, it should have a single parameter: Fst.
-           num_thr - Number of desired threads, typically the number
-               of cores.
+           num_thr - Number of desired worker processes (threads on
+               Python 2.5 or older), typically the number of cores.
            split_size - Size that a full simulation will be split in.
            ext - Binary extension name (e.g. nothing on Unix, '.exe' on
                Windows).
@@ -84,8 +83,8 @@ class SplitFDist:
         self.async.hooks['fdist'] = FDistAsync(fdist_dir, ext)
         self.report_fun = report_fun
         self.split_size = split_size
+        self.error = None
 
-    #There might be races when reporting...
     def monitor(self):
         """Monitors and reports (using report_fun) execution.
 
@@ -95,36 +94,45 @@ class SplitFDist:
            called. This means that report_fun should be consider that
            other events might be happening while it is running (it
            can call acquire/release if necessary).
+
+           If a part fails, the other parts are still collected (the
+           directory of the failed part is kept), and the error is
+           kept in the error attribute, to be raised by join.
+        """
+        try:
+            try:
+                for i in range(len(self.parts)):
+                    done, (fst, files) = self.async.wait_result()
+                    if done in self.async.errors:
+                        if self.error is None:
+                            self.error = RuntimeError(
+                                "FDist failed in %s:\n%s" % (self.parts[done],
+                                self.async.errors[done]))
+                        continue
+                    out_dat = files['out.dat']
+                    f = open(self.data_dir + os.sep + 'out.dat','a')
+                    f.writelines(out_dat.readlines())
+                    f.close()
+                    out_dat.close()
+                    for file in os.listdir(self.parts[done]):
+                        os.remove (self.parts[done] + os.sep + file)
+                    os.rmdir(self.parts[done])
+                    if self.report_fun:
+                        self.report_fun(fst)
+            except Exception, e:
+                if self.error is None:
+                    self.error = e
+        finally:
+            self.async.close()
+
+    def join(self):
+        """Waits for the end of the run started by run_fdist.
+
+           Raises the error of the first part which failed, if any.
         """
-        while(True):
-            sleep(1)
-            self.async.access_ds.acquire()
-            keys =  self.async.done.keys()[:]
-            self.async.access_ds.release()
-            for done in keys:
-                self.async.access_ds.acquire()
-                fst, files = self.async.done[done]
-                del self.async.done[done]
-                out_dat = files['out.dat']
-                f = open(self.data_dir + os.sep + 'out.dat','a')
-                f.writelines(out_dat.readlines())
-                f.close()
-                out_dat.close()
-                self.async.access_ds.release()
-                for file in os.listdir(self.parts[done]):
-                    os.remove (self.parts[done] + os.sep + file)
-                os.rmdir(self.parts[done])
-                #print fst, out_dat
-                if self.report_fun:
-                    self.report_fun(fst)
-            self.async.access_ds.acquire()
-            if len(self.async.waiting) == 0 and len(self.async.running) == 0 \
-               and len(self.async.done) == 0:
-                break
-            self.async.access_ds.release()
-            #print 'R', self.async.running
-            #print 'W', self.async.waiting
-            #print 'R', self.async.running
+        self.monitor_thread.join()
+        if self.error is not None:
+            raise self.error
 
     def acquire(self):
         """Allows the external acquisition of the lock.
@@ -144,10 +152,13 @@ class SplitFDist:
            Parameters can be seen on FDistController.run_fdist.
 
            It will split a single execution in several parts and
-           create separated data directories.
+           create separated data directories. The parts are collected
+           by monitor, in a thread (monitor_thread); call join to wait
+           for the end of the run.
         """
         num_parts = num_sims/self.split_size
         self.parts = {}
+        self.error = None
         self.data_dir = data_dir
         for directory in range(num_parts):
            full_path = data_dir + os.sep + str(directory)
@@ -165,4 +176,5 @@ class SplitFDist:
                'data_dir'    : full_path
            }, {})
            self.parts[id] = full_path
-        thread.start_new_thread(self.monitor, ())
+        self.monitor_thread = threading.Thread(target = self.monitor)
+        self.monitor_thread.start()
@@ -1,37 +1,41 @@
 # Copyright 2007 by Tiago Antao <tiagoantao@gmail.com>.  All rights reserved.
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
 
 """
 This module allows to cache Simcoal2 results, and return on the fly
 in case the calculation was done. Async version
 
-This version will run Sincoal2 (if necessary) Asynchrously.
+This version will run Sincoal2 (if necessary) Asynchrously, as a hook
+of Bio.PopGen.Async (e.g. Local).
 
 """
 
-from logging import debug
-from sys import exit
 import os
-import tarfile
-import tempfile
 
-import SimCoalController
 import Cache
-import Config
-import Async
 
 class SimCoalCache(Cache.SimCoalCache):
-    def __init__(self, simcoalDir = None):
-        Cache.SimCoalCache.__init__(self, simcoalDir)
+    def __init__(self, data_dir, simcoal_dir = None, simulator = None):
+        Cache.SimCoalCache.__init__(self, data_dir, simcoal_dir, simulator)
 
-    def runJob(self, parameters, inputFiles):
+    def run_job(self, parameters, input_files):
+        """Runs SimCoal2 (if needed) for the Async framework.
+
+           parameters has parFile, numSims, ploydi (default '1') and
+           parDir (default '.'), where the par file is written (from
+           input_files) and the simulations are put.
+        """
         parFile = parameters['parFile']
         numSims = parameters['numSims']
         ploydi = parameters.get('ploydi', '1')
-        f = inputFiles[parFile]
+        parDir = parameters.get('parDir', '.')
+        f = input_files[parFile]
         text = f.read()
         f.close()
-        w = open (os.sep.join([Config.dataDir, 'SimCoal', 'runs', parFile]), 'w')
+        w = open(os.path.join(parDir, parFile), 'w')
         w.write(text)
         w.close()
-        self.run_simcoal(parFile, numSims, ploydi)
+        self.run_simcoal(parFile, numSims, ploydi, parDir)
         return 0, None
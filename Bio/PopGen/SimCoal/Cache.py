@@ -1,92 +1,207 @@
 # Copyright 2007 by Tiago Antao <tiagoantao@gmail.com>.  All rights reserved.
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
 
 """
 This module allows to cache Simcoal2 results, and return on the fly
 in case the calculation was done.
 
+The cache is keyed by the contents of the par file (not its name) and the
+ploidy, and keeps each simulation in its own file. When more simulations
+are asked for than are cached, only the missing ones are run. Several
+processes (or machines sharing the directory) can use the same cache at
+once: new simulations are run in a private directory and moved into the
+cache under unique names, so no locks are needed.
+
+Layout of the cache directory:
+  <key>/info          Name of the par file and ploidy (for listSimulations)
+  <key>/base          Number of the first simulation made by SimCoal2
+  <key>/sims/         One file per simulation
+  <key>/shared/       The other output files of the last run (e.g. the
+                      Arlequin batch file), without the model name
+  tmp/                Directories of the runs in progress
 """
 
-from logging import debug
-from sys import exit
 import os
-import tarfile
+import re
+import shutil
 import tempfile
-import SimCoalController
-import Config
+import time
+
+try:
+    from hashlib import sha1
+except ImportError:
+    #Python 2.4 or older
+    from sha import new as sha1
+
+from Controller import SimCoalController
 
 class SimCoalCache:
-    def __init__(self, simcoalDir = None):
+    #The output files of single simulations are <model>_<number>.arp
+    sim_pattern = r"_(\d+)\.arp$"
+
+    def __init__(self, data_dir, simcoal_dir = None, simulator = None):
         """Initializes the cache.
-        
-        simcoalDir - where the binaries are
 
-        IMPORTANT: The cache only makes sense if the file nameunivically
-        identifies the model.
-          For now use use the model name as key,
-          and it will probably stay like that.
+        data_dir - directory where the simulations are kept (created if
+            needed)
+        simcoal_dir - where the SimCoal2 binary is
+        simulator - object used to run the simulations, by default a
+            SimCoalController for simcoal_dir. It must have a run_simcoal
+            method like SimCoalController.
         """
-        self.cacheDir = os.sep.join([Config.dataDir, 'SimCoal', 'cache'])
-        if simcoalDir == None:
-            self.simcoalDir = Config.simcoalDir
-        else:
-            self.simcoalDir = simcoalDir
-
-
-    def run_simcoal(self, par_file, num_sims, ploydi = '1', parDir = None):
-        if parDir == None:
-            parDir = os.sep.join([Config.dataDir, 'SimCoal', 'runs'])
-        par_file_root = par_file[:-4]
-        tar_name = os.sep.join([self.cacheDir, ploydi, par_file_root + 
-            '.tar.bz2'])
-        if os.access(tar_name, os.R_OK):
-            tf = tarfile.open(tar_name)
-            tar_num_sims = len(tf.getmembers()) - 3
-        else:
-            tar_num_sims = 0
-        if tar_num_sims >= num_sims:
-            tf.extractall(parDir)
-            tf.close()
+        self.cache_dir = data_dir
+        if simulator is None:
+            simulator = SimCoalController(simcoal_dir)
+        self.simulator = simulator
+        self._makedirs(os.path.join(data_dir, 'tmp'))
+
+    def _makedirs(self, directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            #Maybe made by another process meanwhile
+            if not os.path.isdir(directory):
+                raise
+
+    def _write_once(self, filename, text):
+        """Writes a file, unless it exists (atomically)."""
+        if os.path.exists(filename):
             return
-        else:
+        temp = "%s.%i.tmp" % (filename, os.getpid())
+        f = open(temp, 'wb')
+        f.write(text)
+        f.close()
+        os.rename(temp, filename)
+
+    def key(self, par_text, ploydi = '1'):
+        """Returns the key of a model (the text of its par file).
+        """
+        return sha1("%s\0%s" % (ploydi, par_text)).hexdigest()
+
+    def _simulations(self, entry):
+        """Sorted list of the files of the cached simulations of an entry.
+        """
+        try:
+            names = os.listdir(os.path.join(entry, 'sims'))
+        except OSError:
+            return []
+        names = [name for name in names if not name.endswith('.tmp')]
+        names.sort()
+        return names
+
+    def _simulate(self, par_file, par_text, num_sims, ploydi, entry):
+        """Runs num_sims simulations and adds them to the cache entry.
+        """
+        root = par_file[:-4]
+        run_dir = tempfile.mkdtemp(dir = os.path.join(self.cache_dir, 'tmp'))
+        try:
+            f = open(os.path.join(run_dir, par_file), 'wb')
+            f.write(par_text)
+            f.close()
+            self.simulator.run_simcoal(par_file, num_sims, ploydi, run_dir)
+            out_dir = os.path.join(run_dir, root)
+            pattern = re.compile("^" + re.escape(root) + self.sim_pattern)
+            sims = []
+            shared = []
+            for name in os.listdir(out_dir):
+                match = pattern.match(name)
+                if match:
+                    sims.append((int(match.group(1)), name))
+                else:
+                    shared.append(name)
+            if len(sims) < num_sims:
+                raise IOError("SimCoal2 made %i simulations of %s instead "
+                              "of %i" % (len(sims), par_file, num_sims))
+            sims.sort()
+            self._makedirs(os.path.join(entry, 'sims'))
+            self._makedirs(os.path.join(entry, 'shared'))
+            self._write_once(os.path.join(entry, 'base'), str(sims[0][0]))
+            for name in shared:
+                if name.startswith(root):
+                    target = name[len(root):]
+                else:
+                    target = name
+                os.rename(os.path.join(out_dir, name),
+                          os.path.join(entry, 'shared', target))
+            #Unique names, sorted in the order the runs were made
+            run_id = "%013i-%i-%s" % (time.time() * 1000, os.getpid(),
+                                      os.path.basename(run_dir))
+            for i in range(len(sims)):
+                os.rename(os.path.join(out_dir, sims[i][1]),
+                          os.path.join(entry, 'sims',
+                                       "%s-%06i.arp" % (run_id, i)))
+        finally:
+            shutil.rmtree(run_dir, True)
+
+    def _copy_out(self, entry, root, sims, par_dir):
+        """Copies the simulations of an entry to par_dir/root, as SimCoal2
+        would have made them.
+        """
+        out_dir = os.path.join(par_dir, root)
+        self._makedirs(out_dir)
+        base = int(open(os.path.join(entry, 'base')).read())
+        for i in range(len(sims)):
+            shutil.copyfile(os.path.join(entry, 'sims', sims[i]),
+                            os.path.join(out_dir,
+                                         "%s_%i.arp" % (root, base + i)))
+        shared_dir = os.path.join(entry, 'shared')
+        for name in os.listdir(shared_dir):
+            if not name.endswith('.tmp'):
+                shutil.copyfile(os.path.join(shared_dir, name),
+                                os.path.join(out_dir, root + name))
+
+    def run_simcoal(self, par_file, num_sims, ploydi = '1', par_dir = '.'):
+        """Makes num_sims simulations of par_dir/par_file available.
+
+        The simulations are put in par_dir, as SimCoal2 would do. Only
+        the simulations which are not in the cache are run.
+        """
+        f = open(os.path.join(par_dir, par_file), 'rb')
+        par_text = f.read()
+        f.close()
+        entry = os.path.join(self.cache_dir, self.key(par_text, ploydi))
+        self._makedirs(entry)
+        self._write_once(os.path.join(entry, 'info'),
+                         "%s\n%s\n" % (par_file[:-4], ploydi))
+        sims = self._simulations(entry)
+        if len(sims) < num_sims:
+            self._simulate(par_file, par_text, num_sims - len(sims), ploydi,
+                           entry)
+            sims = self._simulations(entry)
+        self._copy_out(entry, par_file[:-4], sims[:num_sims], par_dir)
+
+    def _entries(self, ploidy):
+        """Lists (name, entry directory) of the cached models.
+        """
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            entry = os.path.join(self.cache_dir, key)
             try:
-                tf.close()
-            except NameError:
-                pass #not opened in the first place, OK.
-        scc = SimCoalController(self.simcoalDir)
-        scc.run_simcoal(par_file, num_sims, ploydi, parDir)
-        tf = tarfile.open(tar_name, 'w:bz2')
-        tf.add(os.sep.join([parDir, par_file_root]), par_file_root)
-        tf.close()
+                name, entry_ploidy = open(os.path.join(entry, 'info')).read().split()
+            except (IOError, ValueError):
+                continue
+            if entry_ploidy == ploidy and self._simulations(entry):
+                entries.append((name, entry))
+        return entries
 
     def listSimulations(self, ploidy = '1'):
         '''
            Lists available simulations.
         '''
-        files = os.listdir(self.cacheDir + os.sep + ploidy)
-        sims = []
-        for file in files:
-            if file.endswith('.tar.bz2'):
-                sims.append(file[:-8])
-        return sims
-
-    def getSimulation(self, sim_name, ploidy = '1', parDir = None):
+        return [name for name, entry in self._entries(ploidy)]
+
+    def getSimulation(self, sim_name, ploidy = '1', parDir = '.'):
         '''
            Makes available a cached simulation.
 
            @param sim_name simulation name.
 
-           This mainly means untaring a file.
+           All the cached simulations of the model are copied to parDir.
         '''
-        if parDir == None:
-            parDir = os.sep.join([Config.dataDir, 'SimCoal', 'runs'])
-        tar_name = os.sep.join([self.cacheDir, ploidy, sim_name + 
-            '.tar.bz2'])
-        tf = tarfile.open(tar_name)
-        tf.extractall(parDir)
-        tf.close()
-
-
-if __name__ == '__main__':
-  cache = Cache('/home/work/werk/consolidator/sc_cache',
-      '/home/work/software/simcoal')
-  cache.run_simcoal('.', 'island_snp-50_0.0025_10_0.083_100_60.par', 102)
+        for name, entry in self._entries(ploidy):
+            if name == sim_name:
+                self._copy_out(entry, name, self._simulations(entry), parDir)
+                return
+        raise KeyError(sim_name)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+#
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+#
+"""Restriction analysis of many sequences at once.
+
+Analysis (in Bio.Restriction) looks at one sequence at a time.  To screen
+a large number of sequences (e.g. a library of constructs) against a batch
+of enzymes, use the analyse function of this module.  It takes an iterator
+of SeqRecord objects and a RestrictionBatch, and returns a CutTable with
+the cuts of every enzyme in every sequence:
+
+    from Bio import SeqIO
+    from Bio.Restriction import CommOnly, EcoRI
+    from Bio.Restriction.Parallel import analyse
+    records = SeqIO.parse(open("plasmids.fasta"), "fasta")
+    table = analyse(records, CommOnly, linear=False)
+    table.with_N_sites(1)       # enzymes cutting each plasmid only once
+    table.cuts(0, EcoRI)        # EcoRI cuts in the first plasmid
+
+The sequences are split into chunks which are searched by a pool of worker
+processes using the multiprocessing module (Python 2.6 or later).  Each
+worker builds the RestrictionBatch and its compiled site patterns once.
+Without multiprocessing (or with processes=1) the chunks are searched in
+this process, giving the same results.
+
+The CutTable keeps the number of cuts for each enzyme in one array per
+enzyme, so queries over all the sequences (with_N_sites, with_sites,
+without_site) don't have to loop over the sequences in Python.
+
+Functions:
+analyse     Search many SeqRecords with a RestrictionBatch, returns a CutTable.
+
+Classes:
+CutTable    Compact table of the cuts found in many sequences.
+"""
+
+from array import array
+
+from Bio.Seq import Seq
+from Bio.Alphabet.IUPAC import IUPACAmbiguousDNA
+from Bio.Restriction import Restriction
+from Bio.Restriction.Restriction import RestrictionBatch, FormattedSeq
+
+class CutTable :
+    """Compact table of the cuts found in many sequences by a batch of enzymes.
+
+    Attributes:
+    enzymes - list of the enzymes (sorted by name), i.e. the table columns
+    ids     - list of the sequence identifiers, i.e. the table rows
+    lengths - array of the sequence lengths
+
+    Sequences are refered to by their index (i.e. their position in the
+    ids list), as the identifiers need not be unique.
+    """
+    def __init__(self, enzymes) :
+        self.enzymes = list(enzymes)
+        self.ids = []
+        self.lengths = array("l")
+        self._column = {}
+        for j, enzyme in enumerate(self.enzymes) :
+            self._column[enzyme] = j
+        #One array of cut counts per enzyme, indexed by sequence
+        self._counts = [array("i") for enzyme in self.enzymes]
+        #All the cut positions, sequence by sequence then enzyme by enzyme
+        self._cuts = array("i")
+        self._row_start = array("l")
+
+    def __len__(self) :
+        return len(self.ids)
+
+    def __repr__(self) :
+        return "<CutTable of %i sequences by %i enzymes>" \
+               % (len(self.ids), len(self.enzymes))
+
+    def _append(self, id, length, counts, cuts) :
+        """Add the search results for one sequence (PRIVATE).
+
+        counts - number of cuts for each enzyme, in the table column order
+        cuts   - all the cut positions, in the same enzyme order
+        """
+        self.ids.append(id)
+        self.lengths.append(length)
+        self._row_start.append(len(self._cuts))
+        for j, count in enumerate(counts) :
+            self._counts[j].append(count)
+        self._cuts.extend(cuts)
+
+    def _get_column(self, enzyme) :
+        """Column number of the enzyme (PRIVATE)."""
+        try :
+            return self._column[enzyme]
+        except KeyError :
+            enzyme = RestrictionBatch().format(enzyme)
+            try :
+                return self._column[enzyme]
+            except KeyError :
+                raise ValueError("%s is not in the CutTable" % enzyme)
+
+    def counts(self, enzyme) :
+        """T.counts(enzyme) -> list.
+
+        number of cuts of enzyme in each sequence."""
+        return self._counts[self._get_column(enzyme)].tolist()
+
+    def cuts(self, index, enzyme) :
+        """T.cuts(index, enzyme) -> list.
+
+        the cuts of enzyme in the sequence with the given index, as given
+        by the search method of the enzyme."""
+        j = self._get_column(enzyme)
+        start = self._row_start[index]
+        for k in range(j) :
+            start += self._counts[k][index]
+        return self._cuts[start:start + self._counts[j][index]].tolist()
+
+    def mapping(self, index) :
+        """T.mapping(index) -> dict.
+
+        the cuts of all the enzymes in the sequence with the given index,
+        as given by the search method of a RestrictionBatch."""
+        start = self._row_start[index]
+        dct = {}
+        for j, enzyme in enumerate(self.enzymes) :
+            end = start + self._counts[j][index]
+            dct[enzyme] = self._cuts[start:end].tolist()
+            start = end
+        return dct
+
+    def with_N_sites(self, N) :
+        """T.with_N_sites(N) -> RestrictionBatch.
+
+        enzymes which cut every sequence exactly N times (none if the
+        table has no sequences)."""
+        rows = len(self.ids)
+        if not rows :
+            return RestrictionBatch()
+        return RestrictionBatch([enzyme for enzyme, counts \
+                                 in zip(self.enzymes, self._counts) \
+                                 if counts.count(N) == rows])
+
+    def with_sites(self) :
+        """T.with_sites() -> RestrictionBatch.
+
+        enzymes which cut every sequence at least once (none if the
+        table has no sequences)."""
+        if not self.ids :
+            return RestrictionBatch()
+        return RestrictionBatch([enzyme for enzyme, counts \
+                                 in zip(self.enzymes, self._counts) \
+                                 if 0 not in counts])
+
+    def without_site(self) :
+        """T.without_site() -> RestrictionBatch.
+
+        enzymes which do not cut any of the sequences."""
+        return self.with_N_sites(0)
+
+class _Searcher :
+    """Search sequences with a batch of enzymes (PRIVATE).
+
+    The enzymes are searched in the order given, the results are given as
+    an array of counts and an array of cut positions (see CutTable).
+    """
+    def __init__(self, enzymes) :
+        self.enzymes = enzymes
+        self.batch = RestrictionBatch(enzymes)
+
+    def search(self, chunk) :
+        """Search a list of (id, sequence string, linear) tuples."""
+        answer = []
+        for id, sequence, linear in chunk :
+            fseq = FormattedSeq(Seq(sequence, IUPACAmbiguousDNA()), linear)
+            mapping = self.batch._search_all(fseq)
+            counts = array("i")
+            cuts = array("i")
+            for enzyme in self.enzymes :
+                found = mapping[enzyme]
+                counts.append(len(found))
+                cuts.extend(found)
+            answer.append((id, len(sequence), counts, cuts))
+        return answer
+
+#Set in each worker process by _init_worker
+_searcher = None
+
+def _init_worker(names) :
+    """Build the batch of enzymes once in each worker process (PRIVATE)."""
+    global _searcher
+    _searcher = _Searcher([getattr(Restriction, name) for name in names])
+
+def _search_chunk(chunk) :
+    """Search a chunk of sequences in a worker process (PRIVATE)."""
+    return _searcher.search(chunk)
+
+def _chunks(records, linear, chunk_size) :
+    """Group the records into lists of (id, sequence, linear) (PRIVATE)."""
+    chunk = []
+    for record in records :
+        chunk.append((record.id, record.seq.tostring(), linear))
+        if len(chunk) == chunk_size :
+            yield chunk
+            chunk = []
+    if chunk :
+        yield chunk
+
+def analyse(records, restrictionbatch, linear=True, processes=None,
+            chunk_size=100) :
+    """Search many sequences with a batch of enzymes, returns a CutTable.
+
+    records          - iterator of SeqRecord objects (e.g. from SeqIO.parse)
+    restrictionbatch - RestrictionBatch (or list) of enzymes to search with
+    linear           - are the sequences linear (default) or circular
+    processes        - number of worker processes, default is the number
+                       of CPUs.  Use 1 to search in this process.
+    chunk_size       - number of sequences sent to a worker at a time
+
+    The cuts are the same as those from the search method of the
+    RestrictionBatch, in the order of the records.  Only the enzymes
+    defined in Bio.Restriction can be sent to worker processes.
+    """
+    batch = RestrictionBatch(restrictionbatch)
+    names = batch.elements()
+    enzymes = dict([(str(enzyme), enzyme) for enzyme in batch])
+    enzymes = [enzymes[name] for name in names]
+    table = CutTable(enzymes)
+    if chunk_size < 1 :
+        raise ValueError("chunk_size must be at least one")
+    try :
+        import multiprocessing
+    except ImportError :
+        multiprocessing = None
+    if processes is None :
+        if multiprocessing :
+            processes = multiprocessing.cpu_count()
+        else :
+            processes = 1
+    elif processes < 1 :
+        raise ValueError("Need at least one process")
+
+    if processes == 1 or multiprocessing is None :
+        searcher = _Searcher(enzymes)
+        for chunk in _chunks(records, linear, chunk_size) :
+            for result in searcher.search(chunk) :
+                table._append(*result)
+        return table
+
+    for name, enzyme in zip(names, enzymes) :
+        if getattr(Restriction, name, None) is not enzyme :
+            raise ValueError("%s is not defined in Bio.Restriction, "
+                             "use processes=1" % name)
+    pool = multiprocessing.Pool(processes, _init_worker, (names,))
+    try :
+        #Keep a few chunks per worker queued, but don't read all the
+        #records into memory at once.
+        pending = []
+        for chunk in _chunks(records, linear, chunk_size) :
+            pending.append(pool.apply_async(_search_chunk, (chunk,)))
+            if len(pending) > 2 * processes :
+                for result in pending.pop(0).get() :
+                    table._append(*result)
+        for job in pending :
+            for result in job.get() :
+                table._append(*result)
+        pool.close()
+    finally :
+        pool.terminate()
+        pool.join()
+    return table
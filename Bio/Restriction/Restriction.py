@@ -79,6 +79,7 @@
         """
 
 import re
+import sre_parse
 import itertools
 
 #TODO - Remove this work around once we drop python 2.3 support
@@ -219,7 +220,25 @@ class RestrictionType(type) :
         
         see below."""
         super(RestrictionType, cls).__init__(cls, name, bases, dct)
-        cls.compsite = re.compile(cls.compsite)
+        #
+        #   The site is only compiled when it is first used (see compsite
+        #   below). Compiling the sites of all the enzymes took most of the
+        #   time needed to import the module.
+        #
+
+    def _get_compsite(cls) :
+        """RE.compsite -> compiled regular expression.
+
+        The recognition site of RE and its reverse complement, compiled
+        on first use."""
+        try :
+            return cls.__dict__['_compiled_site']
+        except KeyError :
+            if 'compsite' not in cls.__dict__ :
+                raise AttributeError('compsite')
+            cls._compiled_site = re.compile(cls.__dict__['compsite'])
+            return cls._compiled_site
+    compsite = property(_get_compsite)
         
     def __add__(cls, other) :
         """RE.__add__(other) -> RestrictionBatch().
@@ -785,10 +804,24 @@ class Palindromic(AbstractCut) :
         implement the search method for palindromic and non palindromic enzyme.
         """
         siteloc = self.dna.finditer(self.compsite,self.size)
-        self.results = [r for s,g in siteloc for r in self._modify(s)]
+        return self._found([s for s,g in siteloc], [])
+    _search = classmethod(_search)
+
+    def _found(self, plus, minus) :
+        """RE._found(plus, minus) -> list.
+
+        for internal use only.
+
+        return the cuts for the sites starting at the positions in plus and
+        minus (the sites found on the + and - strand respectively).
+        The strand makes no difference for a palindromic enzyme.
+        """
+        sites = plus + minus
+        sites.sort()
+        self.results = [r for s in sites for r in self._modify(s)]
         if self.results : self._drop()
         return self.results
-    _search = classmethod(_search)
+    _found = classmethod(_found)
 
     def is_palindromic(self) :
         """RE.is_palindromic() -> bool.
@@ -814,22 +847,35 @@ class NonPalindromic(AbstractCut) :
         implement the search method for palindromic and non palindromic enzyme.
         """
         iterator = self.dna.finditer(self.compsite, self.size)
-        self.results = []
-        modif = self._modify
-        revmodif = self._rev_modify
         s = str(self)
-        self.on_minus = []
+        plus = []
+        minus = []
         for start, group in iterator :
             if group(s) :
-                self.results += [r for r in modif(start)]
+                plus.append(start)
             else :
-                self.on_minus += [r for r in revmodif(start)]
+                minus.append(start)
+        return self._found(plus, minus)
+    _search = classmethod(_search)
+
+    def _found(self, plus, minus) :
+        """RE._found(plus, minus) -> list.
+
+        for internal use only.
+
+        return the cuts for the sites starting at the positions in plus and
+        minus (the sites found on the + and - strand respectively).
+        """
+        modif = self._modify
+        revmodif = self._rev_modify
+        self.results = [r for start in plus for r in modif(start)]
+        self.on_minus = [r for start in minus for r in revmodif(start)]
         self.results += self.on_minus   
         if self.results :
             self.results.sort()
             self._drop()
         return self.results
-    _search = classmethod(_search)
+    _found = classmethod(_found)
 
     def is_palindromic(self) :
         """RE.is_palindromic() -> bool.
@@ -1771,6 +1817,90 @@ class Not_available(AbstractCut) :
 #                                                                             #
 ###############################################################################
 
+#
+#   The compsite of an enzyme is (?P<name>site)|(?P<name_as>reverse site).
+#   Many enzymes share the same site on one strand or the other (isoschizomers,
+#   and the palindromic sites which are their own reverse complement), so
+#   a batch splits each compsite in two and searches each distinct strand
+#   pattern only once.
+#
+_compsite_strands = re.compile(r'^\(\?P<[^>]+>(.*)\)\|\(\?P<[^>]+>(.*)\)$')
+_strands_cache = {}
+
+def _strand_patterns(enzyme) :
+    """_strand_patterns(enzyme) -> tuple or None.
+
+    for internal use only.
+
+    return (forward pattern, reverse pattern, width) for the compsite of
+    enzyme, or None if the compsite can not be split into two patterns
+    of the same fixed width."""
+    pattern = enzyme.compsite.pattern
+    try :
+        return _strands_cache[pattern]
+    except KeyError :
+        pass
+    strands = None
+    m = _compsite_strands.match(pattern)
+    if m :
+        forward, reverse = m.groups()
+        try :
+            fwidth = sre_parse.parse(forward).getwidth()
+            rwidth = sre_parse.parse(reverse).getwidth()
+        except (re.error, ValueError) :
+            fwidth = rwidth = (0, 0)
+        if fwidth[0] and fwidth[0] == fwidth[1] and fwidth == rwidth :
+            strands = forward, reverse, fwidth[0]
+    _strands_cache[pattern] = strands
+    return strands
+
+def _find_all(pattern, data) :
+    """_find_all(pattern, data) -> list.
+
+    for internal use only.
+
+    return the start of every match of pattern in data, including the
+    overlapping ones."""
+    search = re.compile(pattern).search
+    found = []
+    m = search(data)
+    while m :
+        start = m.start()
+        found.append(start)
+        m = search(data, start + 1)
+    return found
+
+def _non_overlapping(plus, minus, width, limit) :
+    """_non_overlapping(plus, minus, width, limit) -> (list, list).
+
+    for internal use only.
+
+    plus and minus are the starts of all the matches of the two strand
+    patterns.  Keep the same sites that re.finditer on the compsite would
+    find in data[:limit] : scanning from the left, the first site wins and
+    the sites it overlaps are skipped.  The + strand wins at equal start."""
+    if plus is minus :
+        sites = [(start, 0) for start in plus]
+    else :
+        sites = [(start, 0) for start in plus] + \
+                [(start, 1) for start in minus]
+        sites.sort()
+    limit -= width
+    kept_plus = []
+    kept_minus = []
+    end = 0
+    for start, strand in sites :
+        if start > limit :
+            break
+        if start < end :
+            continue
+        if strand :
+            kept_minus.append(start)
+        else :
+            kept_plus.append(start)
+        end = start + width
+    return kept_plus, kept_minus
+
 
 class RestrictionBatch(set) :
 
@@ -1972,24 +2102,66 @@ class RestrictionBatch(set) :
         #   here we replace the search method of the individual enzymes
         #   with one unique testing method.
         #
+        #   The batch attributes are missing if the batch was made by a set
+        #   operation (i.e. AllEnzymes = CommOnly | NonComm).
+        #
+        already_mapped = getattr(self, 'already_mapped', None)
         if isinstance(dna, DNA) :
-            if (dna, linear) == self.already_mapped :
+            if (dna, linear) == already_mapped :
                 return self.mapping
             else :
                 self.already_mapped = dna, linear
                 fseq = FormattedSeq(dna, linear)
-                self.mapping = dict([(x, x.search(fseq)) for x in self])
+                self.mapping = self._search_all(fseq)
                 return self.mapping
         elif isinstance(dna, FormattedSeq) :
-            if (dna, dna.linear) == self.already_mapped :
+            if (dna, dna.linear) == already_mapped :
                 return self.mapping
             else :
                 self.already_mapped = dna, dna.linear
-                self.mapping = dict([(x, x.search(dna)) for x in self])
+                self.mapping = self._search_all(dna)
                 return self.mapping
         raise TypeError("Expected Seq or MutableSeq instance, got %s instead"\
                         %type(dna))
 
+    def _search_all(self, fseq) :
+        """B._search_all(fseq) -> dict.
+
+        for internal use only.
+
+        search fseq with all the enzymes of the batch at once. Each distinct
+        strand pattern is searched only once, whatever the number of enzymes
+        which share it. The result is the same as calling the search method
+        of each enzyme."""
+        mapping = {}
+        shared = []
+        maxsize = 0
+        for enzyme in self :
+            strands = _strand_patterns(enzyme)
+            if strands is None or not hasattr(enzyme, '_found') :
+                mapping[enzyme] = enzyme.search(fseq)
+            else :
+                shared.append((enzyme, strands))
+                maxsize = max(maxsize, enzyme.size)
+        if fseq.is_linear() :
+            data = fseq.data
+        else :
+            data = fseq.data + fseq.data[1:maxsize+1]
+        found = {}
+        for enzyme, (forward, reverse, width) in shared :
+            for pattern in (forward, reverse) :
+                if pattern not in found :
+                    found[pattern] = _find_all(pattern, data)
+            if fseq.is_linear() :
+                limit = len(fseq.data)
+            else :
+                limit = len(fseq.data) + len(fseq.data[1:enzyme.size+1])
+            plus, minus = _non_overlapping(found[forward], found[reverse],
+                                           width, limit)
+            enzyme.dna = fseq
+            mapping[enzyme] = enzyme._found(plus, minus)
+        return mapping
+
 ###############################################################################  
 #                                                                             #
 #                       Restriction Analysis                                  #
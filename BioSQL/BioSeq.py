@@ -124,135 +124,188 @@ class DBSeq(Seq):  # This implements the biopython Seq interface
         return other + self.toseq()
 
 
+def _alphabet(moltype):
+    moltype = moltype.lower() #might be upper case in database
+    #We have no way of knowing if these sequences will use IUPAC
+    #alphabets, and we certainly can't assume they are unambiguous!
+    if moltype == "dna":
+        return Alphabet.generic_dna
+    elif moltype == "rna":
+        return Alphabet.generic_rna
+    elif moltype == "protein":
+        return Alphabet.generic_protein
+    elif moltype == "unknown":
+        #This is used in BioSQL/Loader.py and would happen
+        #for any generic or nucleotide alphabets.
+        return Alphabet.single_letter_alphabet
+    else:
+        raise AssertionError("Unknown moltype: %s" % moltype)
+
 def _retrieve_seq(adaptor, primary_id):
     seqs = adaptor.execute_and_fetchall(
         "SELECT alphabet, length(seq) FROM biosequence" \
         " WHERE bioentry_id = %s", (primary_id,))
     if seqs:
         moltype, length = seqs[0]
-        moltype = moltype.lower() #might be upper case in database
-        #We have no way of knowing if these sequences will use IUPAC
-        #alphabets, and we certainly can't assume they are unambiguous!
-        if moltype == "dna":
-            alphabet = Alphabet.generic_dna
-        elif moltype == "rna":
-            alphabet = Alphabet.generic_rna
-        elif moltype == "protein":
-            alphabet = Alphabet.generic_protein
-        elif moltype == "unknown":
-            #This is used in BioSQL/Loader.py and would happen
-            #for any generic or nucleotide alphabets.
-            alphabet = Alphabet.single_letter_alphabet
-        else:
-            raise AssertionError("Unknown moltype: %s" % moltype)
-        seq = DBSeq(primary_id, adaptor, alphabet, 0, int(length))
+        seq = DBSeq(primary_id, adaptor, _alphabet(moltype), 0, int(length))
         return seq
     else:
         return None
 
+def _in_clause(primary_ids):
+    """SQL to select the given bioentries, e.g. "bioentry_id IN (%s, %s)" (PRIVATE)."""
+    return "bioentry_id IN (%s)" % ", ".join(["%s"] * len(primary_ids))
+
+def _retrieve_seqs_batch(adaptor, primary_ids):
+    """Retrieve the full sequences of several bioentries as Seq objects (PRIVATE).
+
+    Returns a dictionary of the Seq of each primary_id with a sequence.
+    """
+    seqs = {}
+    for primary_id, moltype, seq in adaptor.execute_and_fetchall(
+        "SELECT bioentry_id, alphabet, seq FROM biosequence" \
+        " WHERE " + _in_clause(primary_ids), tuple(primary_ids)):
+        seqs[primary_id] = Seq(seq or "", _alphabet(moltype))
+    return seqs
+
 def _retrieve_dbxrefs(adaptor, primary_id):
     """Retrieve the database cross references for the sequence."""
-    _dbxrefs = []
+    return _retrieve_dbxrefs_batch(adaptor, [primary_id])[primary_id]
+
+def _retrieve_dbxrefs_batch(adaptor, primary_ids):
+    """Retrieve the database cross references of several bioentries (PRIVATE)."""
+    answer = {}
+    for primary_id in primary_ids:
+        answer[primary_id] = []
     dbxrefs = adaptor.execute_and_fetchall(
-        "SELECT dbname, accession, version" \
+        "SELECT bioentry_id, dbname, accession, version" \
         " FROM bioentry_dbxref join dbxref using (dbxref_id)" \
-        " WHERE bioentry_id = %s" \
-        " ORDER BY rank", (primary_id,))
-    for dbname, accession, version in dbxrefs:
+        " WHERE " + _in_clause(primary_ids) + \
+        " ORDER BY bioentry_id, rank", tuple(primary_ids))
+    for primary_id, dbname, accession, version in dbxrefs:
         if version and version != "0":
             v = "%s.%s" % (accession, version)
         else:
             v = accession
-        _dbxrefs.append("%s:%s" % (dbname, v))
-    return _dbxrefs
+        answer[primary_id].append("%s:%s" % (dbname, v))
+    return answer
 
 def _retrieve_features(adaptor, primary_id):
-    sql = "SELECT seqfeature_id, type.name, rank" \
-          " FROM seqfeature join term type on (type_term_id = type.term_id)" \
-          " WHERE bioentry_id = %s" \
-          " ORDER BY rank"
-    results = adaptor.execute_and_fetchall(sql, (primary_id,))
-    seq_feature_list = []
-    for seqfeature_id, seqfeature_type, seqfeature_rank in results:
-        # Get qualifiers [except for db_xref which is stored separately]
-        qvs = adaptor.execute_and_fetchall(
-            "SELECT name, value" \
-            " FROM seqfeature_qualifier_value  join term using (term_id)" \
-            " WHERE seqfeature_id = %s" \
-            " ORDER BY rank", (seqfeature_id,))
-        qualifiers = {}
-        for qv_name, qv_value in qvs:
-            qualifiers.setdefault(qv_name, []).append(qv_value)
-        # Get db_xrefs [special case of qualifiers]
-        qvs = adaptor.execute_and_fetchall(
-            "SELECT dbxref.dbname, dbxref.accession" \
-            " FROM dbxref join seqfeature_dbxref using (dbxref_id)" \
-            " WHERE seqfeature_dbxref.seqfeature_id = %s" \
-            " ORDER BY rank", (seqfeature_id,))
-        for qv_name, qv_value in qvs:
-            value = "%s:%s" % (qv_name, qv_value)
-            qualifiers.setdefault("db_xref", []).append(value)
-        # Get locations
-        results = adaptor.execute_and_fetchall(
-            "SELECT location_id, start_pos, end_pos, strand" \
-            " FROM location" \
-            " WHERE seqfeature_id = %s" \
-            " ORDER BY rank", (seqfeature_id,))
-        locations = []
+    return _retrieve_features_batch(adaptor, [primary_id])[primary_id]
+
+def _retrieve_features_batch(adaptor, primary_ids):
+    """Retrieve the features of several bioentries (PRIVATE).
+
+    Returns a dictionary of the list of features of each primary_id.
+
+    Rather than a few queries for each feature, this uses five queries
+    in total (features, qualifiers, db_xrefs, locations with any remote
+    references, and location qualifiers), each joined to the seqfeature
+    table and selecting all the bioentries at once. The features are then
+    assembled from the rows in python.
+    """
+    where = " WHERE seqfeature." + _in_clause(primary_ids)
+    args = tuple(primary_ids)
+    features = adaptor.execute_and_fetchall(
+        "SELECT bioentry_id, seqfeature_id, type.name" \
+        " FROM seqfeature join term type on (type_term_id = type.term_id)" \
+        + where + \
+        " ORDER BY bioentry_id, rank", args)
+    # Get qualifiers [except for db_xref which is stored separately]
+    qualifiers = {}
+    for seqfeature_id, qv_name, qv_value in adaptor.execute_and_fetchall(
+        "SELECT seqfeature.seqfeature_id, term.name," \
+        " seqfeature_qualifier_value.value" \
+        " FROM seqfeature join seqfeature_qualifier_value" \
+        " on (seqfeature.seqfeature_id = seqfeature_qualifier_value.seqfeature_id)" \
+        " join term on (seqfeature_qualifier_value.term_id = term.term_id)" \
+        + where + \
+        " ORDER BY seqfeature.seqfeature_id, seqfeature_qualifier_value.rank",
+        args):
+        qualifiers.setdefault(seqfeature_id, {}) \
+                  .setdefault(qv_name, []).append(qv_value)
+    # Get db_xrefs [special case of qualifiers]
+    for seqfeature_id, dbname, accession in adaptor.execute_and_fetchall(
+        "SELECT seqfeature.seqfeature_id, dbxref.dbname, dbxref.accession" \
+        " FROM seqfeature join seqfeature_dbxref" \
+        " on (seqfeature.seqfeature_id = seqfeature_dbxref.seqfeature_id)" \
+        " join dbxref on (seqfeature_dbxref.dbxref_id = dbxref.dbxref_id)" \
+        + where + \
+        " ORDER BY seqfeature.seqfeature_id, seqfeature_dbxref.rank", args):
+        value = "%s:%s" % (dbname, accession)
+        qualifiers.setdefault(seqfeature_id, {}) \
+                  .setdefault("db_xref", []).append(value)
+    # Get locations, with any remote reference information
+    locations = {}
+    for seqfeature_id, location_id, start, end, strand, \
+        dbname, accession, version in adaptor.execute_and_fetchall(
+        "SELECT seqfeature.seqfeature_id, location.location_id," \
+        " location.start_pos, location.end_pos, location.strand," \
+        " dbxref.dbname, dbxref.accession, dbxref.version" \
+        " FROM seqfeature join location" \
+        " on (seqfeature.seqfeature_id = location.seqfeature_id)" \
+        " left join dbxref on (location.dbxref_id = dbxref.dbxref_id)" \
+        + where + \
+        " ORDER BY seqfeature.seqfeature_id, location.rank", args):
         # convert to Python standard form
         # Convert strand = 0 to strand = None
         # re: comment in Loader.py:
         # Biopython uses None when we don't know strand information but
         # BioSQL requires something (non null) and sets this as zero
         # So we'll use the strand or 0 if Biopython spits out None
-        for location_id, start, end, strand in results:
-            if start:
-                start -= 1
-            if strand == 0:
-                strand = None
-            locations.append( (location_id, start, end, strand) )
-        # Get possible remote reference information
-        remote_results = adaptor.execute_and_fetchall(
-            "SELECT location_id, dbname, accession, version" \
-            " FROM location join dbxref using (dbxref_id)" \
-            " WHERE seqfeature_id = %s", (seqfeature_id,))
-        lookup = {}
-        for location_id, dbname, accession, version in remote_results:
-            if version and version != "0":
-                v = "%s.%s" % (accession, version)
-            else:
-                v = accession
-            # subfeature remote location db_ref are stored as a empty string when
-            # not present
-            if dbname == "":
-                dbname = None
-            lookup[location_id] = (dbname, v)
-        
+        if start:
+            start -= 1
+        if strand == 0:
+            strand = None
+        if version and version != "0":
+            v = "%s.%s" % (accession, version)
+        else:
+            v = accession
+        # subfeature remote location db_ref are stored as a empty string when
+        # not present
+        if dbname == "":
+            dbname = None
+        locations.setdefault(seqfeature_id, []).append( \
+            (location_id, start, end, strand, dbname, v))
+    location_qualifiers = {}
+    for location_id, value in adaptor.execute_and_fetchall(
+        "SELECT location.location_id, location_qualifier_value.value" \
+        " FROM seqfeature join location" \
+        " on (seqfeature.seqfeature_id = location.seqfeature_id)" \
+        " join location_qualifier_value" \
+        " on (location.location_id = location_qualifier_value.location_id)" \
+        + where, args):
+        #Only the first value is used
+        location_qualifiers.setdefault(location_id, value)
+
+    answer = {}
+    for primary_id in primary_ids:
+        answer[primary_id] = []
+    for primary_id, seqfeature_id, seqfeature_type in features:
         feature = SeqFeature.SeqFeature(type = seqfeature_type)
         feature._seqfeature_id = seqfeature_id #Store the key as a private property
-        feature.qualifiers = qualifiers
-        if len(locations) == 0:
+        feature.qualifiers = qualifiers.get(seqfeature_id, {})
+        feature_locations = locations.get(seqfeature_id, [])
+        if len(feature_locations) == 0:
             pass
-        elif len(locations) == 1:
-            location_id, start, end, strand = locations[0]
+        elif len(feature_locations) == 1:
+            location_id, start, end, strand, dbname, version = \
+                         feature_locations[0]
             #See Bug 2677, we currently don't record the location_operator
             #For consistency with older versions Biopython, default to "".
-            feature.location_operator = \
-                _retrieve_location_qualifier_value(adaptor, location_id)
-            dbname, version = lookup.get(location_id, (None, None))
+            feature.location_operator = location_qualifiers.get(location_id, "")
             feature.location = SeqFeature.FeatureLocation(start, end)
             feature.strand = strand
             feature.ref_db = dbname
             feature.ref = version
         else:
             assert feature.sub_features == []
-            for location in locations:
-                location_id, start, end, strand = location
-                dbname, version = lookup.get(location_id, (None, None))
+            for location in feature_locations:
+                location_id, start, end, strand, dbname, version = location
                 subfeature = SeqFeature.SeqFeature()
                 subfeature.type = seqfeature_type
                 subfeature.location_operator = \
-                    _retrieve_location_qualifier_value(adaptor, location_id)
+                    location_qualifiers.get(location_id, "")
                 #TODO - See Bug 2677 - we don't yet record location_operator,
                 #so for consistency with older versions of Biopython default
                 #to assuming its a join.
@@ -269,23 +322,37 @@ def _retrieve_features(adaptor, primary_id):
                 feature.sub_features[0].location_operator
             # Locations are in order, but because of remote locations for
             # sub-features they are not necessarily in numerical order:
-            start = locations[0][1]
-            end = locations[-1][2]
+            start = feature_locations[0][1]
+            end = feature_locations[-1][2]
             feature.location = SeqFeature.FeatureLocation(start, end)
             feature.strand = feature.sub_features[0].strand
 
-        seq_feature_list.append(feature)
+        answer[primary_id].append(feature)
 
-    return seq_feature_list
+    return answer
 
-def _retrieve_location_qualifier_value(adaptor, location_id):
-    value = adaptor.execute_and_fetch_col0(
-        "SELECT value FROM location_qualifier_value" \
-        " WHERE location_id = %s", (location_id,))
-    try:
-        return value[0] 
-    except IndexError:
-        return ""
+def fetch_features(records, batch_size=100):
+    """Retrieve the features of several DBSeqRecords together.
+
+    The features of a DBSeqRecord are normally retrieved from the database
+    when first used, one record at a time. When working through many
+    records, calling this first fetches the features of batch_size records
+    at a time, with a fixed number of queries per batch.
+
+    Records which already have their features are left alone.
+    """
+    pending = {}
+    for record in records:
+        if not hasattr(record, "_features"):
+            pending.setdefault(id(record._adaptor), []).append(record)
+    for batch in pending.values():
+        adaptor = batch[0]._adaptor
+        for i in range(0, len(batch), batch_size):
+            primary_ids = [record._primary_id
+                           for record in batch[i:i + batch_size]]
+            features = _retrieve_features_batch(adaptor, primary_ids)
+            for record in batch[i:i + batch_size]:
+                record._features = features[record._primary_id]
 
 def _retrieve_annotations(adaptor, primary_id, taxon_id):
     annotations = {}
@@ -296,33 +363,44 @@ def _retrieve_annotations(adaptor, primary_id, taxon_id):
     return annotations
 
 def _retrieve_qualifier_value(adaptor, primary_id):
+    return _retrieve_qualifier_value_batch(adaptor, [primary_id])[primary_id]
+
+def _retrieve_qualifier_value_batch(adaptor, primary_ids):
+    answer = {}
+    for primary_id in primary_ids:
+        answer[primary_id] = {}
     qvs = adaptor.execute_and_fetchall(
-        "SELECT name, value" \
+        "SELECT bioentry_id, name, value" \
         " FROM bioentry_qualifier_value JOIN term USING (term_id)" \
-        " WHERE bioentry_id = %s" \
-        " ORDER BY rank", (primary_id,))
-    qualifiers = {}
-    for name, value in qvs:
+        " WHERE " + _in_clause(primary_ids) + \
+        " ORDER BY bioentry_id, rank", tuple(primary_ids))
+    for primary_id, name, value in qvs:
         if name == "keyword": name = "keywords"
         elif name == "date_changed": name = "dates"
         elif name == "secondary_accession": name = "accessions"
-        qualifiers.setdefault(name, []).append(value)
-    return qualifiers
+        answer[primary_id].setdefault(name, []).append(value)
+    return answer
 
 def _retrieve_reference(adaptor, primary_id):
+    return _retrieve_reference_batch(adaptor, [primary_id])[primary_id]
+
+def _retrieve_reference_batch(adaptor, primary_ids):
     # XXX dbxref_qualifier_value
  
     refs = adaptor.execute_and_fetchall(
-        "SELECT start_pos, end_pos, " \
+        "SELECT bioentry_id, start_pos, end_pos, " \
         " location, title, authors," \
         " dbname, accession" \
         " FROM bioentry_reference" \
         " JOIN reference USING (reference_id)" \
         " LEFT JOIN dbxref USING (dbxref_id)" \
-        " WHERE bioentry_id = %s" \
-        " ORDER BY rank", (primary_id,))
-    references = []
-    for start, end, location, title, authors, dbname, accession in refs:
+        " WHERE " + _in_clause(primary_ids) + \
+        " ORDER BY bioentry_id, rank", tuple(primary_ids))
+    answer = {}
+    for primary_id in primary_ids:
+        answer[primary_id] = {}
+    for primary_id, start, end, location, title, authors, dbname, \
+        accession in refs:
         reference = SeqFeature.Reference()
         if start: start -= 1
         reference.location = [SeqFeature.FeatureLocation(start, end)]
@@ -334,11 +412,8 @@ def _retrieve_reference(adaptor, primary_id):
             reference.pubmed_id = accession
         elif dbname == 'MEDLINE':
             reference.medline_id = accession
-        references.append(reference)
-    if references :
-        return {'references': references}
-    else :
-        return {}
+        answer[primary_id].setdefault('references', []).append(reference)
+    return answer
 
 def _retrieve_taxon(adaptor, primary_id, taxon_id):
     a = {}
@@ -391,32 +466,89 @@ def _retrieve_taxon(adaptor, primary_id, taxon_id):
     return a
 
 def _retrieve_comment(adaptor, primary_id):
+    return _retrieve_comment_batch(adaptor, [primary_id])[primary_id]
+
+def _retrieve_comment_batch(adaptor, primary_ids):
     qvs = adaptor.execute_and_fetchall(
-        "SELECT comment_text FROM comment" \
-        " WHERE bioentry_id=%s" \
-        " ORDER BY rank", (primary_id,))
-    comments = [comm[0] for comm in qvs]
-    #Don't want to add an empty list...
-    if comments :
-        return {"comment": comments}
-    else :
-        return {}
+        "SELECT bioentry_id, comment_text FROM comment" \
+        " WHERE " + _in_clause(primary_ids) + \
+        " ORDER BY bioentry_id, rank", tuple(primary_ids))
+    answer = {}
+    for primary_id in primary_ids:
+        #Don't want to add an empty list...
+        answer[primary_id] = {}
+    for primary_id, comment in qvs:
+        answer[primary_id].setdefault("comment", []).append(comment)
+    return answer
+
+def _retrieve_records_batch(adaptor, bioentries, taxa):
+    """Make DBSeqRecords with all their data from rows of bioentry (PRIVATE).
+
+    bioentries is a list of rows of the bioentry_id followed by the columns
+    selected by DBSeqRecord. The sequence, cross references, features and
+    annotations of all the records are retrieved together, with a fixed
+    number of queries. The sequences are read in full (as Seq objects).
+
+    taxa is a dictionary used to cache the taxonomy annotations by taxon_id
+    (looking up a lineage takes a query per taxon).
+    """
+    records = [DBSeqRecord(adaptor, row[0], row[1:]) for row in bioentries]
+    primary_ids = [record._primary_id for record in records]
+    seqs = _retrieve_seqs_batch(adaptor, primary_ids)
+    dbxrefs = _retrieve_dbxrefs_batch(adaptor, primary_ids)
+    features = _retrieve_features_batch(adaptor, primary_ids)
+    qualifiers = _retrieve_qualifier_value_batch(adaptor, primary_ids)
+    references = _retrieve_reference_batch(adaptor, primary_ids)
+    comments = _retrieve_comment_batch(adaptor, primary_ids)
+    for record in records:
+        primary_id = record._primary_id
+        record._seq = seqs.get(primary_id)
+        record._dbxrefs = dbxrefs[primary_id]
+        record._features = features[primary_id]
+        taxon_id = record._taxon_id
+        if taxon_id not in taxa:
+            taxa[taxon_id] = _retrieve_taxon(adaptor, primary_id, taxon_id)
+        annotations = {}
+        annotations.update(qualifiers[primary_id])
+        annotations.update(references[primary_id])
+        for key, value in taxa[taxon_id].items():
+            #Don't share the taxonomy list between records
+            if isinstance(value, list):
+                value = value[:]
+            annotations[key] = value
+        annotations.update(comments[primary_id])
+        if record._identifier:
+            annotations["gi"] = record._identifier
+        if record._division:
+            annotations["data_file_division"] = record._division
+        record._annotations = annotations
+    return records
+
+#The columns of the bioentry table used by DBSeqRecord
+_BIOENTRY_COLUMNS = "biodatabase_id, taxon_id, name, accession, version," \
+                   " identifier, division, description"
 
 class DBSeqRecord(SeqRecord):
     """BioSQL equivalent of the biopython SeqRecord object.
     """
 
-    def __init__(self, adaptor, primary_id):
+    def __init__(self, adaptor, primary_id, bioentry=None):
+        """Create a DBSeqRecord for a bioentry.
+
+        bioentry is an optional row of the bioentry table (the columns in
+        _BIOENTRY_COLUMNS), if not given it is retrieved from the database.
+        """
         self._adaptor = adaptor
         self._primary_id = primary_id
 
+        if bioentry is None:
+            bioentry = self._adaptor.execute_one(
+                "SELECT " + _BIOENTRY_COLUMNS + \
+                " FROM bioentry" \
+                " WHERE bioentry_id = %s", (self._primary_id,))
         (self._biodatabase_id, self._taxon_id, self.name,
          accession, version, self._identifier,
-         self._division, self.description) = self._adaptor.execute_one(
-            "SELECT biodatabase_id, taxon_id, name, accession, version," \
-            " identifier, division, description" \
-            " FROM bioentry" \
-            " WHERE bioentry_id = %s", (self._primary_id,))
+         self._division, self.description) = bioentry
         if version and version != "0":
             self.id = "%s.%s" % (accession, version)
         else:
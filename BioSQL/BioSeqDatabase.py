@@ -32,10 +32,34 @@ def open_database(driver = "MySQLdb", **kwargs):
     password, passwd -> the password to connect with
     host -> the hostname of the database
     database or db -> the name of the database
+
+    For SQLite use driver = "sqlite3" (Python 2.5 or later), where the
+    database is the filename (or ":memory:").
+
+    See also BioSQL.Pool, for a server to use from several threads.
+    """
+    module, conn = _connect(driver, **kwargs)
+    return DBServer(conn, module)
+
+def _connect(driver = "MySQLdb", **kwargs):
+    """Import the driver module and open a connection (PRIVATE).
+
+    Takes the same arguments as open_database, returns the module and the
+    connection.
     """
     module = __import__(driver)
     connect = getattr(module, "connect")
 
+    if driver == "sqlite3":
+        conn = connect(kwargs.get("database", kwargs.get("db")),
+                       check_same_thread = \
+                       kwargs.get("check_same_thread", True))
+        # Return plain strings like the other drivers, not unicode
+        conn.text_factory = str
+        # Needed for the ON DELETE CASCADE used by DatabaseRemover
+        conn.execute("PRAGMA foreign_keys = ON")
+        return module, conn
+
     # Different drivers use different keywords...
     kw = kwargs.copy()
     if driver == "MySQLdb":
@@ -70,7 +94,7 @@ def open_database(driver = "MySQLdb", **kwargs):
         dsn = ' '.join(['='.join(i) for i in kw.items()])
         conn = connect(dsn)
     
-    return DBServer(conn, module)
+    return module, conn
 
 class DBServer:
     def __init__(self, conn, module, module_name=None):
@@ -142,15 +166,25 @@ class DBServer:
             sql_parts = sql.split(";") # one line per sql command
             for sql_line in sql_parts[:-1]: # don't use the last item, it's blank
                 self.adaptor.cursor.execute(sql_line)
+        # 3. SQLite can run a script of several commands
+        elif self.module_name in ["sqlite3"]:
+            self.adaptor.cursor.executescript(sql)
         else:
             raise ValueError("Module %s not supported by the loader." %
                     (self.module_name))
 
 class Adaptor:
+    """Run the SQL commands used by BioSQL on a database connection.
+
+    The query_count attribute counts the SQL commands sent through the
+    adaptor (an executemany call counts as one), which is useful to check
+    how many round trips an operation takes.
+    """
     def __init__(self, conn, dbutils):
         self.conn = conn
         self.cursor = conn.cursor()
         self.dbutils = dbutils
+        self.query_count = 0
 
     def last_id(self, table):
         return self.dbutils.last_id(self.cursor, table)
@@ -172,7 +206,7 @@ class Adaptor:
         return self.conn.close()
 
     def fetch_dbid_by_dbname(self, dbname):
-        self.cursor.execute(
+        self.execute(
             r"select biodatabase_id from biodatabase where name = %s",
             (dbname,))
         rv = self.cursor.fetchall()
@@ -188,7 +222,7 @@ class Adaptor:
         if dbid:
             sql += " and biodatabase_id = %s"
             fields.append(dbid)
-        self.cursor.execute(sql, fields)
+        self.execute(sql, fields)
         rv = self.cursor.fetchall()
         if not rv:
             raise IndexError("Cannot find display id %r" % name)
@@ -202,7 +236,7 @@ class Adaptor:
         if dbid:
             sql += " and biodatabase_id = %s"
             fields.append(dbid)
-        self.cursor.execute(sql, fields)
+        self.execute(sql, fields)
         rv = self.cursor.fetchall()
         if not rv:
             raise IndexError("Cannot find accession %r" % name)
@@ -233,7 +267,7 @@ class Adaptor:
         if dbid:
             sql += " and biodatabase_id = %s"
             fields.append(dbid)
-        self.cursor.execute(sql, fields)
+        self.execute(sql, fields)
         rv = self.cursor.fetchall()
         if not rv:
             raise IndexError("Cannot find version %r" % name)
@@ -248,7 +282,7 @@ class Adaptor:
         if dbid:
             sql += " and biodatabase_id = %s"
             fields.append(dbid)
-        self.cursor.execute(sql, fields)
+        self.execute(sql, fields)
         rv = self.cursor.fetchall()
         if not rv:
             raise IndexError("Cannot find display id %r" % identifier)
@@ -278,7 +312,7 @@ class Adaptor:
         return self.cursor.execute_and_fetch_col0(sql, args)
 
     def execute_one(self, sql, args=None):
-        self.cursor.execute(sql, args or ())
+        self.execute(sql, args)
         rv = self.cursor.fetchall()
         assert len(rv) == 1, "Expected 1 response, got %d" % len(rv)
         return rv[0]
@@ -286,21 +320,29 @@ class Adaptor:
     def execute(self, sql, args=None):
         """Just execute an sql command.
         """
-        self.cursor.execute(sql, args or ())
+        self.query_count += 1
+        self.dbutils.execute(self.cursor, sql, args)
+
+    def executemany(self, sql, seq):
+        """Execute an sql command once for each set of arguments in seq.
+        """
+        self.query_count += 1
+        self.dbutils.executemany(self.cursor, sql, seq)
 
     def get_subseq_as_string(self, seqid, start, end):
         length = end - start
         return self.execute_one(
-            """select SUBSTRING(seq FROM %s FOR %s)
-                     from biosequence where bioentry_id = %s""",
+            """select %s
+                     from biosequence where bioentry_id = %%s""" \
+            % self.dbutils.substring(),
             (start+1, length, seqid))[0]
 
     def execute_and_fetch_col0(self, sql, args=None):
-        self.cursor.execute(sql, args or ())
+        self.execute(sql, args)
         return [field[0] for field in self.cursor.fetchall()]
 
     def execute_and_fetchall(self, sql, args=None):
-        self.cursor.execute(sql, args or ())
+        self.execute(sql, args)
         return self.cursor.fetchall()
 
 _allowed_lookups = {
@@ -358,11 +400,9 @@ class BioSeqDatabase:
         return [BioSeq.DBSeqRecord(self.adaptor, seqid) for seqid in seqids]
 
     def get_PrimarySeq_stream(self):
-        # my @array = $self->get_all_primary_ids;
-        # my $stream = Bio::DB::BioDatabasePSeqStream->new(
-        #         -adaptor => $self->_adaptor->db->get_PrimarySeqAdaptor,
-        #         -idlist => \@array);
-        raise NotImplementedError("waiting for Python 2.2's iter")
+        """Iterator over all the sequences in the database (see itervalues).
+        """
+        return self.itervalues()
 
     def get_all_primary_ids(self):
         """Array of all the primary_ids of the sequences in the database.
@@ -379,6 +419,47 @@ class BioSeqDatabase:
         return self.get_all_primary_ids()
     def values(self):
         return [self[key] for key in self.keys()]
+    def itervalues(self, chunk_size=100):
+        """Iterate over all the records in the database, in chunks.
+
+        Unlike values(), where each DBSeqRecord retrieves its sequence,
+        features and annotations separately when they are first used,
+        this retrieves chunk_size records at a time (in order of their
+        primary id) together with all their data, using a fixed number
+        of queries per chunk. Only one chunk is held in memory at a time,
+        so this is the way to export a whole database, e.g.
+
+        from Bio import SeqIO
+        count = SeqIO.write(db.itervalues(), handle, "genbank")
+
+        The sequences are read in full as Seq objects, rather than DBSeq
+        objects which retrieve (parts of) the sequence on demand.
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least one")
+        return self._iter_chunks(chunk_size)
+
+    def _iter_chunks(self, chunk_size):
+        """Generator of the records for itervalues (PRIVATE)."""
+        #Rather than a server side cursor (which not all the drivers have),
+        #each chunk is a new query starting after the last primary id.
+        sql = "SELECT bioentry_id, " + BioSeq._BIOENTRY_COLUMNS + \
+              " FROM bioentry" \
+              " WHERE biodatabase_id = %s AND bioentry_id > %s" \
+              " ORDER BY bioentry_id" \
+              " LIMIT " + str(int(chunk_size))
+        #The taxonomy annotations of each taxon_id seen
+        taxa = {}
+        last_id = 0
+        while True:
+            bioentries = self.adaptor.execute_and_fetchall(sql,
+                                                           (self.dbid, last_id))
+            if not bioentries:
+                break
+            for record in BioSeq._retrieve_records_batch(self.adaptor,
+                                                         bioentries, taxa):
+                yield record
+            last_id = bioentries[-1][0]
     def items(self):
         return [(key, self[key]) for key in self.keys()]
 
@@ -403,7 +484,8 @@ class BioSeqDatabase:
         """
         return self[seqid]
 
-    def load(self, record_iterator, fetch_NCBI_taxonomy=False):
+    def load(self, record_iterator, fetch_NCBI_taxonomy=False, bulk=False,
+             commit_every=None):
         """Load a set of SeqRecords into the BioSQL database.
 
         record_iterator is either a list of SeqRecord objects, or an
@@ -416,17 +498,31 @@ class BioSeqDatabase:
         (via Bio.Entrez) to fetch a detailed taxonomy for each
         SeqRecord.
 
+        bulk is a boolean flag to use a Loader.BulkDatabaseLoader, which
+        keeps the ids of terms, dbxrefs and taxa in memory and inserts
+        most rows in batches using executemany. This is much faster for
+        large numbers of records.
+
+        commit_every is the number of records to load between commits,
+        by default the load is not committed (leaving it to the caller).
+
         Example:
         from Bio import SeqIO
         count = db.load(SeqIO.parse(open(filename), format))
 
         Returns the number of records loaded.
         """
-        db_loader = Loader.DatabaseLoader(self.adaptor, self.dbid, \
-                                          fetch_NCBI_taxonomy)
+        if bulk:
+            loader_class = Loader.BulkDatabaseLoader
+        else:
+            loader_class = Loader.DatabaseLoader
+        db_loader = loader_class(self.adaptor, self.dbid, fetch_NCBI_taxonomy)
         num_records = 0
         for cur_record in record_iterator :
             num_records += 1
             db_loader.load_seqrecord(cur_record)
+            if commit_every and num_records % commit_every == 0:
+                db_loader.flush()
+                self.adaptor.commit()
+        db_loader.flush()
         return num_records
-
@@ -34,10 +34,22 @@ class Generic_dbutils:
         rv = cursor.fetchone()
         return rv[0]
 
+    def execute(self, cursor, sql, args=None):
+        """Just execute an sql command."""
+        cursor.execute(sql, args or ())
+
+    def executemany(self, cursor, sql, seq):
+        """Execute an sql command once for each set of arguments in seq."""
+        cursor.executemany(sql, seq)
+
     def autocommit(self, conn, y = 1):
         # Let's hope it was not really needed
         pass
 
+    def substring(self):
+        """SQL for a substring of the sequence, taking the start and length."""
+        return "SUBSTRING(seq FROM %s FOR %s)"
+
 class Mysql_dbutils(Generic_dbutils):
     def last_id(self, cursor, table):
         try :
@@ -51,6 +63,32 @@ class Mysql_dbutils(Generic_dbutils):
         
 _dbutils["MySQLdb"] = Mysql_dbutils
 
+class Sqlite_dbutils(Generic_dbutils):
+    """Add support for SQLite using the sqlite3 module (Python 2.5 or later).
+
+    The SQL used in BioSQL has %s placeholders (the paramstyle of the
+    other drivers), these are replaced by the ? placeholders of sqlite3.
+    """
+    def execute(self, cursor, sql, args=None):
+        cursor.execute(sql.replace("%s", "?"), args or ())
+
+    def executemany(self, cursor, sql, seq):
+        cursor.executemany(sql.replace("%s", "?"), seq)
+
+    def last_id(self, cursor, table):
+        return cursor.lastrowid
+
+    def autocommit(self, conn, y = True):
+        if y:
+            conn.isolation_level = None
+        else:
+            conn.isolation_level = ""
+
+    def substring(self):
+        return "SUBSTR(seq, %s, %s)"
+
+_dbutils["sqlite3"] = Sqlite_dbutils
+
 class Psycopg_dbutils(Generic_dbutils):
     def next_id(self, cursor, table):
         table = self.tname(table)
@@ -0,0 +1,449 @@
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+#
+# Note that BioSQL (including the database schema and scripts) is
+# available and licensed separately.  Please consult www.biosql.org
+"""Use a BioSQL database from several threads, with a pool of connections.
+
+The DBServer returned by BioSeqDatabase.open_database has one connection
+and one Adaptor (cursor), which can't be shared between threads. Instead,
+open_pooled_database returns a PooledDBServer, which gives each thread an
+Adaptor of its own, on a connection taken from a bounded pool:
+
+    >>> from BioSQL import Pool
+    >>> server = Pool.open_pooled_database(driver = "MySQLdb", user = "root",
+    ...                                    db = "minidb", max_connections = 5)
+    >>> db = server["embl"]
+
+Then in each thread (e.g. for each request of a web service):
+
+    >>> try:
+    ...     record = db.lookup(version = "X77802.1")
+    ... finally:
+    ...     server.release()
+
+The first use of the server (or a database of it) in a thread takes a
+connection from the pool, and release() gives it back. If all the
+connections are in use, the thread waits for one to be released.
+
+Records looked up by accession or version are retrieved in full (the
+sequence, features and annotations, with the fixed number of queries of
+BioSeqDatabase.itervalues) and kept in a least recently used cache shared
+by all the threads, so they must be treated as read only. Use
+clear_cache() after changing the database.
+"""
+import thread
+import threading
+import time
+
+import BioSeq
+from BioSeqDatabase import _connect, Adaptor, BioSeqDatabase, _allowed_lookups
+import DBUtils
+
+class LRUCache:
+    """Dictionary like cache keeping the most recently used items.
+
+    Once it holds max_size items, adding another discards the least
+    recently used one. Getting or setting an item counts as using it.
+    The cache can be used from several threads.
+    """
+    def __init__(self, max_size=100):
+        if max_size < 1:
+            raise ValueError("max_size must be at least one")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        #Doubly linked list of [previous, next, key, value] items, from the
+        #most to the least recently used, between a sentinel item.
+        self._root = [None, None, None, None]
+        self._root[0] = self._root
+        self._root[1] = self._root
+        self._items = {}
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            self._clear()
+        finally:
+            self._lock.release()
+
+    def _unlink(self, item):
+        item[0][1] = item[1]
+        item[1][0] = item[0]
+
+    def _link(self, item):
+        #Insert as the most recently used item
+        root = self._root
+        item[0] = root
+        item[1] = root[1]
+        root[1][0] = item
+        root[1] = item
+
+    def get(self, key, default=None):
+        self._lock.acquire()
+        try:
+            try:
+                item = self._items[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._unlink(item)
+            self._link(item)
+            return item[3]
+        finally:
+            self._lock.release()
+
+    def __getitem__(self, key):
+        marker = []
+        value = self.get(key, marker)
+        if value is marker:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._lock.acquire()
+        try:
+            if key in self._items:
+                item = self._items[key]
+                self._unlink(item)
+                item[3] = value
+            else:
+                if len(self._items) >= self.max_size:
+                    oldest = self._root[0]
+                    self._unlink(oldest)
+                    del self._items[oldest[2]]
+                item = [None, None, key, value]
+                self._items[key] = item
+            self._link(item)
+        finally:
+            self._lock.release()
+
+class ConnectionPool:
+    """A bounded pool of database connections, each with an Adaptor.
+
+    Connections are made when needed, up to max_connections. A connection
+    which has been idle for more than max_idle seconds is checked (with a
+    trivial query) before it is handed out again, and replaced if it has
+    gone away (e.g. closed by the server after a timeout).
+    """
+    def __init__(self, connect, module, module_name=None, max_connections=5,
+                 max_idle=60, timeout=None):
+        """Create the pool.
+
+        connect - function taking no arguments, returning a new connection.
+        module - the DB-API module of the connections.
+        max_connections - the most connections open at once.
+        max_idle - idle time (seconds) after which a connection is checked.
+        timeout - the longest time (seconds) to wait for a connection,
+                  by default wait as long as it takes.
+        """
+        if max_connections < 1:
+            raise ValueError("max_connections must be at least one")
+        if module_name is None:
+            module_name = module.__name__
+        self.module = module
+        self.module_name = module_name
+        self.max_connections = max_connections
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._connect = connect
+        self._condition = threading.Condition()
+        #List of (time released, adaptor) of the idle connections
+        self._idle = []
+        self._open = 0
+        self.connections_made = 0
+        self.closed = False
+
+    def _new_adaptor(self):
+        conn = self._connect()
+        self.connections_made += 1
+        return Adaptor(conn, DBUtils.get_dbutils(self.module_name))
+
+    def _check(self, adaptor):
+        """Return True if the connection of an adaptor still works (PRIVATE)."""
+        try:
+            adaptor.execute_and_fetchall("SELECT 1")
+            return True
+        except self.module.Error:
+            return False
+
+    def _discard(self, adaptor):
+        try:
+            adaptor.close()
+        except self.module.Error:
+            pass
+
+    def get(self):
+        """Take an adaptor (with its connection) from the pool.
+
+        Waits for one to be returned if max_connections are in use.
+        """
+        self._condition.acquire()
+        try:
+            if self.timeout is not None:
+                end = time.time() + self.timeout
+            while not self._idle and self._open >= self.max_connections:
+                if self.closed:
+                    raise RuntimeError("The connection pool is closed")
+                if self.timeout is None:
+                    self._condition.wait()
+                else:
+                    remaining = end - time.time()
+                    if remaining <= 0:
+                        raise RuntimeError("No database connection was "
+                                           "free after %s seconds"
+                                           % self.timeout)
+                    self._condition.wait(remaining)
+            if self.closed:
+                raise RuntimeError("The connection pool is closed")
+            if self._idle:
+                released, adaptor = self._idle.pop()
+            else:
+                released, adaptor = None, None
+            #Count the connection as open while making or checking it
+            self._open += 1
+        finally:
+            self._condition.release()
+        try:
+            if adaptor is not None and time.time() - released > self.max_idle \
+            and not self._check(adaptor):
+                self._discard(adaptor)
+                adaptor = None
+            if adaptor is None:
+                adaptor = self._new_adaptor()
+        except:
+            self._condition.acquire()
+            try:
+                self._open -= 1
+                self._condition.notify()
+            finally:
+                self._condition.release()
+            raise
+        return adaptor
+
+    def put(self, adaptor):
+        """Return an adaptor taken from the pool.
+
+        Any open transaction is rolled back, connections which fail to do
+        so are closed.
+        """
+        try:
+            adaptor.rollback()
+            healthy = True
+        except self.module.Error:
+            self._discard(adaptor)
+            healthy = False
+        self._condition.acquire()
+        try:
+            self._open -= 1
+            if healthy and not self.closed:
+                #The most recently used connections are reused first
+                self._idle.append((time.time(), adaptor))
+            elif healthy:
+                self._discard(adaptor)
+            self._condition.notify()
+        finally:
+            self._condition.release()
+
+    def close(self):
+        """Close the idle connections, and those returned from now on."""
+        self._condition.acquire()
+        try:
+            self.closed = True
+            for released, adaptor in self._idle:
+                self._discard(adaptor)
+            self._idle = []
+            self._condition.notifyAll()
+        finally:
+            self._condition.release()
+
+def open_pooled_database(driver = "MySQLdb", max_connections = 5,
+                         cache_size = 100, max_idle = 60, timeout = None,
+                         **kwargs):
+    """Open a BioSQL database to use from several threads.
+
+    The driver and connection arguments are those of
+    BioSeqDatabase.open_database, and are used for every new connection.
+    max_connections, max_idle and timeout are passed to the ConnectionPool,
+    cache_size is the number of records kept in the cache (0 for none).
+
+    With SQLite each connection opens the database file again, so an
+    in memory database (":memory:") can't be used.
+    """
+    kw = kwargs.copy()
+    if driver == "sqlite3":
+        # The connections are handed from thread to thread
+        kw["check_same_thread"] = False
+    #Make the first connection now, to fail early with bad arguments
+    module, conn = _connect(driver, **kw)
+    connections = [conn]
+    def connect():
+        try:
+            return connections.pop()
+        except IndexError:
+            return _connect(driver, **kw)[1]
+    pool = ConnectionPool(connect, module, max_connections = max_connections,
+                          max_idle = max_idle, timeout = timeout)
+    return PooledDBServer(pool, cache_size)
+
+class PooledDBServer:
+    """A BioSQL server giving each thread an Adaptor from a ConnectionPool.
+
+    This can be used like a BioSeqDatabase.DBServer (e.g. server["embl"],
+    server.new_database, server.adaptor.commit), where the adaptor is the
+    one of the current thread.
+    """
+    def __init__(self, pool, cache_size=100):
+        self.pool = pool
+        self.module = pool.module
+        self.module_name = pool.module_name
+        if cache_size:
+            self.cache = LRUCache(cache_size)
+        else:
+            self.cache = None
+        #The taxonomy annotations of each taxon_id seen (see BioSeq)
+        self._taxa = {}
+        #The adaptor of each thread, by thread id
+        self._adaptors = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return self.__class__.__name__ + "(%r)" % self.pool
+
+    def _get_adaptor(self):
+        thread_id = thread.get_ident()
+        try:
+            return self._adaptors[thread_id]
+        except KeyError:
+            pass
+        adaptor = self.pool.get()
+        self._lock.acquire()
+        try:
+            self._adaptors[thread_id] = adaptor
+        finally:
+            self._lock.release()
+        return adaptor
+    adaptor = property(_get_adaptor, doc="The Adaptor of the current thread")
+
+    def release(self):
+        """Return the connection of the current thread to the pool.
+
+        Call this when a thread (or task) is done with the database, any
+        transaction not committed is rolled back. A connection is taken
+        from the pool again if the thread uses the database later.
+        """
+        self._lock.acquire()
+        try:
+            adaptor = self._adaptors.pop(thread.get_ident(), None)
+        finally:
+            self._lock.release()
+        if adaptor is not None:
+            self.pool.put(adaptor)
+
+    def close(self):
+        """Close all the connections of the pool."""
+        self._lock.acquire()
+        try:
+            adaptors = self._adaptors.values()
+            self._adaptors = {}
+        finally:
+            self._lock.release()
+        for adaptor in adaptors:
+            self.pool.put(adaptor)
+        self.pool.close()
+
+    def clear_cache(self):
+        """Forget the cached records and taxonomy annotations (e.g. after
+        changing the database)."""
+        if self.cache is not None:
+            self.cache.clear()
+        self._taxa.clear()
+
+    def __getitem__(self, name):
+        return PooledBioSeqDatabase(self, name)
+    def keys(self):
+        return self.adaptor.list_biodatabase_names()
+    def values(self):
+        return [self[key] for key in self.keys()]
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def new_database(self, db_name, authority=None, description=None):
+        """Add a new database to the server and return it.
+        """
+        sql = r"INSERT INTO biodatabase (name, authority, description)" \
+              r" VALUES (%s, %s, %s)"
+        self.adaptor.execute(sql, (db_name, authority, description))
+        return PooledBioSeqDatabase(self, db_name)
+
+class PooledBioSeqDatabase(BioSeqDatabase):
+    """A BioSeqDatabase of a PooledDBServer.
+
+    The adaptor used is the one of the current thread. Records looked up
+    by accession or version (with get_Seq_by_acc, get_Seq_by_ver or lookup)
+    are complete, and cached by the server.
+    """
+    def __init__(self, server, name):
+        self.server = server
+        self.name = name
+        self.dbid = server.adaptor.fetch_dbid_by_dbname(name)
+
+    def __repr__(self):
+        return "PooledBioSeqDatabase(%r, %r)" % (self.server, self.name)
+
+    def _get_adaptor(self):
+        return self.server.adaptor
+    adaptor = property(_get_adaptor, doc="The Adaptor of the current thread")
+
+    def _cached_record(self, lookup_name, value):
+        """Look up a complete record, using the cache of the server (PRIVATE)."""
+        cache = self.server.cache
+        key = (self.dbid, lookup_name, value)
+        if cache is not None:
+            record = cache.get(key)
+            if record is not None:
+                return record
+        adaptor = self.adaptor
+        seqid = getattr(adaptor, lookup_name)(self.dbid, value)
+        bioentry = adaptor.execute_one(
+            "SELECT bioentry_id, " + BioSeq._BIOENTRY_COLUMNS + \
+            " FROM bioentry WHERE bioentry_id = %s", (seqid,))
+        record = BioSeq._retrieve_records_batch(adaptor, [bioentry],
+                                                self.server._taxa)[0]
+        if cache is not None:
+            cache[key] = record
+        return record
+
+    def get_Seq_by_acc(self, name):
+        """Gets a Bio::Seq object by accession number (cached)
+
+        Example: seq = db.get_Seq_by_acc('X77802')
+
+        """
+        return self._cached_record("fetch_seqid_by_accession", name)
+
+    def get_Seq_by_ver(self, name):
+        """Gets a Bio::Seq object by version number (cached)
+
+        Example: seq = db.get_Seq_by_ver('X77802.1')
+
+        """
+        return self._cached_record("fetch_seqid_by_version", name)
+
+    def lookup(self, **kwargs):
+        if len(kwargs) == 1 and kwargs.keys()[0] in ["accession", "version"]:
+            k, v = kwargs.items()[0]
+            return self._cached_record(_allowed_lookups[k], v)
+        return BioSeqDatabase.lookup(self, **kwargs)
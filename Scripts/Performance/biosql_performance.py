@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+"""Time loading GenBank records into BioSQL, and getting them back.
+
+Usage: biosql_performance.py [records] [commit_every]
+
+Loads copies of the records in Tests/GenBank/NC_005816.gb and cor6_6.gb
+(default 500 records, with new accessions) into a new SQLite database
+(using Tests/BioSQL/biosqldb-sqlite.sql), once with the standard loader
+and once with bulk=True. The SQL commands sent are counted, and the
+loaded records are checked to be the same.
+
+The features of all the records are then retrieved one record at a time,
+and in batches with BioSeq.fetch_features. Finally all the records are
+written out as GenBank, from values() and from itervalues().
+"""
+import copy
+from cStringIO import StringIO
+import os
+import sys
+import tempfile
+import time
+
+from Bio import SeqIO
+from BioSQL import BioSeqDatabase, BioSeq
+
+base = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+SQL_FILE = os.path.join(base, "Tests", "BioSQL", "biosqldb-sqlite.sql")
+
+def make_records(count) :
+    templates = []
+    for name in ["NC_005816.gb", "cor6_6.gb"] :
+        handle = open(os.path.join(base, "Tests", "GenBank", name))
+        templates.extend(SeqIO.parse(handle, "genbank"))
+        handle.close()
+    records = []
+    for i in range(count) :
+        record = copy.deepcopy(templates[i % len(templates)])
+        accession = "XX%06i" % i
+        record.id = accession + ".1"
+        record.name = accession
+        record.annotations["accessions"] = [accession]
+        record.annotations["gi"] = str(i)
+        records.append(record)
+    return records
+
+def load(records, filename, bulk, commit_every) :
+    if os.path.exists(filename) :
+        os.remove(filename)
+    server = BioSeqDatabase.open_database(driver="sqlite3", db=filename)
+    server.load_database_sql(SQL_FILE)
+    server.adaptor.commit()
+    db = server.new_database("test")
+    count = server.adaptor.query_count
+    start = time.time()
+    db.load(records, bulk=bulk, commit_every=commit_every)
+    server.adaptor.commit()
+    taken = time.time() - start
+    return server, db, taken, server.adaptor.query_count - count
+
+def retrieve_features(db, batch_size) :
+    adaptor = db.adaptor
+    count = adaptor.query_count
+    start = time.time()
+    records = db.values()
+    if batch_size :
+        BioSeq.fetch_features(records, batch_size)
+    answer = [len(record.features) for record in records]
+    taken = time.time() - start
+    return answer, taken, adaptor.query_count - count
+
+def with_features(records) :
+    #The GenBank writer does not (yet) write the features, use them anyway
+    for record in records :
+        record.features
+        yield record
+
+def export(db, chunk_size) :
+    adaptor = db.adaptor
+    count = adaptor.query_count
+    start = time.time()
+    handle = StringIO()
+    if chunk_size :
+        records = db.itervalues(chunk_size)
+    else :
+        records = db.values()
+    SeqIO.write(with_features(records), handle, "genbank")
+    taken = time.time() - start
+    return handle.getvalue(), taken, adaptor.query_count - count
+
+def main(count, commit_every) :
+    records = make_records(count)
+    features = sum([len(r.features) for r in records])
+    print "%i records with %i features" % (len(records), features)
+    filename = os.path.join(tempfile.gettempdir(), "biosql_performance.db")
+    answer = []
+    server = None
+    for bulk in [False, True] :
+        if server :
+            server.adaptor.close()
+        server, db, taken, sql = load(records, filename, bulk, commit_every)
+        print "bulk=%s %0.2fs, %i SQL commands" % (bulk, taken, sql)
+        record = db.lookup(accession="XX%06i" % (count - 1))
+        answer.append((record.seq.tostring(), len(record.features),
+                       [f.qualifiers for f in record.features]))
+    assert answer[0] == answer[1]
+    #Retrieve the features of the records loaded with the bulk loader
+    answer = []
+    for batch_size in [None, 100] :
+        lengths, taken, sql = retrieve_features(db, batch_size)
+        if batch_size :
+            print "features fetch_features(batch_size=%i) %0.2fs, " \
+                  "%i SQL commands" % (batch_size, taken, sql)
+        else :
+            print "features one record at a time %0.2fs, %i SQL commands" \
+                  % (taken, sql)
+        answer.append(lengths)
+    assert answer[0] == answer[1]
+    answer = []
+    for chunk_size in [None, 100] :
+        text, taken, sql = export(db, chunk_size)
+        if chunk_size :
+            print "GenBank from itervalues(chunk_size=%i) %0.2fs, " \
+                  "%i SQL commands" % (chunk_size, taken, sql)
+        else :
+            print "GenBank from values() %0.2fs, %i SQL commands" \
+                  % (taken, sql)
+        answer.append(text)
+    assert answer[0] == answer[1]
+    server.adaptor.close()
+    os.remove(filename)
+
+if __name__ == "__main__" :
+    count = 500
+    commit_every = 100
+    if len(sys.argv) > 1 :
+        count = int(sys.argv[1])
+    if len(sys.argv) > 2 :
+        commit_every = int(sys.argv[2])
+    main(count, commit_every)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""Time looking up BioSQL records from several threads with a pool.
+
+Usage: biosql_pool_performance.py [threads] [lookups] [connections]
+
+Loads 500 GenBank records (as in biosql_performance.py) into a new SQLite
+database, then each thread (default 8) looks up records by version
+(default 500 lookups per thread, mostly of a few popular records) using
+a BioSQL.Pool.PooledDBServer with a pool of (default 4) connections. This
+is done without a record cache, and with a cache of 100 records.
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from BioSQL import Pool
+from biosql_performance import make_records, load
+
+def lookup_all(server, versions) :
+    db = server["test"]
+    try :
+        for version in versions :
+            record = db.lookup(version=version)
+            len(record.features)
+    finally :
+        server.release()
+
+def main(threads, lookups, connections) :
+    records = make_records(500)
+    filename = os.path.join(tempfile.gettempdir(), "biosql_pool.db")
+    server, db, taken, sql = load(records, filename, True, 100)
+    server.adaptor.close()
+    random.seed(threads)
+    popular = [record.id for record in records[:50]]
+    work = []
+    for i in range(threads) :
+        versions = []
+        for j in range(lookups) :
+            if random.random() < 0.9 :
+                versions.append(random.choice(popular))
+            else :
+                versions.append(random.choice(records).id)
+        work.append(versions)
+    print "%i threads each looking up %i records" % (threads, lookups)
+    for cache_size in [0, 100] :
+        server = Pool.open_pooled_database(driver="sqlite3", db=filename,
+                                           max_connections=connections,
+                                           cache_size=cache_size)
+        start = time.time()
+        running = [threading.Thread(target=lookup_all, args=(server, versions))
+                   for versions in work]
+        for t in running :
+            t.start()
+        for t in running :
+            t.join()
+        taken = time.time() - start
+        print "cache_size=%i %0.2fs, %i connections" \
+              % (cache_size, taken, server.pool.connections_made)
+        server.close()
+    os.remove(filename)
+
+if __name__ == "__main__" :
+    threads = 8
+    lookups = 500
+    connections = 4
+    if len(sys.argv) > 1 :
+        threads = int(sys.argv[1])
+    if len(sys.argv) > 2 :
+        lookups = int(sys.argv[2])
+    if len(sys.argv) > 3 :
+        connections = int(sys.argv[3])
+    main(threads, lookups, connections)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""Compare the speed and memory use of the BLAST XML parsers.
+
+Usage: blast_xml_performance.py [filename] [repeats]
+
+Times Bio.Blast.NCBIXML.parse (SAX based) against NCBIXML.iterparse
+(ElementTree based, with and without the HSP alignment strings) on a
+BLAST XML file.  If no file is given, a large file is made by repeating
+the <Iteration> element of Tests/Blast/xbt001.xml (default 1000 times).
+
+Each parser is run in a child process (on Unix) so that the peak memory
+reported is not affected by the previous runs.
+"""
+import os
+import sys
+import time
+
+from Bio.Blast import NCBIXML
+
+def make_test_file(filename, repeats) :
+    """Write a large multi-query XML file based on a small example."""
+    example = os.path.join(os.path.dirname(__file__), "..", "..",
+                           "Tests", "Blast", "xbt001.xml")
+    text = open(example).read()
+    start = text.index("<Iteration>")
+    end = text.index("</Iteration>") + len("</Iteration>")
+    handle = open(filename, "w")
+    handle.write(text[:start])
+    for i in range(repeats) :
+        handle.write(text[start:end].replace("<Iteration_iter-num>1<",
+                     "<Iteration_iter-num>%i<" % (i+1)))
+        handle.write("\n")
+    handle.write(text[end:])
+    handle.close()
+
+def time_parser(name, function, filename) :
+    start_time = time.time()
+    count = 0
+    hsps = 0
+    for record in function(open(filename)) :
+        count += 1
+        for alignment in record.alignments :
+            hsps += len(alignment.hsps)
+    elapsed_time = time.time() - start_time
+    try :
+        import resource
+        peak = "%i kB" % resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError :
+        peak = "unknown"
+    print "%s\n\t%i records with %i HSPs in %0.2f seconds, peak memory %s" \
+          % (name, count, hsps, elapsed_time, peak)
+
+def no_alignments(handle) :
+    return NCBIXML.iterparse(handle, alignments=False)
+
+parsers = [("NCBIXML.parse", NCBIXML.parse),
+           ("NCBIXML.iterparse", NCBIXML.iterparse),
+           ("NCBIXML.iterparse(alignments=False)", no_alignments)]
+
+if __name__ == "__main__" :
+    if len(sys.argv) > 1 and os.path.isfile(sys.argv[1]) :
+        filename = sys.argv[1]
+    else :
+        repeats = 1000
+        if len(sys.argv) > 2 :
+            repeats = int(sys.argv[2])
+        filename = "blast_xml_performance.xml"
+        make_test_file(filename, repeats)
+        print "Created %s with %i queries" % (filename, repeats)
+
+    for name, function in parsers :
+        if hasattr(os, "fork") :
+            pid = os.fork()
+            if pid == 0 :
+                time_parser(name, function, filename)
+                sys.stdout.flush()
+                os._exit(0)
+            os.waitpid(pid, 0)
+        else :
+            time_parser(name, function, filename)
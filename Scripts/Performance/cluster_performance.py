@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""Time Bio.Cluster with the distance matrix in memory and in a file.
+
+Usage: cluster_performance.py [genes] [processes]
+
+Makes random expression data of (default 4000) genes for 20 experiments,
+and calculates the distance matrix with Bio.Cluster.distancematrix and
+with Bio.Cluster.DistanceFile.distancematrix, using one and several
+(default 4) processes. Then does single, average and maximum linkage
+hierarchical clustering and k-medoids clustering with both, reporting
+the time taken and the growth of the maximum resident memory of the
+process (on Unix).
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy
+
+from Bio import Cluster
+from Bio.Cluster import DistanceFile
+
+def max_memory() :
+    try :
+        import resource
+    except ImportError :
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def timed(name, function, *args, **kwargs) :
+    memory = max_memory()
+    start = time.time()
+    result = function(*args, **kwargs)
+    print "%s %0.2fs, maximum memory grew by %i kB" \
+          % (name, time.time() - start, max_memory() - memory)
+    return result
+
+def main(genes, processes) :
+    numpy.random.seed(genes)
+    data = numpy.random.rand(genes, 20)
+    filename = os.path.join(tempfile.gettempdir(), "cluster_performance.dist")
+    print "%i genes, distance file of %i bytes" % (genes, 2*genes*(genes-1))
+    #The file first, so the memory growth is not hidden by the other
+    distances = timed("DistanceFile.distancematrix", DistanceFile.distancematrix,
+                      filename, data)
+    timed("DistanceFile.distancematrix, %i processes" % processes,
+          DistanceFile.distancematrix, filename, data, processes=processes)
+    for method in "sam" :
+        timed("DistanceFile.treecluster method=%s" % method,
+              DistanceFile.treecluster, distances, method)
+    initialid = numpy.arange(genes) % 10
+    timed("DistanceFile.kmedoids", DistanceFile.kmedoids, distances,
+          initialid=initialid)
+    matrix = timed("Cluster.distancematrix", Cluster.distancematrix, data)
+    for method in "sam" :
+        timed("Cluster.treecluster method=%s" % method, Cluster.treecluster,
+              distancematrix=Cluster.distancematrix(data), method=method)
+    timed("Cluster.kmedoids", Cluster.kmedoids, matrix, initialid=initialid)
+    del distances
+    os.remove(filename)
+
+if __name__ == "__main__" :
+    genes = 4000
+    processes = 4
+    if len(sys.argv) > 1 :
+        genes = int(sys.argv[1])
+    if len(sys.argv) > 2 :
+        processes = int(sys.argv[2])
+    main(genes, processes)
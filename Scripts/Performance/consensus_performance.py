@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""Time counting the clades of many bootstrap trees.
+
+Usage: consensus_performance.py [trees] [taxa] [processes]
+
+Makes random trees (default 1000 trees of 100 taxa, half of them the same
+tree) as newick strings, and builds their majority rule consensus tree
+with an outgroup three ways: parsing each string into a Tree and calling
+Trees.consensus, counting the strings with a CladeCounter in this process,
+and counting them with a CladeCounter in several worker processes. The
+three consensus trees are checked to be identical.
+"""
+import random
+import sys
+import time
+
+from Bio.Nexus.Trees import Tree, consensus
+from Bio.Nexus.Consensus import CladeCounter
+
+def random_newick(taxa) :
+    nodes = list(taxa)
+    while len(nodes) > 2 :
+        random.shuffle(nodes)
+        nodes = ["(%s,%s):0.1" % (nodes[0], nodes[1])] + nodes[2:]
+    return "(%s,%s);" % (nodes[0], nodes[1])
+
+def main(trees, taxa, processes) :
+    random.seed(trees)
+    taxa = ["taxon%i" % (i + 1) for i in range(taxa)]
+    base = random_newick(taxa)
+    newicks = [random_newick(taxa) for i in range(trees // 2)]
+    newicks += [base] * (trees - len(newicks))
+    outgroup = [taxa[0]]
+    print "%i trees of %i taxa" % (trees, len(taxa))
+
+    start = time.time()
+    constree1 = consensus([Tree(newick) for newick in newicks],
+                          outgroup=outgroup)
+    print "Tree and Trees.consensus %0.2fs" % (time.time() - start)
+
+    start = time.time()
+    counter = CladeCounter(taxa, outgroup)
+    counter.add_trees(newicks)
+    constree2 = counter.consensus()
+    print "CladeCounter %0.2fs" % (time.time() - start)
+
+    start = time.time()
+    counter = CladeCounter(taxa, outgroup)
+    counter.add_trees(newicks, processes=processes)
+    constree3 = counter.consensus()
+    print "CladeCounter with %i processes %0.2fs" \
+          % (processes, time.time() - start)
+    assert constree1.is_identical(constree2)
+    assert constree1.is_identical(constree3)
+
+if __name__ == "__main__" :
+    trees = 1000
+    taxa = 100
+    processes = 2
+    if len(sys.argv) > 1 :
+        trees = int(sys.argv[1])
+    if len(sys.argv) > 2 :
+        taxa = int(sys.argv[2])
+    if len(sys.argv) > 3 :
+        processes = int(sys.argv[3])
+    main(trees, taxa, processes)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""Time the Bio.Entrez XML parser.
+
+Usage: entrez_performance.py [repeats] [articles]
+
+Reads Tests/Entrez/pubmed2.xml repeatedly (default 200 times) with
+Entrez.read, which shows the cost of loading the DTD for each file. Then
+times getting the first record of that file in a new process (simulated
+by emptying the DTD cache in memory), either parsing the DTDs or loading
+their classification saved by an earlier process in compiled_dir. Then
+makes a PubMed EFetch XML file of many articles (default 10000 copies of
+those in Tests/Entrez/pubmed2.xml) and goes through it with Entrez.parse
+and with Entrez.read, reporting the time taken and the growth of the
+maximum resident memory of the process (on Unix).
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+from StringIO import StringIO
+
+from Bio import Entrez
+from Bio.Entrez import Parser
+
+base = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..",
+                    "Tests", "Entrez")
+
+def max_memory() :
+    try :
+        import resource
+    except ImportError :
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def big_pubmed(articles) :
+    text = open(os.path.join(base, "pubmed2.xml")).read()
+    start = text.index("<PubmedArticle>")
+    end = text.rindex("</PubmedArticle>") + len("</PubmedArticle>")
+    body = text[start:end]
+    copies = articles // body.count("<PubmedArticle>")
+    return text[:start] + body * copies + text[end:], \
+           copies * body.count("<PubmedArticle>")
+
+def first_record(filename, repeats, compiled_dir) :
+    Parser.compiled_dir = compiled_dir
+    start = time.time()
+    for i in range(repeats) :
+        Parser._dtd_cache = {}
+        Entrez.parse(open(filename)).next()
+    return time.time() - start
+
+def main(repeats, articles) :
+    filename = os.path.join(base, "pubmed2.xml")
+    start = time.time()
+    for i in range(repeats) :
+        Entrez.read(open(filename))
+    print "Entrez.read of pubmed2.xml %i times %0.2fs" \
+          % (repeats, time.time() - start)
+
+    compiled_dir = Parser.compiled_dir
+    temp = tempfile.mkdtemp()
+    try :
+        print "First record in a new process %i times, parsing the DTDs " \
+              "%0.2fs, loading them from compiled_dir %0.2fs" \
+              % (repeats, first_record(filename, repeats, None),
+                 first_record(filename, repeats, temp))
+    finally :
+        Parser.compiled_dir = compiled_dir
+        shutil.rmtree(temp)
+
+    text, articles = big_pubmed(articles)
+    print "PubMed XML of %i articles, %i bytes" % (articles, len(text))
+    memory = max_memory()
+    start = time.time()
+    count = 0
+    for record in Entrez.parse(StringIO(text)) :
+        count += 1
+    assert count == articles
+    print "Entrez.parse %0.2fs, maximum memory grew by %i kB" \
+          % (time.time() - start, max_memory() - memory)
+    memory = max_memory()
+    start = time.time()
+    records = Entrez.read(StringIO(text))
+    assert len(records) == articles
+    print "Entrez.read %0.2fs, maximum memory grew by %i kB" \
+          % (time.time() - start, max_memory() - memory)
+
+if __name__ == "__main__" :
+    repeats = 200
+    articles = 10000
+    if len(sys.argv) > 1 :
+        repeats = int(sys.argv[1])
+    if len(sys.argv) > 2 :
+        articles = int(sys.argv[2])
+    main(repeats, articles)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""Time Baum-Welch training with the scaled and NumPy log-space algorithms.
+
+Usage: hmm_performance.py [length] [states] [iterations]
+
+Trains a model with random probabilities (default 10 states emitting DNA)
+on a random DNA sequence (default 3000 bases), using ScaledDPAlgorithms
+and then LogDPAlgorithms for a fixed number of iterations (default 2).
+"""
+import random
+import sys
+import time
+
+from Bio import Alphabet
+from Bio.Seq import Seq
+from Bio.HMM import MarkovModel, Trainer
+from Bio.HMM.DynamicProgramming import ScaledDPAlgorithms, LogDPAlgorithms
+
+class DNAAlphabet(Alphabet.Alphabet) :
+    letters = ['A', 'C', 'G', 'T']
+
+def train(dp_method, training_seq, state_alphabet, iterations) :
+    random.seed(1)
+    builder = MarkovModel.MarkovModelBuilder(state_alphabet, DNAAlphabet())
+    builder.allow_all_transitions()
+    builder.set_random_probabilities()
+    def stop(change, num_iterations) :
+        return num_iterations >= iterations
+    start = time.time()
+    Trainer.BaumWelchTrainer(builder.get_markov_model()).train( \
+        [training_seq], stop, dp_method)
+    return time.time() - start
+
+def main(length, states, iterations) :
+    class StateAlphabet(Alphabet.Alphabet) :
+        letters = ["S%i" % i for i in range(states)]
+    random.seed(length)
+    seq = Seq("".join([random.choice("ACGT") for i in range(length)]),
+              DNAAlphabet())
+    training_seq = Trainer.TrainingSequence(seq, Seq("", StateAlphabet()))
+    print "%i bases, %i states, %i iterations" % (length, states, iterations)
+    for dp_method in [ScaledDPAlgorithms, LogDPAlgorithms] :
+        print "%s %0.2fs" % (dp_method.__name__,
+                             train(dp_method, training_seq, StateAlphabet(),
+                                   iterations))
+
+if __name__ == "__main__" :
+    length = 3000
+    states = 10
+    iterations = 2
+    if len(sys.argv) > 1 :
+        length = int(sys.argv[1])
+    if len(sys.argv) > 2 :
+        states = int(sys.argv[2])
+    if len(sys.argv) > 3 :
+        iterations = int(sys.argv[3])
+    main(length, states, iterations)
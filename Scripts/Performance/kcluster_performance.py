@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""Time k-means clustering passes in parallel, and mini-batch k-means.
+
+Usage: kcluster_performance.py [genes] [npass] [processes]
+
+Makes random expression data of (default 20000) genes for 20 experiments,
+around 10 centers, and clusters them into 10 clusters with kcluster
+(npass passes, default 16, one after the other) and with
+parallel_kcluster using one and several (default 4) processes. Then with
+minibatch_kcluster, on the same data and on ten times as many genes.
+"""
+import sys
+import time
+
+import numpy
+
+from Bio import Cluster
+
+def make_data(genes) :
+    centers = numpy.random.rand(10, 20) * 4
+    return centers[numpy.random.randint(0, 10, genes)] \
+           + numpy.random.randn(genes, 20)
+
+def main(genes, npass, processes) :
+    numpy.random.seed(genes)
+    data = make_data(genes)
+    print "%i genes, %i passes" % (genes, npass)
+    start = time.time()
+    clusterid, error, nfound = Cluster.kcluster(data, 10, npass=npass)
+    print "kcluster %0.2fs, error %0.1f, found %i times" \
+          % (time.time() - start, error, nfound)
+    for n in [1, processes] :
+        start = time.time()
+        clusterid, error, nfound, passes = \
+                   Cluster.parallel_kcluster(data, 10, npass=npass,
+                                             processes=n, seed=1)
+        seconds = [p[2] for p in passes]
+        print "parallel_kcluster, %i processes %0.2fs, error %0.1f, " \
+              "found %i times, passes took %0.2f-%0.2fs" \
+              % (n, time.time() - start, error, nfound, min(seconds),
+                 max(seconds))
+    for data in [data, make_data(10 * genes)] :
+        start = time.time()
+        clusterid, error = Cluster.minibatch_kcluster(data, 10, npass=3,
+                                                      seed=1)
+        print "minibatch_kcluster of %i genes %0.2fs, error %0.1f" \
+              % (len(data), time.time() - start, error)
+
+if __name__ == "__main__" :
+    genes = 20000
+    npass = 16
+    processes = 4
+    if len(sys.argv) > 1 :
+        genes = int(sys.argv[1])
+    if len(sys.argv) > 2 :
+        npass = int(sys.argv[2])
+    if len(sys.argv) > 3 :
+        processes = int(sys.argv[3])
+    main(genes, npass, processes)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""Time a restriction batch search against searching enzyme by enzyme.
+
+Usage: restriction_performance.py [length] [repeats]
+
+Searches a random DNA sequence (default one million bases) with all the
+enzymes in Bio.Restriction, once with RestrictionBatch.search (which only
+searches each distinct recognition site once) and once calling the search
+method of each enzyme in turn.  Both linear and circular sequences are
+tried, and the results are checked to be identical.
+"""
+import random
+import sys
+import time
+
+from Bio.Seq import Seq
+from Bio.Alphabet.IUPAC import IUPACAmbiguousDNA
+from Bio.Restriction.Restriction import RestrictionBatch, AllEnzymes, \
+                                        FormattedSeq
+
+def main(length, repeats) :
+    random.seed(length)
+    seq = Seq("".join([random.choice("ACGT") for i in range(length)]),
+              IUPACAmbiguousDNA())
+    print "%i enzymes, %i bp random sequence" % (len(AllEnzymes), length)
+    for linear in [True, False] :
+        batch_time = 0
+        single_time = 0
+        for i in range(repeats) :
+            batch = RestrictionBatch(AllEnzymes)
+            start = time.time()
+            batch_hits = batch.search(seq, linear)
+            batch_time += time.time() - start
+
+            start = time.time()
+            fseq = FormattedSeq(seq, linear)
+            single_hits = dict([(x, x.search(fseq)) for x in AllEnzymes])
+            single_time += time.time() - start
+            assert batch_hits == single_hits
+        print "linear=%s batch %0.2fs, one enzyme at a time %0.2fs" \
+              % (linear, batch_time / repeats, single_time / repeats)
+
+if __name__ == "__main__" :
+    length = 1000000
+    repeats = 1
+    if len(sys.argv) > 1 :
+        length = int(sys.argv[1])
+    if len(sys.argv) > 2 :
+        repeats = int(sys.argv[2])
+    main(length, repeats)
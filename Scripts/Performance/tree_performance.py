@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+"""Time patristic distances with Bio.Nexus.Trees and Bio.Nexus.ArrayTree.
+
+Usage: tree_performance.py [taxa] [pairs]
+
+Makes a random tree (default 10000 taxa), times Tree.distance for a
+sample of pairs of taxa (default 200), and times building an ArrayTree
+and its full distance matrix.
+"""
+import random
+import sys
+import time
+
+from Bio.Nexus.Trees import Tree
+from Bio.Nexus.ArrayTree import ArrayTree
+
+def main(ntax, pairs) :
+    random.seed(ntax)
+    tree = Tree()
+    tree.randomize(ntax=ntax, branchlength=1.0, branchlength_sd=0.3)
+    terminals = tree.get_terminals()
+    start = time.time()
+    for i in range(pairs) :
+        tree.distance(random.choice(terminals), random.choice(terminals))
+    per_pair = (time.time() - start) / pairs
+    print "%i taxa" % ntax
+    print "Tree.distance %0.4fs per pair, %0.0fs for all pairs" \
+          % (per_pair, per_pair * ntax * (ntax - 1) / 2)
+
+    start = time.time()
+    at = ArrayTree(tree)
+    print "ArrayTree %0.2fs" % (time.time() - start)
+    start = time.time()
+    taxa, matrix = at.distance_matrix()
+    print "ArrayTree.distance_matrix %0.2fs" % (time.time() - start)
+
+if __name__ == "__main__" :
+    ntax = 10000
+    pairs = 200
+    if len(sys.argv) > 1 :
+        ntax = int(sys.argv[1])
+    if len(sys.argv) > 2 :
+        pairs = int(sys.argv[2])
+    main(ntax, pairs)
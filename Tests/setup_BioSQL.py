@@ -18,6 +18,9 @@ from BioSQL import BioSeqDatabase
 # -- PostgreSQL
 #DBDRIVER = 'psycopg'
 #DBTYPE = 'pg'
+# -- SQLite (needs the sqlite3 module of Python 2.5 or later, but no server)
+DBDRIVER = 'sqlite3'
+DBTYPE = 'sqlite'
 
 # Constants for the database driver
 DBHOST = 'localhost'
@@ -25,11 +28,16 @@ DBUSER = 'root'
 DBPASSWD = ''
 TESTDB = 'biosql_test'
 
+# For SQLite the database is a file, which is deleted by the tests
+if DBDRIVER == 'sqlite3':
+    import tempfile
+    TESTDB = os.path.join(tempfile.gettempdir(), 'biosql_test.db')
+
 ################################
 # End of user-editable section #
 ################################
 
-# Works for mysql and postgresql, not oracle
+# Works for mysql, postgresql and sqlite, not oracle
 try:
     DBSCHEMA = "biosqldb-" + DBTYPE + ".sql"
 except NameError:
@@ -294,3 +294,17 @@ for (t_format, t_per, t_count, t_filename) in test_files :
     check_simple_write_read(alignments)
 
 print "Finished tested reading files"
+
+#Check the Stockholm parser can skip the per-residue (#=GR) annotation
+from Bio.AlignIO.StockholmIO import StockholmIterator
+full = list(StockholmIterator(open('Stockholm/funny.sth')))
+lean = list(StockholmIterator(open('Stockholm/funny.sth'),
+                              per_residue_annotation=False))
+assert len(full) == len(lean) == 1
+for r1, r2 in zip(full[0], lean[0]) :
+    assert r1.id == r2.id
+    assert r1.seq.tostring() == r2.seq.tostring()
+    assert r1.annotations["accession"] == r2.annotations["accession"]
+    for key in ["secondary_structure", "surface_accessibility", "active_site"] :
+        assert key not in r2.annotations
+assert "secondary_structure" in full[0].get_all_seqs()[1].annotations
@@ -0,0 +1,106 @@
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+
+"""Tests for random access to alignments via Bio.AlignIO.index()."""
+
+import os
+import unittest
+
+from Bio import AlignIO
+
+class StockholmIndexTest(unittest.TestCase) :
+
+    def setUp(self) :
+        #Build a multi-alignment file from the two example files,
+        #adding the PFAM style #=GF ID and AC lines where needed.
+        simple = open(os.path.join("Stockholm", "simple.sth")).read()
+        funny = open(os.path.join("Stockholm", "funny.sth")).read()
+        simple = simple.replace("# STOCKHOLM 1.0\n",
+                                "# STOCKHOLM 1.0\n#=GF ID Simple\n"
+                                "#=GF AC PF99999.3\n", 1)
+        self.filename = "Stockholm/temp_index.sth"
+        self.index_filename = "Stockholm/temp_index.sth.idx"
+        handle = open(self.filename, "w")
+        handle.write(funny + "\n" + simple)
+        handle.close()
+
+    def tearDown(self) :
+        for filename in [self.filename, self.index_filename] :
+            if os.path.isfile(filename) :
+                os.remove(filename)
+
+    def check_index(self, index) :
+        expected = list(AlignIO.parse(open(self.filename), "stockholm"))
+        self.assertEqual(len(expected), 2)
+        #One key per alignment, but all the keys can be used
+        self.assertEqual(len(index), 2)
+        self.assertEqual(list(index), ["PF00571", "PF99999.3"])
+        self.assertEqual(index.keys(), ["PF00571", "PF99999.3"])
+        keys = index.all_keys()
+        keys.sort()
+        self.assertEqual(keys, ["CBS", "PF00571", "PF99999", "PF99999.3",
+                                "Simple"])
+        for key in ["CBS", "PF00571"] :
+            self.assert_(key in index)
+            self.assertEqual([r.id for r in index[key]],
+                             [r.id for r in expected[0]])
+        for key in ["Simple", "PF99999", "PF99999.3"] :
+            self.assert_(key in index)
+            self.assertEqual([r.seq.tostring() for r in index[key]],
+                             [r.seq.tostring() for r in expected[1]])
+        self.assert_("missing" not in index)
+        self.assertEqual(index.get("missing"), None)
+        self.assertRaises(KeyError, index.__getitem__, "missing")
+        #Repeated and out of order lookups should work
+        self.assertEqual(len(index["Simple"].get_all_seqs()), 2)
+        self.assertEqual(len(index["CBS"].get_all_seqs()), 5)
+        self.assertEqual(len(index["Simple"].get_all_seqs()), 2)
+
+    def test_in_memory(self) :
+        """Index a Stockholm file without saving the offsets."""
+        index = AlignIO.index(self.filename, "stockholm")
+        self.check_index(index)
+        index.close()
+        self.assert_(not os.path.isfile(self.index_filename))
+
+    def test_saved(self) :
+        """Save the index to disk and reload it."""
+        index = AlignIO.index(self.filename, "stockholm", self.index_filename)
+        index.close()
+        self.assert_(os.path.isfile(self.index_filename))
+        index = AlignIO.index(self.filename, "stockholm", self.index_filename)
+        self.check_index(index)
+        index.close()
+
+    def test_old_version(self) :
+        """An index saved in another format version is rebuilt."""
+        handle = open(self.index_filename, "w")
+        handle.write("# Bio.AlignIO stockholm index version 1\n# 0 0\n")
+        handle.close()
+        index = AlignIO.index(self.filename, "stockholm", self.index_filename)
+        self.check_index(index)
+        index.close()
+        header = open(self.index_filename).readline()
+        self.assertEqual(header, "# Bio.AlignIO stockholm index version 2\n")
+
+    def test_unkeyed(self) :
+        """An alignment without an accession or identifier is rejected."""
+        handle = open(self.filename, "a")
+        handle.write(open(os.path.join("Stockholm", "simple.sth")).read())
+        handle.close()
+        self.assertRaises(ValueError, AlignIO.index, self.filename,
+                          "stockholm")
+
+    def test_bad_arguments(self) :
+        """Check invalid arguments to Bio.AlignIO.index() are rejected."""
+        self.assertRaises(TypeError, AlignIO.index,
+                          open(self.filename), "stockholm")
+        self.assertRaises(ValueError, AlignIO.index,
+                          self.filename, "Stockholm")
+        self.assertRaises(ValueError, AlignIO.index,
+                          self.filename, "clustal")
+
+if __name__ == "__main__" :
+    runner = unittest.TextTestRunner(verbosity = 2)
+    unittest.main(testRunner=runner)
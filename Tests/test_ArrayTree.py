@@ -0,0 +1,116 @@
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+
+import unittest
+import random
+
+try:
+    import numpy
+except ImportError:
+    from Bio import MissingExternalDependencyError
+    raise MissingExternalDependencyError(\
+        "Install NumPy if you want to use Bio.Nexus.ArrayTree.")
+
+from Bio.Nexus import Nexus
+from Bio.Nexus.Trees import Tree
+from Bio.Nexus.ArrayTree import ArrayTree
+
+
+class ArrayTreeTest(unittest.TestCase):
+    def setUp(self):
+        handle = open("Nexus/test_Nexus_input.nex")
+        self.trees = Nexus.Nexus(handle).trees
+        handle.close()
+        random.seed(7)
+        tree = Tree()
+        tree.randomize(ntax=50, branchlength=1.0, branchlength_sd=0.3)
+        self.trees.append(tree)
+
+    def test_common_ancestor(self):
+        """Common ancestors and distances, compared to Tree."""
+        for tree in self.trees:
+            at = ArrayTree(tree)
+            ids = tree.all_ids()
+            for i in range(200):
+                node1 = random.choice(ids)
+                node2 = random.choice(ids)
+                index1 = at.node(node1)
+                index2 = at.node(node2)
+                ancestor = at.common_ancestor(index1, index2)
+                self.assertEqual(at.node_ids[ancestor],
+                                 tree.common_ancestor(node1, node2))
+                self.assertAlmostEqual(at.distance(index1, index2),
+                                       tree.distance(node1, node2))
+                self.assertEqual(at.get_taxa(index1), tree.get_taxa(node1))
+
+    def test_is_monophyletic(self):
+        """Monophyly of taxon lists, compared to Tree."""
+        for tree in self.trees:
+            at = ArrayTree(tree)
+            taxa = tree.get_taxa()
+            for node in tree.all_ids():
+                self.assertEqual(at.node_ids[at.is_monophyletic(tree.get_taxa(node))],
+                                 tree.is_monophyletic(tree.get_taxa(node)))
+            for i in range(50):
+                taxon_list = random.sample(taxa, random.randint(1, len(taxa)))
+                index = at.is_monophyletic(taxon_list)
+                if index == -1:
+                    self.assertEqual(tree.is_monophyletic(taxon_list), -1)
+                else:
+                    self.assertEqual(at.node_ids[index],
+                                     tree.is_monophyletic(taxon_list))
+            self.assertEqual(at.is_monophyletic(["not a taxon"]), -1)
+
+    def test_distance_matrix(self):
+        """Patristic distance matrix."""
+        for tree in self.trees:
+            at = ArrayTree(tree)
+            taxa, matrix = at.distance_matrix()
+            self.assertEqual(taxa, tree.get_taxa())
+            for i in range(len(taxa)):
+                for j in range(len(taxa)):
+                    expected = tree.distance(tree.search_taxon(taxa[i]),
+                                             tree.search_taxon(taxa[j]))
+                    self.assertAlmostEqual(matrix[i, j], expected)
+            subset = random.sample(taxa, 4)
+            names, submatrix = at.distance_matrix(subset)
+            self.assertEqual(names, subset)
+            for i in range(4):
+                for j in range(4):
+                    self.assertEqual(submatrix[i, j],
+                                     matrix[taxa.index(subset[i]),
+                                            taxa.index(subset[j])])
+
+    def test_distance_matrix_internal(self):
+        """Patristic distances including labelled internal nodes."""
+        tree = Tree('(((a:1,b:2):0.5,c:3):0.25,(d:1,e:1):2);')
+        x = tree.common_ancestor(tree.search_taxon('a'),
+                                 tree.search_taxon('b'))
+        y = tree.node(x).prev
+        tree.node(x).data.taxon = 'x'
+        tree.node(y).data.taxon = 'y'
+        at = ArrayTree(tree)
+        taxa = ['a', 'y', 'x', 'c', 'e']
+        names, matrix = at.distance_matrix(taxa)
+        self.assertEqual(names, taxa)
+        for i in range(len(taxa)):
+            for j in range(len(taxa)):
+                expected = tree.distance(tree.search_taxon(taxa[i]),
+                                         tree.search_taxon(taxa[j]))
+                self.assertAlmostEqual(matrix[i, j], expected)
+        self.assertAlmostEqual(matrix[1, 0], 1.5)
+        self.assertAlmostEqual(matrix[2, 0], 1.0)
+
+    def test_to_tree(self):
+        """Conversion back to a Tree."""
+        for tree in self.trees:
+            new_tree = ArrayTree(tree).to_tree()
+            self.assertEqual(str(new_tree), str(tree))
+            self.assertEqual(new_tree.to_string(plain=False),
+                             tree.to_string(plain=False))
+            self.assert_(new_tree.is_identical(tree))
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner(verbosity = 2)
+    unittest.main(testRunner=runner)
@@ -14,6 +14,7 @@ from Bio import GenBank
 
 from BioSQL import BioSeqDatabase
 from BioSQL import BioSeq
+from BioSQL import Pool
 
 # This testing suite should try to detect whether a valid database
 # installation exists on this computer.  Only run the tests if it
@@ -28,9 +29,12 @@ except (NameError, ImportError) :
     raise MissingExternalDependencyError(message)
 
 try :
-    server = BioSeqDatabase.open_database(driver = DBDRIVER,
-                                          user = DBUSER, passwd = DBPASSWD,
-                                          host = DBHOST)
+    if DBDRIVER in ["sqlite3"] :
+        server = BioSeqDatabase.open_database(driver = DBDRIVER, db = TESTDB)
+    else :
+        server = BioSeqDatabase.open_database(driver = DBDRIVER,
+                                              user = DBUSER, passwd = DBPASSWD,
+                                              host = DBHOST)
     del server
 except Exception, e :
     message = "Connection failed, check settings in Tests/setup_BioSQL.py "\
@@ -40,6 +44,16 @@ except Exception, e :
 
 def create_database():
     """Create an empty BioSQL database."""
+    if DBDRIVER in ["sqlite3"] :
+        # the database is a file, start a new one
+        if os.path.exists(TESTDB) :
+            os.remove(TESTDB)
+        server = BioSeqDatabase.open_database(driver = DBDRIVER, db = TESTDB)
+        server.load_database_sql(SQL_FILE)
+        server.adaptor.conn.commit()
+        server.adaptor.conn.close()
+        return
+
     # first open a connection to create the database
     server = BioSeqDatabase.open_database(driver = DBDRIVER,
                                           user = DBUSER, passwd = DBPASSWD,
@@ -428,6 +442,323 @@ class InDepthLoadTest(unittest.TestCase):
         # mRNA, so really cDNA, so the strand should be 1 (not complemented)
         assert test_feature.strand == 1, test_feature.strand
 
+def record_summary(record):
+    """Tuple of the data of a SeqRecord, for comparing records."""
+    annotations = record.annotations.items()
+    annotations.sort()
+    for i, (key, value) in enumerate(annotations):
+        if key == "references":
+            value = [(r.authors, r.title, r.journal, r.medline_id,
+                      r.pubmed_id, str(r.location)) for r in value]
+            annotations[i] = (key, value)
+    features = []
+    for feature in record.features:
+        qualifiers = feature.qualifiers.items()
+        qualifiers.sort()
+        locations = [(str(f.location), f.strand) for f in feature.sub_features]
+        features.append((feature.type, str(feature.location), feature.strand,
+                         qualifiers, locations))
+    return (record.id, record.name, record.description, record.seq.tostring(),
+            repr(annotations), record.dbxrefs, features)
+
+class BulkLoadTest(unittest.TestCase):
+    """Load records with the bulk loader.
+    """
+    def setUp(self):
+        create_database()
+        self.server = BioSeqDatabase.open_database(driver = DBDRIVER,
+                                                   user = DBUSER,
+                                                   passwd = DBPASSWD,
+                                                   host = DBHOST, db = TESTDB)
+
+    def tearDown(self):
+        self.server.adaptor.conn.close()
+        del self.server
+
+    def load(self, db_name, **kwargs):
+        """Load the test GenBank files into a new (sub) database."""
+        db = self.server.new_database(db_name)
+        count = 0
+        for filename in ["cor6_6.gb", "NC_005816.gb", "protein_refseq2.gb"]:
+            handle = open(os.path.join(os.getcwd(), "GenBank", filename))
+            parser = GenBank.FeatureParser()
+            count += db.load(GenBank.Iterator(handle, parser), **kwargs)
+            handle.close()
+        self.server.adaptor.commit()
+        return count, db
+
+    def test_bulk_load(self):
+        """The bulk loader loads the same records as the standard loader.
+        """
+        count, db = self.load("standard")
+        bulk_count, bulk_db = self.load("bulk", bulk=True, commit_every=2)
+        assert count == bulk_count == 8, (count, bulk_count)
+        names = db.adaptor.list_bioentry_display_ids(db.dbid)
+        bulk_names = bulk_db.adaptor.list_bioentry_display_ids(bulk_db.dbid)
+        names.sort()
+        bulk_names.sort()
+        assert names == bulk_names, (names, bulk_names)
+        for name in names:
+            record = record_summary(db.lookup(name = name))
+            bulk_record = record_summary(bulk_db.lookup(name = name))
+            assert record == bulk_record, name
+
+    def test_pending_rows(self):
+        """Rows queued by the bulk loader are inserted before commits.
+        """
+        BulkDatabaseLoader = BioSeqDatabase.Loader.BulkDatabaseLoader
+        old = BulkDatabaseLoader.max_pending
+        BulkDatabaseLoader.max_pending = 7
+        try:
+            count, db = self.load("bulk", bulk=True)
+        finally:
+            BulkDatabaseLoader.max_pending = old
+        record = db.lookup(accession = "AJ237582")
+        assert len(record.features) == 7
+        assert record.features[0].qualifiers["db_xref"] == ["taxon:3704"]
+        assert len(record.seq) == 206, len(record.seq)
+
+class FeatureBatchTest(unittest.TestCase):
+    """Retrieve the features of several records together.
+    """
+    def setUp(self):
+        gb_handle = open(os.path.join(os.getcwd(), "GenBank", "cor6_6.gb"))
+        load_database(gb_handle)
+        gb_handle.close()
+        self.server = BioSeqDatabase.open_database(driver = DBDRIVER,
+                                                   user = DBUSER,
+                                                   passwd = DBPASSWD,
+                                                   host = DBHOST, db = TESTDB)
+        self.db = self.server["biosql-test"]
+        db = self.server.new_database("second")
+        handle = open(os.path.join(os.getcwd(), "GenBank", "NC_005816.gb"))
+        db.load(GenBank.Iterator(handle, GenBank.FeatureParser()))
+        handle.close()
+        self.server.adaptor.commit()
+
+    def tearDown(self):
+        self.server.adaptor.conn.close()
+        del self.server
+        del self.db
+
+    def records(self):
+        records = self.db.values()
+        records.extend(self.server["second"].values())
+        return records
+
+    def test_fetch_features(self):
+        """Features fetched in batches match those fetched one at a time.
+        """
+        records = self.records()
+        assert len(records) == 7, len(records)
+        features = [record_summary(record)[-1] for record in records]
+        for batch_size in [1, 4, 100]:
+            batched = self.records()
+            BioSeq.fetch_features(batched, batch_size)
+            assert [record_summary(r)[-1] for r in batched] == features
+        assert len(features[-1]) == 29, len(features[-1])
+
+    def test_query_count(self):
+        """A fixed number of queries is used for each batch of records.
+        """
+        adaptor = self.server.adaptor
+        records = self.records()
+        count = adaptor.query_count
+        BioSeq.fetch_features(records, 4)
+        assert adaptor.query_count - count == 10, adaptor.query_count - count
+        #The features are not fetched again
+        count = adaptor.query_count
+        for record in records:
+            record.features
+        BioSeq.fetch_features(records)
+        assert adaptor.query_count == count
+        #Nor when accessed one record at a time
+        record = self.db.lookup(accession = "X62281")
+        count = adaptor.query_count
+        assert len(record.features) == 15
+        assert adaptor.query_count - count == 5, adaptor.query_count - count
+
+class ExportTest(unittest.TestCase):
+    """Iterate over all the records of a database in chunks.
+    """
+    def setUp(self):
+        gb_handle = open(os.path.join(os.getcwd(), "GenBank", "cor6_6.gb"))
+        load_database(gb_handle)
+        gb_handle.close()
+        self.server = BioSeqDatabase.open_database(driver = DBDRIVER,
+                                                   user = DBUSER,
+                                                   passwd = DBPASSWD,
+                                                   host = DBHOST, db = TESTDB)
+        db = self.server.new_database("second")
+        handle = open(os.path.join(os.getcwd(), "GenBank", "NC_005816.gb"))
+        db.load(GenBank.Iterator(handle, GenBank.FeatureParser()))
+        handle.close()
+        self.server.adaptor.commit()
+        self.db = self.server["biosql-test"]
+
+    def tearDown(self):
+        self.server.adaptor.conn.close()
+        del self.server
+        del self.db
+
+    def test_itervalues(self):
+        """Records from itervalues match those from values.
+        """
+        expected = [record_summary(record) for record in self.db.values()]
+        assert len(expected) == 6, len(expected)
+        for chunk_size in [1, 4, 100]:
+            records = self.db.itervalues(chunk_size)
+            assert [record_summary(r) for r in records] == expected
+        self.assertRaises(ValueError, self.db.itervalues, 0)
+        records = list(self.server["second"].get_PrimarySeq_stream())
+        assert len(records) == 1
+        assert isinstance(records[0].seq, Seq)
+        assert not isinstance(records[0].seq, BioSeq.DBSeq)
+        assert records[0].seq.tostring() \
+               == self.server["second"].values()[0].seq.tostring()
+
+    def test_write(self):
+        """Write all the records with SeqIO.
+        """
+        from StringIO import StringIO
+        from Bio import SeqIO
+        expected = StringIO()
+        SeqIO.write(self.db.values(), expected, "genbank")
+        counts = []
+        for chunk_size in [4, 100]:
+            handle = StringIO()
+            count = self.server.adaptor.query_count
+            assert SeqIO.write(self.db.itervalues(chunk_size), handle,
+                               "genbank") == 6
+            assert handle.getvalue() == expected.getvalue()
+            counts.append(self.server.adaptor.query_count - count)
+        #Each chunk takes eleven queries (and the taxa are looked up once)
+        assert counts[0] - counts[1] == 11, counts
+
+class PoolTest(unittest.TestCase):
+    """Use a database from several threads with a PooledDBServer.
+    """
+    def setUp(self):
+        gb_handle = open(os.path.join(os.getcwd(), "GenBank", "cor6_6.gb"))
+        load_database(gb_handle)
+        gb_handle.close()
+        server = BioSeqDatabase.open_database(driver = DBDRIVER,
+                                              user = DBUSER, passwd = DBPASSWD,
+                                              host = DBHOST, db = TESTDB)
+        db = server["biosql-test"]
+        self.expected = {}
+        for accession in ["X55053", "X62281", "M81224", "AJ237582", "L31939",
+                          "AF297471"]:
+            self.expected[accession] = \
+                record_summary(db.lookup(accession = accession))
+        server.adaptor.conn.close()
+        self.server = Pool.open_pooled_database(driver = DBDRIVER,
+                                                user = DBUSER,
+                                                passwd = DBPASSWD,
+                                                host = DBHOST, db = TESTDB,
+                                                max_connections = 2,
+                                                cache_size = 4)
+
+    def tearDown(self):
+        self.server.close()
+        del self.server
+
+    def test_lru_cache(self):
+        """The least recently used item is dropped from a full cache.
+        """
+        cache = Pool.LRUCache(3)
+        for key in "abc":
+            cache[key] = key.upper()
+        assert cache["a"] == "A"
+        cache["d"] = "D"
+        assert "b" not in cache and len(cache) == 3
+        cache["c"] = "C2"
+        cache["e"] = "E"
+        assert "a" not in cache and "c" in cache and "d" in cache
+        assert cache.get("b") is None
+        self.assertRaises(KeyError, cache.__getitem__, "a")
+        cache.clear()
+        assert len(cache) == 0
+        self.assertRaises(ValueError, Pool.LRUCache, 0)
+
+    def test_cache(self):
+        """Records looked up by accession or version are cached.
+        """
+        db = self.server["biosql-test"]
+        record = db.lookup(accession = "X62281")
+        assert record_summary(record) == self.expected["X62281"]
+        count = db.adaptor.query_count
+        assert db.get_Seq_by_acc("X62281") is record
+        assert db.adaptor.query_count == count
+        assert db.get_Seq_by_ver("X62281.1").id == "X62281.1"
+        for accession in ["X55053", "M81224", "AJ237582", "L31939"]:
+            db.lookup(accession = accession)
+        #The record of X62281 has now been dropped from the cache
+        assert db.lookup(accession = "X62281") is not record
+        assert self.server.cache.hits == 1, self.server.cache.hits
+        assert self.server._taxa
+        self.server.clear_cache()
+        assert len(self.server.cache) == 0
+        assert not self.server._taxa
+        #Other lookups are not cached
+        assert db.lookup(name = "ATKIN2") is not db.lookup(name = "ATKIN2")
+
+    def test_threads(self):
+        """Threads share a bounded pool of connections.
+        """
+        import threading
+        accessions = self.expected.keys()
+        accessions.sort()
+        results = []
+        errors = []
+        def work(i):
+            try:
+                try:
+                    db = self.server["biosql-test"]
+                    for j in range(10):
+                        accession = accessions[(i + j) % len(accessions)]
+                        record = db.lookup(accession = accession)
+                        results.append((accession, record_summary(record)))
+                finally:
+                    self.server.release()
+            except Exception, e:
+                errors.append(e)
+        threads = [threading.Thread(target = work, args = (i,))
+                   for i in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert not errors, errors
+        assert len(results) == 60
+        for accession, summary in results:
+            assert summary == self.expected[accession], accession
+        assert self.server.pool.connections_made <= 2
+        assert len(self.server.pool._idle) \
+               == self.server.pool.connections_made
+
+    def test_health_check(self):
+        """Broken connections are replaced, and waiting can time out.
+        """
+        pool = self.server.pool
+        adaptor = self.server.adaptor
+        self.server.release()
+        assert self.server.adaptor is adaptor
+        self.server.release()
+        #Break the idle connection, which is checked when reused
+        adaptor.conn.close()
+        pool.max_idle = -1
+        db = self.server["biosql-test"]
+        assert self.server.adaptor is not adaptor
+        assert pool.connections_made == 2
+        assert record_summary(db.lookup(accession = "L31939")) \
+               == self.expected["L31939"]
+        other = pool.get()
+        pool.timeout = 0.01
+        self.assertRaises(RuntimeError, pool.get)
+        pool.put(other)
+        assert pool.get() is other
+
 if __name__ == "__main__":
     runner = unittest.TextTestRunner(verbosity = 2)
     unittest.main(testRunner=runner)
@@ -406,6 +406,13 @@ def compare_records(old, new) :
 #from setup_BioSQL import create_database
 #create_database()
 
+if DBDRIVER in ["sqlite3"] and not os.path.isfile(TESTDB) :
+    #SQLite would make an empty database file, so add the tables
+    server = BioSeqDatabase.open_database(driver = DBDRIVER, db = TESTDB)
+    server.load_database_sql(SQL_FILE)
+    server.adaptor.conn.commit()
+    server.adaptor.conn.close()
+
 print "Connecting to database"
 try :
     server = BioSeqDatabase.open_database(driver = DBDRIVER,
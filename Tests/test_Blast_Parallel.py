@@ -0,0 +1,243 @@
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+
+"""Tests for Bio.Blast.Parallel using a stub BLAST executable."""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+if sys.platform == "win32" :
+    from Bio import MissingExternalDependencyError
+    raise MissingExternalDependencyError(\
+        "The stub BLAST executable used in this test needs a Unix shell.")
+
+from Bio.Blast import NCBIStandalone, Parallel
+
+#A fake blastall, which gives an XML record with no hits for each query.
+#If the file FAIL exists in its directory, queries called FAIL cause an
+#error, queries called CRASH give truncated XML and a non-zero exit status,
+#and queries called TRUNCATE give truncated XML.  Queries called NOISY
+#write a lot of warnings to stderr.  Each call is logged to the file
+#calls.log in its directory.
+stub_code = '''#!%s
+import os, sys
+here = os.path.dirname(os.path.abspath(sys.argv[0]))
+infile = sys.argv[sys.argv.index("-i") + 1].strip('"')
+log = open(os.path.join(here, "calls.log"), "a")
+log.write(os.path.basename(infile) + "\\n")
+log.close()
+ids = [line[1:].split()[0] for line in open(infile) if line[0] == ">"]
+if "FAIL" in ids and os.path.isfile(os.path.join(here, "FAIL")) :
+    sys.stderr.write("Simulated failure\\n")
+    sys.exit(1)
+broken = [id for id in ["CRASH", "TRUNCATE"] if id in ids]
+if broken and os.path.isfile(os.path.join(here, "FAIL")) :
+    print '<?xml version="1.0"?>\\n<BlastOutput>'
+    sys.stdout.flush()
+    if broken[0] == "CRASH" :
+        os._exit(1)
+    sys.exit(0)
+if "NOISY" in ids :
+    sys.stderr.write("Warning: simulated\\n" * 20000)
+print """<?xml version="1.0"?>
+<BlastOutput>
+  <BlastOutput_program>blastp</BlastOutput_program>
+  <BlastOutput_version>BLASTP 2.2.18+</BlastOutput_version>
+  <BlastOutput_db>stub</BlastOutput_db>
+  <BlastOutput_param>
+    <Parameters>
+      <Parameters_matrix>BLOSUM62</Parameters_matrix>
+      <Parameters_expect>10</Parameters_expect>
+      <Parameters_gap-open>11</Parameters_gap-open>
+      <Parameters_gap-extend>1</Parameters_gap-extend>
+      <Parameters_filter>F</Parameters_filter>
+    </Parameters>
+  </BlastOutput_param>
+  <BlastOutput_iterations>"""
+for i, id in enumerate(ids) :
+    print """    <Iteration>
+      <Iteration_iter-num>%%i</Iteration_iter-num>
+      <Iteration_query-ID>%%s</Iteration_query-ID>
+      <Iteration_query-def>%%s</Iteration_query-def>
+      <Iteration_query-len>10</Iteration_query-len>
+      <Iteration_hits/>
+    </Iteration>""" %% (i+1, id, id)
+print """  </BlastOutput_iterations>
+</BlastOutput>"""
+''' % sys.executable
+
+class ShardedBlastTest(unittest.TestCase) :
+
+    def setUp(self) :
+        self.temp_dir = tempfile.mkdtemp()
+        self.stub = os.path.join(self.temp_dir, "blastall")
+        handle = open(self.stub, "w")
+        handle.write(stub_code)
+        handle.close()
+        os.chmod(self.stub, 0755)
+        self.log = os.path.join(self.temp_dir, "calls.log")
+        self.workdir = os.path.join(self.temp_dir, "work")
+
+    def tearDown(self) :
+        shutil.rmtree(self.temp_dir)
+
+    def write_queries(self, ids) :
+        filename = os.path.join(self.temp_dir, "queries.fasta")
+        handle = open(filename, "w")
+        for id in ids :
+            handle.write(">%s description\nACGTACGTAC\n" % id)
+        handle.close()
+        return filename
+
+    def calls(self) :
+        if not os.path.isfile(self.log) :
+            return []
+        answer = [line.strip() for line in open(self.log)]
+        os.remove(self.log)
+        return answer
+
+    def run_blast(self, infile, shards, workers) :
+        return Parallel.run_sharded(NCBIStandalone.blastall, infile,
+                                    self.workdir, shards, workers,
+                                    blastcmd=self.stub, program="blastp",
+                                    database="stub")
+
+    def test_split_fasta(self) :
+        """Split a FASTA file into consecutive shards."""
+        ids = ["q%i" % i for i in range(10)]
+        infile = self.write_queries(ids)
+        names = [os.path.join(self.temp_dir, "s%i" % i) for i in range(4)]
+        self.assertEqual(Parallel.split_fasta(infile, names), [3, 3, 2, 2])
+        text = "".join([open(name).read() for name in names])
+        self.assertEqual(text, open(infile).read())
+        self.assertEqual(Parallel.split_fasta(infile, names[:1]), [10])
+        names = [os.path.join(self.temp_dir, "s%i" % i) for i in range(12)]
+        self.assertEqual(Parallel.split_fasta(infile, names),
+                         [1] * 10 + [0, 0])
+        self.assertEqual(open(names[-1]).read(), "")
+
+    def test_order_and_resume(self) :
+        """Records come back in query order, and finished runs are reused."""
+        ids = ["q%i" % i for i in range(10)]
+        infile = self.write_queries(ids)
+        records = list(self.run_blast(infile, 4, 2))
+        self.assertEqual([r.query_id for r in records], ids)
+        calls = self.calls()
+        calls.sort()
+        self.assertEqual(calls, ["shard%04i.fasta" % i for i in range(4)])
+        #Running again should just parse the existing output
+        records = list(self.run_blast(infile, 4, 2))
+        self.assertEqual([r.query_id for r in records], ids)
+        self.assertEqual(self.calls(), [])
+
+    def test_more_shards_than_queries(self) :
+        """Empty shards are skipped."""
+        ids = ["q%i" % i for i in range(3)]
+        infile = self.write_queries(ids)
+        records = list(self.run_blast(infile, 5, 3))
+        self.assertEqual([r.query_id for r in records], ids)
+        self.assertEqual(len(self.calls()), 3)
+
+    def test_failure_and_resume(self) :
+        """A failed shard stops the run, which can then be resumed."""
+        ids = ["q0", "q1", "q2", "q3", "FAIL", "q5", "q6", "q7"]
+        infile = self.write_queries(ids)
+        open(os.path.join(self.temp_dir, "FAIL"), "w").close()
+        found = []
+        try :
+            for record in self.run_blast(infile, 4, 1) :
+                found.append(record.query_id)
+            self.fail("Expected the third shard to fail")
+        except ValueError :
+            pass
+        self.assertEqual(found, ids[:4])
+        self.assertEqual(self.calls(), ["shard0000.fasta", "shard0001.fasta",
+                                        "shard0002.fasta"])
+        os.remove(os.path.join(self.temp_dir, "FAIL"))
+        records = list(self.run_blast(infile, 4, 1))
+        self.assertEqual([r.query_id for r in records], ids)
+        self.assertEqual(self.calls(), ["shard0002.fasta", "shard0003.fasta"])
+
+    def check_broken_shard(self, id) :
+        """A shard with broken XML output fails, and is run again."""
+        ids = ["q0", "q1", id, "q3"]
+        infile = self.write_queries(ids)
+        open(os.path.join(self.temp_dir, "FAIL"), "w").close()
+        found = []
+        try :
+            for record in self.run_blast(infile, 4, 1) :
+                found.append(record.query_id)
+            self.fail("Expected the third shard to fail")
+        except ValueError :
+            pass
+        self.assertEqual(found, ids[:2])
+        self.assert_(not os.path.exists(os.path.join(self.workdir,
+                                                     "shard0002.xml")))
+        self.calls()
+        os.remove(os.path.join(self.temp_dir, "FAIL"))
+        records = list(self.run_blast(infile, 4, 1))
+        self.assertEqual([r.query_id for r in records], ids)
+        self.assertEqual(self.calls(), ["shard0002.fasta", "shard0003.fasta"])
+
+    def test_exit_status(self) :
+        """A shard where BLAST exits with an error is not kept."""
+        self.check_broken_shard("CRASH")
+
+    def test_truncated_output(self) :
+        """A shard with XML output missing its end is not kept."""
+        self.check_broken_shard("TRUNCATE")
+
+    def test_noisy_stderr(self) :
+        """Lots of warnings from BLAST don't block the run."""
+        ids = ["q0", "NOISY", "q2"]
+        infile = self.write_queries(ids)
+        records = list(self.run_blast(infile, 2, 1))
+        self.assertEqual([r.query_id for r in records], ids)
+
+    def test_other_blast_function(self) :
+        """Any function returning handles can be used to run BLAST."""
+        def blastall(**keywds) :
+            return NCBIStandalone.blastall(**keywds)
+        ids = ["q0", "NOISY", "TRUNCATE", "q3"]
+        infile = self.write_queries(ids)
+        open(os.path.join(self.temp_dir, "FAIL"), "w").close()
+        records = Parallel.run_sharded(blastall, infile, self.workdir, 4, 1,
+                                       blastcmd=self.stub, program="blastp",
+                                       database="stub")
+        found = []
+        try :
+            for record in records :
+                found.append(record.query_id)
+            self.fail("Expected the third shard to fail")
+        except ValueError :
+            pass
+        self.assertEqual(found, ids[:2])
+        self.calls()
+        os.remove(os.path.join(self.temp_dir, "FAIL"))
+        records = Parallel.run_sharded(blastall, infile, self.workdir, 4, 1,
+                                       blastcmd=self.stub, program="blastp",
+                                       database="stub")
+        self.assertEqual([r.query_id for r in records], ids)
+        self.assertEqual(self.calls(), ["shard0002.fasta", "shard0003.fasta"])
+
+    def test_resume_without_shards(self) :
+        """Missing shard files are made again when resuming."""
+        ids = ["q0", "q1", "FAIL", "q3"]
+        infile = self.write_queries(ids)
+        open(os.path.join(self.temp_dir, "FAIL"), "w").close()
+        self.assertRaises(ValueError, list, self.run_blast(infile, 4, 1))
+        self.calls()
+        os.remove(os.path.join(self.temp_dir, "FAIL"))
+        for i in range(4) :
+            os.remove(os.path.join(self.workdir, "shard%04i.fasta" % i))
+        records = list(self.run_blast(infile, 4, 1))
+        self.assertEqual([r.query_id for r in records], ids)
+        self.assertEqual(self.calls(), ["shard0002.fasta", "shard0003.fasta"])
+
+if __name__ == "__main__" :
+    runner = unittest.TextTestRunner(verbosity = 2)
+    unittest.main(testRunner=runner)
@@ -7,6 +7,7 @@ except ImportError :
     raise MissingExternalDependencyError(\
         "Install NumPy if you want to use Bio.Cluster.")
 
+import os
 import unittest
 
 
@@ -634,6 +635,189 @@ class TestCluster(unittest.TestCase):
         self.assertEqual(clusterid[8], 2)
         self.assertAlmostEqual(error, 7.680, 3)
 
+
+class TestDistanceFile(unittest.TestCase):
+    """Distance matrices in a file, compared to those in memory."""
+
+    def setUp(self):
+        import tempfile
+        numpy.random.seed(1)
+        self.data = numpy.random.rand(40, 5)
+        self.mask = numpy.ones((40, 5), int)
+        self.mask[3, 2] = 0
+        self.mask[17, 0] = 0
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "genes.dist")
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.directory)
+
+    def compare(self, distances, matrix):
+        from Bio.Cluster.DistanceFile import _offsets
+        offsets = _offsets(len(matrix))
+        for i in range(1, len(matrix)):
+            row = distances[offsets[i]:offsets[i+1]]
+            self.assert_(numpy.allclose(row, matrix[i], 1e-5, 1e-6))
+
+    def test_distancematrix(self):
+        from Bio.Cluster import distancematrix
+        from Bio.Cluster import DistanceFile
+        matrix = distancematrix(self.data, self.mask)
+        distances = DistanceFile.distancematrix(self.filename, self.data,
+                                                self.mask, block_size=7)
+        self.assertEqual(len(distances), 40*39/2)
+        self.compare(distances, matrix)
+        self.compare(DistanceFile.open_distancematrix(self.filename), matrix)
+        matrix = distancematrix(self.data, self.mask, transpose=1, dist='c')
+        distances = DistanceFile.distancematrix(self.filename, self.data,
+                                                self.mask, transpose=1,
+                                                dist='c', block_size=2)
+        self.compare(distances, matrix)
+        try:
+            import multiprocessing
+        except ImportError:
+            return
+        matrix = distancematrix(self.data, dist='b')
+        distances = DistanceFile.distancematrix(self.filename, self.data,
+                                                dist='b', block_size=6,
+                                                processes=2)
+        self.compare(distances, matrix)
+
+    def test_treecluster(self):
+        from Bio.Cluster import distancematrix, treecluster
+        from Bio.Cluster import DistanceFile
+        DistanceFile.distancematrix(self.filename, self.data, self.mask)
+        for method in "sma":
+            matrix = distancematrix(self.data, self.mask)
+            expected = treecluster(distancematrix=matrix, method=method)
+            tree = DistanceFile.treecluster(self.filename, method)
+            self.assertEqual(len(tree), 39)
+            for node, other in zip(tree, expected):
+                self.assertAlmostEqual(node.distance, other.distance, 5)
+            for nclusters in range(1, 41):
+                # The same clusters, possibly numbered differently
+                pairs = zip(tree.cut(nclusters), expected.cut(nclusters))
+                self.assertEqual(len(dict.fromkeys(pairs)), nclusters)
+        self.assertEqual(os.listdir(self.directory), ["genes.dist"])
+        self.assertRaises(ValueError, DistanceFile.treecluster,
+                          self.filename, 'c')
+
+    def test_kmedoids(self):
+        from Bio.Cluster import distancematrix, kmedoids
+        from Bio.Cluster import DistanceFile
+        distances = DistanceFile.distancematrix(self.filename, self.data)
+        matrix = distancematrix(self.data)
+        initialid = numpy.arange(40) % 4
+        clusterid, error, nfound = DistanceFile.kmedoids(distances,
+                                                         initialid=initialid)
+        expected, expected_error, nfound = kmedoids(matrix,
+                                                    initialid=initialid)
+        self.assertEqual(list(clusterid), list(expected))
+        self.assertAlmostEqual(error, expected_error, 5)
+        clusterid, error, nfound = DistanceFile.kmedoids(self.filename,
+                                                         nclusters=3,
+                                                         npass=10)
+        self.assertEqual(len(numpy.unique(clusterid)), 3)
+        for medoid in numpy.unique(clusterid):
+            self.assertEqual(clusterid[medoid], medoid)
+        self.assert_(1 <= nfound <= 10)
+        self.assertRaises(ValueError, DistanceFile.kmedoids, distances,
+                          nclusters=41)
+
+
+class TestPasses(unittest.TestCase):
+    """Clustering passes in several processes, and mini-batch k-means."""
+
+    def setUp(self):
+        numpy.random.seed(3)
+        centers = numpy.random.rand(4, 6) * 20
+        self.data = numpy.concatenate([center + numpy.random.randn(50, 6)
+                                       for center in centers])
+        self.blobs = numpy.repeat(numpy.arange(4), 50)
+        try:
+            import multiprocessing
+            self.processes = 2
+        except ImportError:
+            self.processes = 1
+
+    def same_clusters(self, clusterid1, clusterid2):
+        pairs = zip(clusterid1, clusterid2)
+        return len(dict.fromkeys(pairs)) == len(dict.fromkeys(clusterid1)) \
+               == len(dict.fromkeys(clusterid2))
+
+    def test_parallel_kcluster(self):
+        from Bio.Cluster import kcluster, parallel_kcluster
+        clusterid, error, nfound, passes = parallel_kcluster(self.data, 4,
+                                                             npass=6,
+                                                             processes=1,
+                                                             seed=5)
+        self.assertEqual(len(passes), 6)
+        self.assertEqual(error, min([e for seed, e, seconds in passes]))
+        self.assert_(1 <= nfound <= 6)
+        self.assertEqual(clusterid[0], 0)
+        expected, expected_error, found = kcluster(self.data, 4, npass=10)
+        self.assertAlmostEqual(error, expected_error, 5)
+        self.assert_(self.same_clusters(clusterid, expected))
+        # The result only depends on the seed
+        other = parallel_kcluster(self.data, 4, npass=6,
+                                  processes=self.processes, seed=5)
+        self.assertEqual(list(other[0]), list(clusterid))
+        self.assertEqual(other[1:3], (error, nfound))
+        self.assertEqual([p[:2] for p in other[3]],
+                         [p[:2] for p in passes])
+        self.assertRaises(ValueError, parallel_kcluster, self.data, 4,
+                          npass=0)
+
+    def test_parallel_kmedoids(self):
+        import shutil, tempfile
+        from Bio.Cluster import distancematrix, parallel_kmedoids
+        from Bio.Cluster import DistanceFile
+        matrix = distancematrix(self.data)
+        clusterid, error, nfound, passes = \
+                   parallel_kmedoids(matrix, 4, npass=4,
+                                     processes=self.processes, seed=2)
+        self.assertEqual(len(passes), 4)
+        self.assert_(self.same_clusters(clusterid, self.blobs))
+        # Each item is labelled with the medoid of its cluster
+        for i in range(len(clusterid)):
+            self.assertEqual(clusterid[clusterid[i]], clusterid[i])
+        self.assertEqual(len(dict.fromkeys(clusterid)), 4)
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, "data.dist")
+            DistanceFile.distancematrix(filename, self.data)
+            other = parallel_kmedoids(filename, 4, npass=4, processes=1,
+                                      seed=2)
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(list(other[0]), list(clusterid))
+        self.assertAlmostEqual(other[1], error, 4)
+
+    def test_minibatch_kcluster(self):
+        from Bio.Cluster import kcluster, minibatch_kcluster, Record
+        clusterid, error = minibatch_kcluster(self.data, 4, npass=3,
+                                              batch_size=30, niter=50,
+                                              seed=1)
+        self.assert_(self.same_clusters(clusterid, self.blobs))
+        expected, expected_error, nfound = kcluster(self.data, 4,
+                                                    initialid=self.blobs)
+        self.assert_(abs(error - expected_error) < 0.01 * expected_error)
+        # The same with missing values and the data transposed
+        mask = numpy.ones(self.data.shape, int)
+        mask[::7, 2] = 0
+        record = Record()
+        record.data = self.data.T
+        record.mask = mask.T
+        clusterid, error = record.minibatch_kcluster(4, transpose=1, npass=3,
+                                                     batch_size=30, niter=20,
+                                                     seed=1)
+        self.assert_(self.same_clusters(clusterid, self.blobs))
+        clusterid, error, nfound, passes = \
+                   record.parallel_kcluster(4, transpose=1, npass=3,
+                                            processes=1)
+        self.assertEqual(len(clusterid), 200)
+
 if __name__ == "__main__" :
     TestCluster.module = 'Bio.Cluster'
     runner = unittest.TextTestRunner(verbosity = 2)
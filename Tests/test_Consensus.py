@@ -0,0 +1,147 @@
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+
+import unittest
+import random
+from StringIO import StringIO
+
+from Bio.Nexus.Trees import Tree, TreeError
+from Bio.Nexus.Consensus import CladeCounter, parse_newick, consensus
+
+TAXA = ["t%i" % i for i in range(10)]
+
+def random_newick(taxa):
+    """Random tree with some polytomies, as a newick string."""
+    nodes = list(taxa)
+    while len(nodes) > 3:
+        k = min(random.choice([2, 2, 2, 3]), len(nodes))
+        random.shuffle(nodes)
+        nodes = ["(%s):0.5" % ",".join(nodes[:k])] + nodes[k:]
+    return "(%s);" % ",".join(nodes)
+
+def clade_support(tree):
+    """Dictionary of the support of each clade of a tree, by sorted taxa."""
+    answer = {}
+    for node_id in tree.all_ids():
+        if node_id == tree.root:
+            continue
+        taxa = tree.get_taxa(node_id)
+        taxa.sort()
+        support = tree.node(node_id).data.support
+        if support is not None:
+            support = round(support, 6)
+        answer[tuple(taxa)] = support
+    return answer
+
+def sorted_frequencies(counter):
+    """Dictionary of the frequency of each clade, by sorted taxa."""
+    answer = {}
+    for bits, frequency in counter.frequencies().items():
+        taxa = counter.clade_taxa(bits)
+        taxa.sort()
+        answer[tuple(taxa)] = frequency
+    return answer
+
+def rooted_clades(newick, outgroup):
+    """Clades of a tree rooted with Tree.root_with_outgroup, as sorted taxa."""
+    tree = Tree(newick)
+    tree.root_with_outgroup(outgroup)
+    answer = {}
+    for node_id in tree.all_ids():
+        taxa = tree.get_taxa(node_id)
+        if node_id != tree.root and len(taxa) < len(TAXA):
+            taxa.sort()
+            answer[tuple(taxa)] = True
+    return answer
+
+
+class CladeCounterTest(unittest.TestCase):
+    def setUp(self):
+        random.seed(11)
+        self.base = random_newick(TAXA)
+        self.newicks = [random_newick(TAXA) for i in range(10)] \
+                       + [self.base] * 10
+
+    def test_rooting(self):
+        """Clades rooted with an outgroup, compared to root_with_outgroup."""
+        for i in range(300):
+            newick = random_newick(TAXA)
+            outgroup = random.sample(TAXA, random.choice([1, 2, 3]))
+            counter = CladeCounter(TAXA, outgroup)
+            counter.add_tree(newick)
+            found = sorted_frequencies(counter)
+            self.assertEqual(sorted(found), sorted(rooted_clades(newick, outgroup)))
+
+    def test_newick_and_tree(self):
+        """Counting newick strings or Tree objects gives the same clades."""
+        for outgroup in [None, ["t0"], ["t1", "t2"]]:
+            from_strings = CladeCounter(TAXA, outgroup)
+            from_strings.add_trees(self.newicks)
+            from_trees = CladeCounter(outgroup=outgroup)
+            from_trees.add_trees([Tree(newick) for newick in self.newicks])
+            self.assertEqual(sorted_frequencies(from_strings),
+                             sorted_frequencies(from_trees))
+
+    def test_consensus(self):
+        """Consensus tree and its clade support."""
+        constree = consensus([Tree(newick) for newick in self.newicks])
+        self.assertEqual(constree.node(constree.root).data.support, None)
+        support = clade_support(constree)
+        base = clade_support(Tree(self.base))
+        for taxa in base:
+            #The base tree is half the trees, so all its clades are found
+            self.assert_(support[taxa] >= 0.5)
+        for taxa, value in support.items():
+            self.assert_(value > 0.5 or taxa in base)
+            if len(taxa) == 1:
+                self.assertEqual(value, 1.0)
+                self.assertEqual(constree.node(constree.search_taxon(taxa[0])).data.taxon, taxa[0])
+        self.assertEqual(len(constree.get_terminals()), len(TAXA))
+        #All clades are in every tree with threshold 1.0
+        constree = consensus([Tree(newick) for newick in [self.base] * 7], 1.0)
+        self.assertEqual(sorted(clade_support(constree)), sorted(base))
+
+    def test_merge_with_support(self):
+        """Tree.merge_with_support with bootstrap trees."""
+        phylogeny = Tree(self.base)
+        phylogeny.merge_with_support(bstrees=[Tree(n) for n in self.newicks])
+        for taxa, value in clade_support(phylogeny).items():
+            self.assert_(value >= 0.5)
+
+    def test_parse_newick(self):
+        """Reading newick strings from a file."""
+        handle = StringIO("%s\n%s %s\n(t0,\nt1,t2);" \
+                          % (self.newicks[0], self.newicks[1], self.newicks[2]))
+        trees = list(parse_newick(handle))
+        self.assertEqual(trees[:3], [newick.rstrip(";") for newick in self.newicks[:3]])
+        self.assertEqual(trees[3], "(t0,\nt1,t2)")
+
+    def test_taxa(self):
+        """Trees with different taxa."""
+        counter = CladeCounter(TAXA)
+        self.assertRaises(TreeError, counter.add_tree, "((t0,t1),t2);")
+        self.assertRaises(TreeError, counter.add_tree,
+                          random_newick(TAXA[:-1] + ["x"]))
+        self.assertRaises(TreeError, counter.add_tree,
+                          random_newick(TAXA + ["t0"]))
+
+    def test_processes(self):
+        """Counting in several processes gives the same clades."""
+        try:
+            import multiprocessing
+        except ImportError:
+            return
+        serial = CladeCounter(TAXA, ["t0"])
+        serial.add_trees(self.newicks * 5)
+        parallel = CladeCounter(TAXA, ["t0"])
+        parallel.add_trees(iter(self.newicks * 5), processes=2, chunk_size=7)
+        self.assertEqual(parallel.trees, serial.trees)
+        self.assertEqual(parallel.counts, serial.counts)
+        self.assertEqual(clade_support(parallel.consensus()),
+                         clade_support(serial.consensus()))
+
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner(verbosity = 2)
+    unittest.main(testRunner=runner)
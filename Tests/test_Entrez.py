@@ -1,12 +1,26 @@
 '''Testing code for Bio.Entrez parsers.
 '''
 
+import os
 import unittest
 
 from Bio import Entrez
+from Bio.Entrez import Parser
 
 
-class EInfoTest(unittest.TestCase):
+class EntrezTestCase(unittest.TestCase):
+    '''Base class of the tests below, which stops the parser saving the
+    DTD classifications in the user's home directory.
+    '''
+    def setUp(self):
+        self.compiled_dir = Parser.compiled_dir
+        Parser.compiled_dir = None
+
+    def tearDown(self):
+        Parser.compiled_dir = self.compiled_dir
+
+
+class EInfoTest(EntrezTestCase):
     '''Tests for parsing XML output returned by EInfo
     '''
     def test_list(self):
@@ -86,7 +100,7 @@ class EInfoTest(unittest.TestCase):
         assert record["DbInfo"]['LinkList'][0]['Description']=='PubMed links associated with Books'
         assert record["DbInfo"]['LinkList'][0]['DbTo']=='books'
 
-class ESearchTest(unittest.TestCase):
+class ESearchTest(EntrezTestCase):
     '''Tests for parsing XML output returned by ESearch
     '''
     def test_pubmed1(self):
@@ -512,7 +526,7 @@ class ESearchTest(unittest.TestCase):
         assert len(record['WarningList']["OutputMessage"])==1
         assert record['WarningList']["OutputMessage"][0]=="No items found."
 
-class EPostTest(unittest.TestCase):
+class EPostTest(EntrezTestCase):
     '''Tests for parsing XML output returned by EPost
     '''
     # Don't know how to get an InvalidIdList in the XML returned by EPost;
@@ -555,7 +569,7 @@ class EPostTest(unittest.TestCase):
         assert record["WebEnv"]=="08AIUeBsfIk6BfdzKnd3GM2RtCudczC9jm5aeb4US0o7azCTQCeCsr-xg0@1EDE54E680D03C40_0011SID"
 
 
-class ESummaryTest(unittest.TestCase):
+class ESummaryTest(EntrezTestCase):
     '''Tests for parsing XML output returned by ESummary
     '''
     # Items have a type, which can be
@@ -925,7 +939,7 @@ class ESummaryTest(unittest.TestCase):
         assert exception_triggered
 
 
-class ELinkTest(unittest.TestCase):
+class ELinkTest(EntrezTestCase):
     '''Tests for parsing XML output returned by ELink
     '''
     def test_pubmed1(self):
@@ -2697,7 +2711,7 @@ class ELinkTest(unittest.TestCase):
 	assert record[0]["IdList"]==["2662"]
 
 
-class EGQueryTest(unittest.TestCase):
+class EGQueryTest(EntrezTestCase):
     '''Tests for parsing XML output returned by EGQuery
     '''
     def test_egquery1(self):
@@ -3004,7 +3018,7 @@ class EGQueryTest(unittest.TestCase):
         assert record["eGQueryResult"][34]["Count"]=="0"
         assert record["eGQueryResult"][34]["Status"]=="Term or Database is not found"
 
-class ESpellTest(unittest.TestCase):
+class ESpellTest(EntrezTestCase):
     '''Tests for parsing XML output returned by ESpell
     '''
     def test_espell(self):
@@ -3023,7 +3037,7 @@ class ESpellTest(unittest.TestCase):
         assert record["SpelledQuery"][0].tag=="Replaced"
 
 
-class EFetchTest(unittest.TestCase):
+class EFetchTest(EntrezTestCase):
     '''Tests for parsing XML output returned by EFetch
     '''
     def test_pubmed1(self):
@@ -4123,6 +4137,107 @@ class EFetchTest(unittest.TestCase):
 
 
 
+class EntrezParseTest(EntrezTestCase):
+    '''Tests for parsing XML one record at a time with Entrez.parse
+    '''
+    def test_records(self):
+        '''Test parse gives the same records as read
+        '''
+        for filename in ['Entrez/pubmed2.xml', 'Entrez/nucleotide2.xml',
+                         'Entrez/esummary2.xml', 'Entrez/serialset.xml']:
+            records = Entrez.read(open(filename))
+            assert list(Entrez.parse(open(filename))) == records, filename
+
+    def test_incremental(self):
+        '''Test records are returned (and forgotten) as they are read
+        '''
+        from Bio.Entrez.Parser import DataHandler
+        DTDs = os.path.join(os.path.dirname(Entrez.__file__), "DTDs")
+        handler = DataHandler(DTDs)
+        handle = open('Entrez/pubmed2.xml')
+        records = handler.parse(handle, block_size=500)
+        record = records.next()
+        assert record["MedlineCitation"]["PMID"]=="11748933"
+        # The second record has not been read yet
+        assert handle.tell() < os.path.getsize('Entrez/pubmed2.xml')
+        assert handler.stack[0] == []
+        record = records.next()
+        assert record["MedlineCitation"]["PMID"]=="11700088"
+        self.assertRaises(StopIteration, records.next)
+
+    def test_not_list(self):
+        '''Test parse raises ValueError for XML which is not a list
+        '''
+        records = Entrez.parse(open('Entrez/einfo1.xml'))
+        self.assertRaises(ValueError, list, records)
+
+    def test_dtd_cache(self):
+        '''Test the DTDs are only parsed once
+        '''
+        from Bio.Entrez import Parser
+        Entrez.read(open('Entrez/esearch1.xml'))
+        assert [path for path in Parser._dtd_cache
+                if path.endswith("eSearch_020511.dtd")]
+        parse_dtd = Parser.DataHandler.parse_dtd
+        def fail(self, context, systemId, path):
+            raise AssertionError("%s not cached" % systemId)
+        Parser.DataHandler.parse_dtd = fail
+        try:
+            record = Entrez.read(open('Entrez/esearch1.xml'))
+        finally:
+            Parser.DataHandler.parse_dtd = parse_dtd
+        assert record["Count"]=='5'
+
+    def test_compiled_dtd(self):
+        '''Test the DTDs are saved for other processes, and loaded from there
+        '''
+        import shutil, tempfile
+        dtd_cache = Parser._dtd_cache
+        parse_dtd = Parser.DataHandler.parse_dtd
+        parsed = []
+        def count(self, context, systemId, path):
+            parsed.append(systemId)
+            parse_dtd(self, context, systemId, path)
+        # A copy of the DTDs, as one of them is changed
+        temp_dir = tempfile.mkdtemp()
+        dtd_dir = os.path.join(temp_dir, "DTDs")
+        shutil.copytree(os.path.join(os.path.dirname(Entrez.__file__),
+                                     "DTDs"), dtd_dir)
+        Parser.compiled_dir = os.path.join(temp_dir, "compiled")
+        Parser.DataHandler.parse_dtd = count
+        def read():
+            handler = Parser.DataHandler(dtd_dir)
+            return handler.run(open('Entrez/pubmed2.xml'))
+        try:
+            Parser._dtd_cache = {}
+            record = read()
+            assert record == Entrez.read(open('Entrez/pubmed2.xml'))
+            assert len(parsed) > 1
+            # A new process loads the saved classification
+            Parser._dtd_cache = {}
+            del parsed[:]
+            assert read() == record
+            assert parsed == []
+            # The DTD is parsed again if any of the DTDs it includes change
+            Parser._dtd_cache = {}
+            dtd = os.path.join(dtd_dir, "nlmmedline_080101.dtd")
+            mtime = os.path.getmtime(dtd)
+            os.utime(dtd, (mtime, mtime + 10))
+            assert read() == record
+            assert parsed
+            # or if the saved file is damaged
+            for name in os.listdir(Parser.compiled_dir):
+                open(os.path.join(Parser.compiled_dir, name), "wb").write("x")
+            Parser._dtd_cache = {}
+            del parsed[:]
+            assert read() == record
+            assert parsed
+        finally:
+            shutil.rmtree(temp_dir)
+            Parser._dtd_cache = dtd_cache
+            Parser.DataHandler.parse_dtd = parse_dtd
+
+
 if __name__ == '__main__':
     runner = unittest.TextTestRunner(verbosity = 2)
     unittest.main(testRunner=runner)
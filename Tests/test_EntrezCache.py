@@ -0,0 +1,209 @@
+'''Testing code for the Bio.Entrez response cache and batched fetching.
+
+No requests are sent to NCBI, urllib.urlopen is replaced by a function
+answering like EPost and EFetch would.
+'''
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import urllib
+import cgi
+from StringIO import StringIO
+
+from Bio import Entrez
+from Bio.Entrez import Parser
+from Bio.Entrez.Cache import ResponseCache
+
+EPOST = '''<?xml version="1.0"?>
+<!DOCTYPE ePostResult PUBLIC "-//NLM//DTD ePostResult, 11 May 2002//EN" "http://www.ncbi.nlm.nih.gov/entrez/query/DTD/ePost_020511.dtd">
+<ePostResult>
+	<QueryKey>1</QueryKey>
+	<WebEnv>WEBENV%i</WebEnv>
+</ePostResult>
+'''
+
+class FakeEUtils:
+    '''Stand in for urllib.urlopen, answering EPost and EFetch requests.'''
+    def __init__(self):
+        self.requests = []
+        self.posted = {}
+
+    def __call__(self, url, data=None):
+        if data is None:
+            url, data = url.split("?", 1)
+        params = dict(cgi.parse_qsl(data))
+        self.requests.append((url.split("/")[-1], params))
+        if url.endswith("epost.fcgi"):
+            webenv = "WEBENV%i" % len(self.posted)
+            #Like NCBI, the history keeps each id once
+            ids = []
+            for i in params["id"].split(","):
+                if i not in ids:
+                    ids.append(i)
+            self.posted[webenv] = ids
+            return StringIO(EPOST % (len(self.posted) - 1))
+        assert url.endswith("efetch.fcgi")
+        if "WebEnv" in params:
+            ids = self.posted[params["WebEnv"]]
+            start = int(params.get("retstart", 0))
+            end = start + int(params.get("retmax", len(ids)))
+            ids = ids[start:end]
+        else:
+            ids = params["id"].split(",")
+        if "error" in ids:
+            return StringIO("Error: Your session has expired.\n")
+        return StringIO("".join(["record %s\n" % i for i in ids]))
+
+
+class EntrezCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.urlopen = urllib.urlopen
+        self.sleep = time.sleep
+        self.eutils = FakeEUtils()
+        self.sleeps = []
+        urllib.urlopen = self.eutils
+        time.sleep = self.sleeps.append
+        Entrez._open.previous = 0
+        Entrez.cache = ResponseCache(self.directory)
+        #Don't save the DTD classifications in the user's home directory
+        self.compiled_dir = Parser.compiled_dir
+        Parser.compiled_dir = None
+
+    def tearDown(self):
+        urllib.urlopen = self.urlopen
+        time.sleep = self.sleep
+        Entrez.cache = None
+        Parser.compiled_dir = self.compiled_dir
+        shutil.rmtree(self.directory)
+
+    def test_key(self):
+        '''Equivalent requests have the same key.'''
+        cache = Entrez.cache
+        key = cache.key("efetch", {"db" : "pubmed", "id" : "1,2",
+                                   "tool" : "biopython"})
+        self.assertEqual(key, cache.key("efetch", {"id" : ["1", 2],
+                                                   "email" : "x@y.org",
+                                                   "db" : "pubmed",
+                                                   "retmode" : None}))
+        self.assertNotEqual(key, cache.key("efetch", {"db" : "pubmed",
+                                                      "id" : "2,1"}))
+        self.assertNotEqual(key, cache.key("esummary", {"db" : "pubmed",
+                                                        "id" : "1,2"}))
+
+    def test_cache(self):
+        '''Responses are cached, except POST and history requests.'''
+        data = Entrez.efetch(db="pubmed", id="1,2").read()
+        self.assertEqual(data, "record 1\nrecord 2\n")
+        handle = Entrez.efetch(db="pubmed", id=["1", "2"], rettype=None)
+        self.assertEqual(handle.readline(), "record 1\n")
+        self.assertEqual(len(self.eutils.requests), 1)
+        self.assertEqual(Entrez.cache.hits, 1)
+        Entrez.epost(db="pubmed", id="1,2").read()
+        Entrez.epost(db="pubmed", id="1,2").read()
+        Entrez.efetch(db="pubmed", WebEnv="WEBENV0", query_key=1).read()
+        Entrez.efetch(db="pubmed", WebEnv="WEBENV0", query_key=1).read()
+        self.assertEqual(len(self.eutils.requests), 5)
+        #Errors are not cached
+        self.assertRaises(IOError, Entrez.efetch, db="pubmed", id="error")
+        self.assertRaises(IOError, Entrez.efetch, db="pubmed", id="error")
+        self.assertEqual(len(self.eutils.requests), 7)
+        #The three second rule only applies to requests sent
+        self.assert_(len(self.sleeps) <= 6)
+
+    def test_ttl(self):
+        '''Expired responses are fetched again.'''
+        Entrez.cache.ttl = 1000
+        Entrez.efetch(db="pubmed", id="1").read()
+        Entrez.efetch(db="pubmed", id="1").read()
+        self.assertEqual(len(self.eutils.requests), 1)
+        filename = os.path.join(self.directory, os.listdir(self.directory)[0])
+        old = time.time() - 2000
+        os.utime(filename, (old, old))
+        Entrez.efetch(db="pubmed", id="1").read()
+        self.assertEqual(len(self.eutils.requests), 2)
+        self.assert_(os.path.getmtime(filename) > old)
+
+    def test_max_size(self):
+        '''The least recently used responses are removed.'''
+        cache = ResponseCache(self.directory, max_size=1000)
+        for i in range(10):
+            cache.put("key%i" % i, "x" * 150)
+            #Make the access times distinct
+            os.utime(os.path.join(self.directory, "key%i" % i), (i, i))
+        self.assertEqual(cache.get("key0"), None)
+        self.assertEqual(cache.get("key9"), "x" * 150)
+        self.assert_(cache._size <= 1000)
+        self.assertEqual(cache._size, 150 * len(os.listdir(self.directory)))
+        cache.clear()
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_replace(self):
+        '''Storing a response again replaces the old one in the size.'''
+        cache = ResponseCache(self.directory, max_size=1000)
+        cache.put("key", "x" * 150)
+        cache.put("key", "y" * 100)
+        self.assertEqual(cache.get("key"), "y" * 100)
+        self.assertEqual(cache._size, 100)
+        for i in range(8):
+            cache.put("key", "z" * 150)
+        self.assertEqual(cache._size, 150)
+        self.assertEqual(cache.get("key"), "z" * 150)
+
+    def test_efetch_batched_history(self):
+        '''Fetching a list of ids in batches with EPost and the history.'''
+        Entrez.cache = None
+        ids = [str(i) for i in range(23)]
+        #Repeated ids are only fetched once, as EPost would remove them
+        handles = Entrez.efetch_batched(db="nucleotide",
+                                        id=ids[:3] + ids + ["7"],
+                                        batch_size=5, post_size=12,
+                                        rettype="fasta")
+        data = "".join([handle.read() for handle in handles])
+        self.assertEqual(data, "".join(["record %i\n" % i for i in range(23)]))
+        names = [name for name, params in self.eutils.requests]
+        self.assertEqual(names, ["epost.fcgi"] + ["efetch.fcgi"] * 3
+                                + ["epost.fcgi"] + ["efetch.fcgi"] * 3)
+        for name, params in self.eutils.requests:
+            if name == "efetch.fcgi":
+                self.assertEqual(params["rettype"], "fasta")
+                self.assert_("id" not in params)
+        #A request was sent each time, so each waited three seconds
+        self.assertEqual(len(self.sleeps), 7)
+        self.assertRaises(ValueError, Entrez.efetch_batched, "pubmed", ids,
+                          batch_size=0)
+
+    def test_efetch_batched_cache(self):
+        '''With a cache, batches are fetched and cached by their ids.'''
+        ids = [str(i) for i in range(23)]
+        handles = Entrez.efetch_batched(db="nucleotide", id=ids + ids[:2],
+                                        batch_size=5, rettype="fasta")
+        data = "".join([handle.read() for handle in handles])
+        self.assertEqual(data, "".join(["record %i\n" % i for i in range(23)]))
+        self.assertEqual([name for name, params in self.eutils.requests],
+                         ["efetch.fcgi"] * 5)
+        self.assertEqual([params["id"] for name, params in self.eutils.requests],
+                         [",".join(ids[i:i+5]) for i in range(0, 23, 5)])
+        #Fetch again, with one more id, which is the only batch not cached
+        self.eutils.requests = []
+        handles = Entrez.efetch_batched(db="nucleotide", id=ids + ["23"],
+                                        batch_size=5, rettype="fasta")
+        data = "".join([handle.read() for handle in handles])
+        self.assertEqual(data, "".join(["record %i\n" % i for i in range(24)]))
+        self.assertEqual(self.eutils.requests,
+                         [("efetch.fcgi", {"db" : "nucleotide",
+                                           "id" : "20,21,22,23",
+                                           "rettype" : "fasta",
+                                           "tool" : "biopython"})])
+        #The batches are cached as if fetched by their ids
+        self.assertEqual(Entrez.efetch(db="nucleotide", id="0,1,2,3,4",
+                                       rettype="fasta").read(),
+                         "".join(["record %i\n" % i for i in range(5)]))
+        self.assertEqual(len(self.eutils.requests), 1)
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity = 2)
+    unittest.main(testRunner=runner)
@@ -177,6 +177,46 @@ class AbstractTrainerTest(unittest.TestCase):
         assert abs(expected_log_prob - log_prob) < 0.1, \
           "Bad probability calculated: %s" % log_prob
 
+class BaumWelchTrainerTest(unittest.TestCase):
+    def setUp(self):
+        emissions = ["ABBAB", "AAAB", "BBABBBA", "ABA", "BAAAB"]
+        self.training_seqs = [Trainer.TrainingSequence(
+                                  Seq(emission, LetterAlphabet()),
+                                  Seq("", NumberAlphabet()))
+                              for emission in emissions]
+
+    def train(self, processes):
+        mm_builder = MarkovModel.MarkovModelBuilder(NumberAlphabet(),
+                                                    LetterAlphabet())
+        mm_builder.allow_all_transitions()
+        mm_builder.set_transition_score('1', '1', .7)
+        mm_builder.set_transition_score('1', '2', .3)
+        mm_builder.set_transition_score('2', '1', .4)
+        mm_builder.set_transition_score('2', '2', .6)
+        mm_builder.set_emission_score('1', 'A', .8)
+        mm_builder.set_emission_score('1', 'B', .2)
+        mm_builder.set_emission_score('2', 'A', .3)
+        mm_builder.set_emission_score('2', 'B', .7)
+
+        log_likelihoods = []
+        def update_fn(iteration, log_likelihood):
+            log_likelihoods.append((iteration, log_likelihood))
+        def stop_training(log_likelihood_change, num_iterations):
+            return num_iterations >= 3
+        trainer = Trainer.BaumWelchTrainer(mm_builder.get_markov_model())
+        mm = trainer.train(self.training_seqs, stop_training,
+                           processes = processes, update_fn = update_fn)
+        return mm.transition_prob, mm.emission_prob, log_likelihoods
+
+    def test_processes(self):
+        """Training with worker processes gives the same model.
+        """
+        transitions, emissions, log_likelihoods = self.train(1)
+        test_assertion("Iterations", [i for i, ll in log_likelihoods],
+                       [1, 2, 3])
+        test_assertion("Parallel training", self.train(2),
+                       (transitions, emissions, log_likelihoods))
+
 # run the tests
 if __name__ == "__main__":
     runner = unittest.TextTestRunner(verbosity = 2)
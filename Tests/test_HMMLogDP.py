@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+"""Test the NumPy based LogDPAlgorithms in Bio.HMM.DynamicProgramming.
+
+The results are checked against sums and maxima over every possible
+state path of short sequences.
+"""
+# standard modules
+import math
+import random
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    from Bio import MissingExternalDependencyError
+    raise MissingExternalDependencyError(\
+        "Install NumPy if you want to use Bio.HMM.DynamicProgramming.LogDPAlgorithms.")
+
+# biopython
+from Bio import Alphabet
+from Bio.Seq import Seq
+
+# stuff we are testing
+from Bio.HMM import MarkovModel
+from Bio.HMM import Trainer
+from Bio.HMM.DynamicProgramming import LogDPAlgorithms
+
+class StateAlphabet(Alphabet.Alphabet):
+    letters = ['F', 'L', 'M']
+
+class RollAlphabet(Alphabet.Alphabet):
+    letters = ['1', '2', '3']
+
+def all_paths(states, length):
+    """Every state path of the given length."""
+    if length == 0:
+        return [[]]
+    return [path + [state] for path in all_paths(states, length - 1)
+            for state in states]
+
+class LogDPAlgorithmsTest(unittest.TestCase):
+    def setUp(self):
+        random.seed(3)
+        mm_builder = MarkovModel.MarkovModelBuilder(StateAlphabet(),
+                                                    RollAlphabet())
+        mm_builder.allow_all_transitions()
+        mm_builder.set_random_probabilities()
+        mm_builder.destroy_transition('M', 'F')
+        self.mm = mm_builder.get_markov_model()
+        self.rolls = Seq("1231132", RollAlphabet())
+        self.training_seq = Trainer.TrainingSequence(self.rolls,
+                                                     Seq("", StateAlphabet()))
+
+    def path_probabilities(self):
+        """Probability of the rolls for each state path."""
+        transitions = self.mm.transition_prob
+        emissions = self.mm.emission_prob
+        answer = []
+        for path in all_paths(StateAlphabet.letters, len(self.rolls)):
+            # begin and end in the first state
+            prob = transitions.get(('F', path[0]), 0)
+            prob *= transitions.get((path[-1], 'F'), 0)
+            for i in range(len(path)):
+                prob *= emissions[(path[i], self.rolls[i])]
+                if i + 1 < len(path):
+                    prob *= transitions.get((path[i], path[i + 1]), 0)
+            answer.append((path, prob))
+        return answer
+
+    def test_sequence_probability(self):
+        """Log probability from the forward algorithm"""
+        total = sum([prob for path, prob in self.path_probabilities()])
+        dp = LogDPAlgorithms(self.mm, self.training_seq)
+        forward_var, log_prob = dp.forward_algorithm()
+        self.assertAlmostEqual(log_prob, math.log(total))
+        backward_var = dp.backward_algorithm()
+        for i in range(len(self.rolls)):
+            prob = sum([math.exp(forward_var[(state, i)] +
+                                 backward_var[(state, i)])
+                        for state in StateAlphabet.letters])
+            self.assertAlmostEqual(math.log(prob), log_prob)
+
+    def test_expected_counts(self):
+        """Expected transition and emission counts"""
+        paths = self.path_probabilities()
+        total = sum([prob for path, prob in paths])
+        dp = LogDPAlgorithms(self.mm, self.training_seq)
+        transitions, emissions, log_prob = dp.expected_counts()
+        self.assertEqual(len(transitions), len(self.mm.transition_prob))
+        for (k, l), count in transitions.items():
+            expected = 0
+            for path, prob in paths:
+                for i in range(len(path) - 1):
+                    if path[i] == k and path[i + 1] == l:
+                        expected += prob / total
+            self.assertAlmostEqual(count, expected)
+        for (k, b), count in emissions.items():
+            expected = 0
+            for path, prob in paths:
+                for i in range(len(path)):
+                    if path[i] == k and self.rolls[i] == b:
+                        expected += prob / total
+            self.assertAlmostEqual(count, expected)
+
+    def test_viterbi(self):
+        """Most probable state path"""
+        best_path, best_prob = max([(prob, path) for path, prob
+                                    in self.path_probabilities()])[::-1]
+        dp = LogDPAlgorithms(self.mm, self.training_seq)
+        path, log_prob = dp.viterbi()
+        self.assertEqual(path.tostring(), "".join(best_path))
+        self.assertAlmostEqual(log_prob, math.log(best_prob))
+
+    def test_long_sequence(self):
+        """No underflow for long sequences"""
+        rolls = Seq("".join([random.choice("123") for i in range(5000)]),
+                    RollAlphabet())
+        training_seq = Trainer.TrainingSequence(rolls, Seq("", StateAlphabet()))
+        dp = LogDPAlgorithms(self.mm, training_seq)
+        transitions, emissions, log_prob = dp.expected_counts()
+        self.assert_(-5000 * math.log(3) * 10 < log_prob < 0)
+        self.assertAlmostEqual(sum(emissions.values()), 5000)
+        self.assertAlmostEqual(sum(transitions.values()), 4999)
+        path, path_prob = dp.viterbi()
+        self.assertEqual(len(path), 5000)
+        self.assert_(path_prob < log_prob)
+
+    def test_baum_welch(self):
+        """Baum-Welch training using LogDPAlgorithms"""
+        rolls = Seq("".join([random.choice("1123") for i in range(500)]),
+                    RollAlphabet())
+        training_seq = Trainer.TrainingSequence(rolls, Seq("", StateAlphabet()))
+        likelihoods = []
+        def stop_training(log_likelihood_change, num_iterations):
+            dp = LogDPAlgorithms(self.mm, training_seq)
+            likelihoods.append(dp.expected_counts()[2])
+            return num_iterations >= 5
+        trainer = Trainer.BaumWelchTrainer(self.mm)
+        trained_mm = trainer.train([training_seq], stop_training,
+                                   LogDPAlgorithms)
+        # the likelihood of the training sequence should improve
+        self.assertEqual(len(likelihoods), 4)
+        for i in range(len(likelihoods) - 1):
+            self.assert_(likelihoods[i] < likelihoods[i + 1])
+        for state in StateAlphabet.letters:
+            total = sum([trained_mm.emission_prob[(state, roll)]
+                         for roll in RollAlphabet.letters])
+            self.assertAlmostEqual(total, 1)
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner(verbosity = 2)
+    unittest.main(testRunner=runner)
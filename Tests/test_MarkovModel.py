@@ -73,6 +73,20 @@ mm = MarkovModel.MarkovModel(states, alphabet,
                              p_initial, p_transition, p_emission)
 print_mm(mm)
 
+print "Training HMM with several outputs"
+outputs = [(2, 1, 0), (0, 1, 1, 2), (1, 0, 2, 2, 1), (2, 0)]
+p_initial = [0.6, 0.4]
+p_transition = [[0.7, 0.3],
+                [0.5, 0.5]]
+p_emission = [[0.6, 0.1, 0.3],
+              [0.1, 0.7, 0.2]]
+x = MarkovModel._baum_welch(N, M, outputs,
+                            p_initial=p_initial,
+                            p_transition=p_transition,
+                            p_emission=p_emission)
+mm = MarkovModel.MarkovModel(states, alphabet, *x)
+print_mm(mm)
+
 
 # Test Baum-Welch.  This is hard because it is a non-deterministic
 # algorithm.  Each run will result in different states having to
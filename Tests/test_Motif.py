@@ -61,6 +61,36 @@ class MotifTestsBasic(unittest.TestCase):
         motif.from_jaspar_sites(self.SITESin)
         assert motif.length==6
 
+    def test_reverse_complement(self):
+        """Taking the reverse complement leaves the motif unchanged.
+        """
+        motif = Motif.read(self.PFMin, "pfm")
+        counts = dict([(n, motif.counts[n][:]) for n in "ACGT"])
+        rc = motif.reverse_complement()
+        self.assertEqual(motif.counts, counts)
+        self.assertEqual(rc.counts["A"], counts["T"][::-1])
+        self.assertEqual(rc.reverse_complement().counts, counts)
+
+    def test_search_instances(self):
+        """Find the instances of a motif in a sequence.
+        """
+        from Bio.Seq import Seq
+        motif = Motif.read(self.SITESin, "sites")
+        sequence = "TTCACGTGAAGCACGTGACGTGAACACGTGCAC" * 3
+        hits = list(motif.search_instances(Seq(sequence, motif.alphabet),
+                                           chunk_size=7))
+        expected = []
+        for pos in range(len(sequence) - motif.length + 1):
+            for instance in motif.instances:
+                if instance.tostring() == sequence[pos:pos+motif.length]:
+                    expected.append((pos, instance))
+                    break
+        self.assertEqual(len(hits), len(expected))
+        for (pos, instance), (pos2, instance2) in zip(hits, expected):
+            self.assertEqual(pos, pos2)
+            self.assert_(instance is instance2)
+        self.assertEqual(list(motif.search_instances(sequence[:5])), [])
+
     def test_FAoutput(self):
         """Ensure that we can write proper FASTA output files.
         """
@@ -0,0 +1,184 @@
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+
+import unittest
+import random
+
+try:
+    import numpy
+except ImportError:
+    from Bio import MissingExternalDependencyError
+    raise MissingExternalDependencyError(\
+        "Install NumPy if you want to use Bio.Motif.Scan.")
+
+from Bio import Motif
+from Bio.Motif.Scan import CompiledPWM, MotifScanner
+from Bio.Motif import Thresholds
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+
+
+class CompiledPWMTests(unittest.TestCase):
+    def setUp(self):
+        handle = open("Motif/SRF.pfm")
+        self.m = Motif.read(handle, "pfm")
+        handle.close()
+        self.m.set_mask("**** *** ***")
+        random.seed(13)
+        self.seq = Seq("".join([random.choice("ACGTNacgt") \
+                                for i in range(2000)]), self.m.alphabet)
+
+    def slow_search(self, normalized, masked, threshold, both):
+        """The hits found with score_hit, one window at a time."""
+        sequence = self.seq.tostring().upper()
+        rc = self.m.reverse_complement()
+        hits = []
+        for pos in range(len(sequence) - self.m.length + 1):
+            score = self.m.score_hit(sequence, pos, normalized, masked)
+            if score > threshold:
+                hits.append((pos, score))
+            if both:
+                score = rc.score_hit(sequence, pos, normalized, masked)
+                if score > threshold:
+                    hits.append((-pos, score))
+        return hits
+
+    def test_scores(self):
+        """Compiled scores are the same as from score_hit.
+        """
+        pwm = CompiledPWM(self.m)
+        scores = pwm.scores(self.seq)
+        sequence = self.seq.tostring()
+        self.assertEqual(scores.shape, (2, len(sequence)-self.m.length+1))
+        for pos in [0, 1, 100, 1555, len(sequence)-self.m.length]:
+            self.assertEqual(scores[0, pos],
+                             self.m.score_hit(sequence.upper(), pos))
+
+    def test_search_pwm(self):
+        """search_pwm gives the same hits as scoring each window.
+        """
+        for normalized in [0, 1]:
+            for masked in [0, 1]:
+                for both in [True, False]:
+                    hits = list(self.m.search_pwm(self.seq, normalized,
+                                                  masked, 0.5, both))
+                    self.assertEqual(hits, self.slow_search(normalized,
+                                                            masked, 0.5,
+                                                            both))
+
+    def test_search_chunks(self):
+        """Searching in chunks or in a batch gives the same hits.
+        """
+        pwm = CompiledPWM(self.m)
+        positions, scores = pwm.search(self.seq, 2.0)
+        hits = zip(positions.tolist(), scores.tolist())
+        self.assertEqual(hits, self.slow_search(0, 0, 2.0, True))
+        chunked = pwm.search(self.seq, 2.0, chunk_size=97)
+        self.assertEqual(positions.tolist(), chunked[0].tolist())
+        self.assertEqual(scores.tolist(), chunked[1].tolist())
+        pieces = [self.seq[:500], self.seq[500:505], self.seq[505:]]
+        for piece, (p, s) in zip(pieces, pwm.search_batch(pieces, 2.0)):
+            expected = pwm.search(piece, 2.0)
+            self.assertEqual(p.tolist(), expected[0].tolist())
+            self.assertEqual(s.tolist(), expected[1].tolist())
+        self.assertEqual(pwm.search_batch([], 2.0), [])
+
+
+class MotifScannerTests(unittest.TestCase):
+    def setUp(self):
+        handle = open("Motif/SRF.pfm")
+        srf = Motif.read(handle, "pfm")
+        handle.close()
+        handle = open("Motif/Arnt.sites")
+        arnt = Motif.read(handle, "sites")
+        handle.close()
+        self.motifs = [srf, arnt]
+        random.seed(7)
+        self.records = []
+        for i in range(9):
+            seq = "".join([random.choice("ACGT") \
+                           for j in range(random.randint(0, 1500))])
+            self.records.append(SeqRecord(Seq(seq, srf.alphabet),
+                                          id="seq%i" % i))
+
+    def check_hits(self, scanner, table):
+        self.assertEqual(table.ids, [r.id for r in self.records])
+        for i, motif in enumerate(self.motifs):
+            pwm = CompiledPWM(motif)
+            for j, record in enumerate(self.records):
+                positions, scores = pwm.search(record.seq,
+                                               scanner.thresholds[i])
+                expected = zip(positions.tolist(), scores.tolist())
+                expected.sort()
+                wanted = (table.motif == i) & (table.sequence == j)
+                hits = zip((table.position * table.strand)[wanted].tolist(),
+                           table.score[wanted].tolist())
+                hits.sort()
+                self.assertEqual(hits, expected)
+
+    def test_threshold(self):
+        """Scanning many motifs with a fixed threshold.
+        """
+        scanner = MotifScanner(self.motifs, threshold=2.0)
+        #Use small chunks to check the hits at the chunk boundaries
+        scanner.chunk_size = 200
+        table = scanner.scan(iter(self.records), processes=1,
+                             records_per_job=4)
+        self.assertEqual(list(scanner.thresholds), [2.0, 2.0])
+        self.check_hits(scanner, table)
+        if len(table):
+            id, name, position, strand, score = table[0]
+            self.assertEqual(id, table.ids[table.sequence[0]])
+            self.assert_(strand in [-1, 1])
+            self.assert_(score > 2.0)
+
+    def test_pvalue(self):
+        """Scanning many motifs with p-value thresholds in worker processes.
+        """
+        scanner = MotifScanner(self.motifs, pvalue=0.001)
+        for i, motif in enumerate(self.motifs):
+            distribution = Thresholds.cached_score_distribution(motif)
+            self.assertEqual(scanner.thresholds[i],
+                             distribution.threshold_fpr(0.001))
+        table = scanner.scan(iter(self.records), processes=2,
+                             records_per_job=2)
+        self.check_hits(scanner, table)
+
+    def test_distribution(self):
+        """Thresholds from the cached score distributions.
+        """
+        motif = self.motifs[0]
+        distribution = Thresholds.cached_score_distribution(motif)
+        self.assert_(Thresholds.cached_score_distribution(motif) \
+                     is distribution)
+        for fpr in [0.1, 0.01, 0.001, 1e-5]:
+            #Compare with adding up the background probabilities
+            i = distribution.n_points
+            prob = 0.0
+            while prob < fpr:
+                i -= 1
+                prob += distribution.bg_density[i]
+            self.assertEqual(distribution.threshold_fpr(fpr),
+                             distribution.min_score + i * distribution.step)
+
+    def test_cache_size(self):
+        """Only the most recently used distributions are cached.
+        """
+        old_size = Thresholds.cache_size
+        Thresholds.cache_size = 1
+        try:
+            first = Thresholds.cached_score_distribution(self.motifs[0], 10)
+            second = Thresholds.cached_score_distribution(self.motifs[1], 10)
+            self.assertEqual(len(Thresholds._distributions), 1)
+            self.assert_(Thresholds.cached_score_distribution(self.motifs[1],
+                                                              10) is second)
+            self.assert_(Thresholds.cached_score_distribution(self.motifs[0],
+                                                              10) is not first)
+        finally:
+            Thresholds.cache_size = old_size
+
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner(verbosity = 2)
+    unittest.main(testRunner=runner)
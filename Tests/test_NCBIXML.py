@@ -72,3 +72,35 @@ for test in all_tests:
                     print hsp.query[:75] + '...'
                     print hsp.match[:75] + '...'
                     print hsp.sbjct[:75] + '...'
+
+### NCBIXML.iterparse (should give the same records as NCBIXML.parse)
+
+def hsp_summary(record) :
+    answer = []
+    for alignment in record.alignments :
+        for hsp in alignment.hsps :
+            answer.append((alignment.title, hsp.score, hsp.expect,
+                           hsp.query_start, hsp.sbjct_end, hsp.frame,
+                           hsp.query, hsp.match, hsp.sbjct))
+    return answer
+
+for test in all_tests:
+    datafile = os.path.join("Blast", test)
+    records = list(NCBIXML.parse(open(datafile)))
+    records2 = list(NCBIXML.iterparse(open(datafile)))
+    assert len(records) == len(records2)
+    for r1, r2 in zip(records, records2) :
+        assert r1.query_id == r2.query_id
+        assert r1.query == r2.query
+        assert r1.query_letters == r2.query_letters
+        assert r1.ka_params == r2.ka_params
+        assert [d.title for d in r1.descriptions] \
+            == [d.title for d in r2.descriptions]
+        assert hsp_summary(r1) == hsp_summary(r2)
+    #Now without the alignment strings
+    for r1, r2 in zip(records,
+                      NCBIXML.iterparse(open(datafile), alignments=False)) :
+        assert r1.query_id == r2.query_id
+        for hsp1, hsp2 in zip(hsp_summary(r1), hsp_summary(r2)) :
+            assert hsp1[:-3] == hsp2[:-3]
+            assert hsp2[-3:] == ("", "", "")
@@ -0,0 +1,102 @@
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+
+"""Tests for the columnar tabular BLAST parser in Bio.Blast.ParseBlastTable."""
+
+import os
+import unittest
+from StringIO import StringIO
+
+from Bio.Blast.ParseBlastTable import parse_columns, column_names
+
+filename = os.path.join("Blast", "bt_table001.txt")
+
+class ParseColumnsTest(unittest.TestCase) :
+
+    def test_columns(self) :
+        """Parse -m 9 output into per-query column lists."""
+        results = list(parse_columns(open(filename)))
+        self.assertEqual([query for query, columns in results],
+                         ["gi|16080617|ref|NP_391444.1|", "gi|11464971:4-101"])
+        query, columns = results[0]
+        self.assertEqual(len(columns), len(column_names))
+        self.assertEqual(columns["qid"], [query] * 3)
+        self.assertEqual(columns["sid"][1], "gi|311070071|ref|YP_003974994.1|")
+        self.assertEqual(columns["pid"], [100.0, 93.14, 60.0])
+        self.assertEqual(columns["ali_len"], [102, 102, 100])
+        self.assertEqual(columns["mis"], [0, 7, 40])
+        self.assertEqual(columns["q_start"], [1, 1, 3])
+        self.assertEqual(columns["s_end"], [102, 102, 101])
+        self.assertEqual(columns["e_value"], [1e-52, 2e-46, 0.003])
+        self.assertEqual(columns["bit_score"], [205.0, 185.0, 38.9])
+        query, columns = results[1]
+        self.assertEqual(columns["s_start"], [4, 4])
+
+    def test_small_chunks(self) :
+        """Lines split across chunks should be rejoined."""
+        expected = list(parse_columns(open(filename)))
+        for chunk_size in [1, 7, 100] :
+            self.assertEqual(list(parse_columns(open(filename),
+                                                chunk_size=chunk_size)),
+                             expected)
+
+    def test_m8(self) :
+        """Parse -m 8 output (no comment lines)."""
+        lines = [line for line in open(filename) if line[0] != "#"]
+        results = list(parse_columns(StringIO("".join(lines))))
+        self.assertEqual(results, list(parse_columns(open(filename))))
+
+    def test_filters(self) :
+        """Filter hits on e-value and bit score."""
+        results = list(parse_columns(open(filename), max_e_value=1e-10))
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0][1]["e_value"], [1e-52, 2e-46])
+        results = list(parse_columns(open(filename), min_bit_score=200))
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0][1]["sid"],
+                         ["gi|16080617|ref|NP_391444.1|"])
+
+    def test_iterations(self) :
+        """Each PSI-BLAST iteration of a query is a separate group."""
+        header = "# BLASTP 2.2.18 [Mar-02-2008]\n# Iteration: %i\n" \
+                 "# Query: q1\n# Database: nr\n# Fields: Query id, " \
+                 "Subject id, %% identity, alignment length, mismatches, " \
+                 "gap openings, q. start, q. end, s. start, s. end, " \
+                 "e-value, bit score\n"
+        hit = "q1\t%s\t50.00\t100\t50\t0\t1\t100\t1\t100\t%s\t%s\n"
+        text = header % 1 + hit % ("s1", "1e-20", "90.0") \
+               + hit % ("s2", "1e-05", "40.0") \
+               + header % 2 + hit % ("s1", "1e-30", "120.0") \
+               + hit % ("s2", "1e-25", "100.0") + hit % ("s3", "1e-06", "45.0")
+        results = list(parse_columns(StringIO(text)))
+        self.assertEqual([query for query, columns in results], ["q1", "q1"])
+        self.assertEqual(results[0][1]["sid"], ["s1", "s2"])
+        self.assertEqual(results[1][1]["sid"], ["s1", "s2", "s3"])
+        self.assertEqual(results[1][1]["bit_score"], [120.0, 100.0, 45.0])
+        # Filtered hits don't join the iterations together
+        results = list(parse_columns(StringIO(text), max_e_value=1e-10))
+        self.assertEqual([columns["sid"] for query, columns in results],
+                         [["s1"], ["s1", "s2"]])
+
+    def test_bad_line(self) :
+        """Lines without twelve columns should be rejected."""
+        handle = StringIO("q1\ts1\t100.0\t50\n")
+        self.assertRaises(ValueError, list, parse_columns(handle))
+
+    def test_array(self) :
+        """Parse into NumPy record arrays."""
+        try :
+            import numpy
+        except ImportError :
+            return
+        results = list(parse_columns(open(filename), as_array=1))
+        query, hits = results[0]
+        self.assertEqual(len(hits), 3)
+        self.assertEqual(list(hits.ali_len), [102, 102, 100])
+        self.assertEqual(list(hits["bit_score"] > 100), [True, True, False])
+        self.assertEqual(hits[2].sid, "gi|52787302|ref|YP_093131.1|")
+
+if __name__ == "__main__" :
+    runner = unittest.TextTestRunner(verbosity = 2)
+    unittest.main(testRunner=runner)
@@ -4,9 +4,13 @@
 # as part of this package.
 
 import os
+import shutil
+import tempfile
 import unittest
+from StringIO import StringIO
 from Bio.PopGen import GenePop
 from Bio.PopGen import FDist
+from Bio.PopGen.FDist.Async import SplitFDist
 from Bio.PopGen.FDist.Utils import convert_genepop_to_fdist
 
 #Tests fdist related code. Note: this case doesn't require fdist
@@ -89,6 +93,37 @@ class ConversionTest(unittest.TestCase):
         for handle in self.handles:
             handle.close()
 
+class FakeFDist:
+    """Stands for FDistAsync, failing in the directory called 1.
+    """
+    def run_job(self, parameters, input_files):
+        data_dir = parameters['data_dir']
+        if os.path.basename(data_dir) == '1':
+            raise IOError("Simulated failure")
+        return 0.1, {'out.dat' : StringIO('%s\n' % data_dir)}
+
+class SplitFDistTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_failed_part(self):
+        """A failed part is raised by join, the others are collected
+        """
+        reported = []
+        split = SplitFDist(reported.append, 2, 100)
+        split.async.hooks['fdist'] = FakeFDist()
+        split.run_fdist(2, 10, 0.1, 50, num_sims = 400, data_dir = self.dir)
+        self.assertRaises(RuntimeError, split.join)
+        self.assert_('Simulated failure' in str(split.error))
+        self.assertEqual(reported, [0.1] * 3)
+        out_dat = open(os.path.join(self.dir, 'out.dat')).readlines()
+        self.assertEqual(len(out_dat), 3)
+        self.assertEqual(os.listdir(self.dir).count('1'), 1)
+        self.assertEqual(split.async.pool, None)
+
 if __name__ == "__main__":
     runner = unittest.TextTestRunner(verbosity = 2)
     unittest.main(testRunner=runner)
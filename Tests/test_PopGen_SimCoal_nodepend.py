@@ -4,9 +4,16 @@
 # as part of this package.
 
 import os
+import random
+import shutil
+import tempfile
 import unittest
+from StringIO import StringIO
 from Bio.PopGen import SimCoal
 from Bio.PopGen.SimCoal.Template import generate_simcoal_from_template
+from Bio.PopGen.SimCoal.Cache import SimCoalCache
+from Bio.PopGen.SimCoal import Async
+from Bio.PopGen.Async import Local
 
 #Tests simcoal related code. Note: this case doesn't require simcoal
 #test_PopGen_SimCoal tests code that requires simcoal
@@ -38,6 +45,123 @@ class TemplateTest(unittest.TestCase):
             #This won't exist if the template generation failed:
             os.remove(os.path.join('PopGen', 'simple_100_30.par'))
 
+class FakeSimCoal:
+    """Stands for SimCoalController, logging the number of simulations.
+    """
+    def __init__(self, log):
+        self.log = log
+
+    def run_simcoal(self, par_file, num_sims, ploydi = '1', par_dir = '.'):
+        root = par_file[:-4]
+        os.mkdir(os.path.join(par_dir, root))
+        for i in range(num_sims):
+            f = open(os.path.join(par_dir, root, '%s_%i.arp' % (root, i)), 'w')
+            f.write('%s %s %f\n' % (ploydi, i, random.random()))
+            f.close()
+        f = open(os.path.join(par_dir, root, root + '.arb'), 'w')
+        f.write('batch\n')
+        f.close()
+        f = open(self.log, 'a')
+        f.write('%i\n' % num_sims)
+        f.close()
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.log = os.path.join(self.dir, 'log')
+        self.cache = SimCoalCache(os.path.join(self.dir, 'cache'),
+                                  simulator = FakeSimCoal(self.log))
+        shutil.copy(os.path.join('PopGen', 'simple.par'), self.dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def runs(self):
+        if not os.path.exists(self.log):
+            return []
+        return [int(line) for line in open(self.log)]
+
+    def sims(self, root, par_dir = None):
+        out_dir = os.path.join(par_dir or self.dir, root)
+        sims = {}
+        for name in os.listdir(out_dir):
+            sims[name] = open(os.path.join(out_dir, name)).read()
+        return sims
+
+    def test_top_up(self):
+        """Cached simulations are reused and topped up"""
+        self.cache.run_simcoal('simple.par', 3, par_dir = self.dir)
+        first = self.sims('simple')
+        self.assertEqual(len(first), 4)
+        self.assert_('simple_0.arp' in first and 'simple.arb' in first)
+        shutil.rmtree(os.path.join(self.dir, 'simple'))
+        self.cache.run_simcoal('simple.par', 5, par_dir = self.dir)
+        second = self.sims('simple')
+        self.assertEqual(len(second), 6)
+        for name in first:
+            self.assertEqual(first[name], second[name])
+        shutil.rmtree(os.path.join(self.dir, 'simple'))
+        self.cache.run_simcoal('simple.par', 2, par_dir = self.dir)
+        self.assertEqual(len(self.sims('simple')), 3)
+        self.assertEqual(self.runs(), [3, 2])
+
+    def test_key(self):
+        """The cache is keyed by the par file contents and ploidy"""
+        shutil.copy(os.path.join(self.dir, 'simple.par'),
+                    os.path.join(self.dir, 'other.par'))
+        self.cache.run_simcoal('simple.par', 2, par_dir = self.dir)
+        self.cache.run_simcoal('other.par', 2, par_dir = self.dir)
+        self.assertEqual(self.runs(), [2])
+        self.assertEqual(self.sims('other')['other_1.arp'],
+                         self.sims('simple')['simple_1.arp'])
+        self.cache.run_simcoal('simple.par', 2, '2', par_dir = self.dir)
+        f = open(os.path.join(self.dir, 'simple.par'), 'a')
+        f.write('\n')
+        f.close()
+        self.cache.run_simcoal('simple.par', 2, par_dir = self.dir)
+        self.assertEqual(self.runs(), [2, 2, 2])
+        self.assertEqual(self.cache.listSimulations('2'), ['simple'])
+        self.assertEqual(len(self.cache.listSimulations()), 2)
+        self.assertRaises(KeyError, self.cache.getSimulation, 'unknown')
+        out_dir = os.path.join(self.dir, 'out')
+        os.mkdir(out_dir)
+        self.cache.getSimulation('simple', '2', out_dir)
+        self.assertEqual(len(self.sims('simple', out_dir)), 3)
+
+    def test_async(self):
+        """Concurrent runners share the cache"""
+        local = Local.Local(2)
+        local.hooks['simcoal'] = Async.SimCoalCache(
+            os.path.join(self.dir, 'cache'), simulator = FakeSimCoal(self.log))
+        par_text = open(os.path.join(self.dir, 'simple.par')).read()
+        ids = []
+        for i in range(4):
+            par_dir = os.path.join(self.dir, str(i))
+            os.mkdir(par_dir)
+            ids.append(local.run_program('simcoal',
+                {'parFile' : 'simple.par', 'numSims' : 3 + i,
+                 'parDir' : par_dir},
+                {'simple.par' : StringIO(par_text)}))
+        for id in ids:
+            done, (ret_code, output_files) = local.wait_result(id)
+            self.assertEqual(ret_code, 0)
+        local.close()
+        for i in range(4):
+            sims = self.sims('simple', os.path.join(self.dir, str(i)))
+            self.assertEqual(len(sims), 4 + i)
+        #Each runner either found enough simulations, or added some
+        cached = os.listdir(os.path.join(self.dir, 'cache',
+                                         self.cache.key(par_text), 'sims'))
+        self.assertEqual(len(cached), sum(self.runs()))
+        self.assert_(len(cached) >= 6)
+        #A failed task is reported, instead of hanging
+        id = local.run_program('simcoal', {'parFile' : 'simple.par',
+                                           'numSims' : 1}, {})
+        done, (ret_code, output_files) = local.wait_result(id)
+        self.assertEqual(ret_code, None)
+        self.assert_('KeyError' in local.errors[id])
+        local.close()
+
 if __name__ == "__main__":
     runner = unittest.TextTestRunner(verbosity = 2)
     unittest.main(testRunner=runner)
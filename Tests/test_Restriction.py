@@ -2,8 +2,11 @@
 """
 
 import unittest
+import random
 
 from Bio.Restriction import *
+from Bio.Restriction.Parallel import analyse
+from Bio.SeqRecord import SeqRecord
 from Bio.Seq import Seq
 from Bio.Alphabet.IUPAC import IUPACAmbiguousDNA
 
@@ -113,6 +116,91 @@ class RestrictionBatches(unittest.TestCase):
         hits = batch.search(seq)
         assert hits[EcoRV] == [8] and hits[EcoRI] == [16]
 
+    def test_batch_matches_single_search(self):
+        """Batch search gives the same sites as each enzyme on its own.
+        """
+        random.seed(2009)
+        seq = Seq("".join([random.choice("ACGTN") for i in range(2000)]),
+                  IUPACAmbiguousDNA())
+        #AllEnzymes is made by a set operation, so has no cached mapping
+        batch = AllEnzymes
+        for linear in (True, False):
+            hits = batch.search(seq, linear)
+            self.assertEqual(len(hits), len(AllEnzymes))
+            for enzyme in AllEnzymes:
+                self.assertEqual(hits[enzyme], enzyme.search(seq, linear))
+
+    def test_batch_both_strands(self):
+        """Batch search of sites on both strands and over the origin.
+        """
+        #BsaI is GGTCTC on the + strand, GAGACC on the - strand
+        seq = Seq("TCTCAGAGACCAAAAAAAAGAGACCGGTCTCAAGG", IUPACAmbiguousDNA())
+        batch = RestrictionBatch([BsaI, EcoRI, Sau3AI, MboI])
+        for linear in (True, False):
+            hits = batch.search(seq, linear)
+            for enzyme in batch:
+                self.assertEqual(hits[enzyme], enzyme.search(seq, linear))
+        self.assertEqual(len(batch.search(seq)[BsaI]), 3)
+        self.assertEqual(len(batch.search(seq, False)[BsaI]), 4)
+
+
+class ParallelAnalysis(unittest.TestCase):
+    """Tests for analysing many sequences at once.
+    """
+    def setUp(self):
+        random.seed(42)
+        self.records = []
+        for i in range(12):
+            seq = "".join([random.choice("ACGT") for j in range(400)])
+            self.records.append(SeqRecord(Seq(seq, IUPACAmbiguousDNA()),
+                                          id="seq%i" % i))
+        self.batch = RestrictionBatch([EcoRI, EcoRV, BsaI, Sau3AI, TaqI,
+                                       NotI, HaeIII])
+
+    def check_table(self, table, linear):
+        self.assertEqual(len(table), len(self.records))
+        self.assertEqual(table.ids, [r.id for r in self.records])
+        for index, record in enumerate(self.records):
+            expected = self.batch.search(record.seq, linear)
+            self.assertEqual(table.mapping(index), expected)
+            for enzyme in self.batch:
+                self.assertEqual(table.cuts(index, enzyme), expected[enzyme])
+        for enzyme in self.batch:
+            counts = [len(enzyme.search(r.seq, linear)) for r in self.records]
+            self.assertEqual(table.counts(enzyme), counts)
+            self.assertEqual(enzyme in table.with_sites(), 0 not in counts)
+            self.assertEqual(enzyme in table.without_site(),
+                             counts == [0] * len(counts))
+            self.assertEqual(enzyme in table.with_N_sites(1),
+                             counts == [1] * len(counts))
+
+    def test_serial(self):
+        """Analysis of many sequences in this process.
+        """
+        for linear in (True, False):
+            table = analyse(iter(self.records), self.batch, linear,
+                            processes=1, chunk_size=5)
+            self.check_table(table, linear)
+        self.assertEqual(table.counts("NotI"), [0] * len(self.records))
+        self.assert_(NotI in table.without_site())
+
+    def test_processes(self):
+        """Analysis of many sequences with worker processes.
+        """
+        #Without multiprocessing this falls back on searching in this process
+        table = analyse(iter(self.records), self.batch, False,
+                        processes=2, chunk_size=1)
+        self.check_table(table, False)
+
+    def test_empty(self):
+        """Analysis of no sequences finds no enzymes.
+        """
+        table = analyse(iter([]), self.batch, processes=1)
+        self.assertEqual(len(table), 0)
+        self.assertEqual(len(table.with_N_sites(1)), 0)
+        self.assertEqual(len(table.with_sites()), 0)
+        self.assertEqual(len(table.without_site()), 0)
+
 
 if __name__ == "__main__":
     runner = unittest.TextTestRunner(verbosity = 2)